@@ -37,7 +37,21 @@ AGENT_CONFIG = {
         "chunk_size": 600,
         "chunk_overlap": 80,
         "top_k": 5,
-        "similarity_threshold": 0.7
+        "similarity_threshold": 0.7,
+        # Almacenamiento vectorial: chroma, numpy (exacto, en memoria), hnsw (hnswlib)
+        # o snapshot (solo lectura, exportado con src/retriever/snapshot.py)
+        "backend": os.getenv("VECTOR_INDEX_BACKEND", "chroma"),
+        "snapshot_dir": os.getenv("VECTOR_SNAPSHOT_DIR"),
+        # Particionado: N shards consultados en paralelo (por hash del id o por un metadato)
+        "shards": {
+            "count": int(os.getenv("VECTOR_SHARDS", "1")),
+            "key": os.getenv("VECTOR_SHARD_KEY", "hash")
+        },
+        "hnsw": {
+            "m": 16,
+            "ef_construction": 200,
+            "ef_search": 128
+        }
     },
     
     # Configuración de plantillas
@@ -89,7 +89,10 @@ class QueryTool(BaseAgentTool):
     def _initialize_retriever(self):
         """Inicializa el retriever semántico"""
         try:
-            self.retriever = SemanticRetriever()
+            self.retriever = SemanticRetriever(
+                vector_db_path=self.config.get("vector_db_path", "data/vector_db"),
+                store_config=self.config
+            )
             self.retriever.initialize_models()
             self.retriever.initialize_vector_db()
             logger.info("QueryTool: Retriever inicializado")
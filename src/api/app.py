@@ -21,11 +21,12 @@ import json
 import uuid
 
 # Dependencias de FastAPI
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, Request, status, UploadFile, File, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 
 # Dependencias para autenticación
@@ -51,7 +52,13 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from retriever.retriever import SemanticRetriever
+from retriever.sharded_store import ShardedVectorStore
+from retriever.vector_store import BACKEND_SNAPSHOT
+from retriever.snapshot import snapshot_source_backend
 from embeddings.generate_embeddings import EmbeddingPipeline
+from embeddings.model_registry import get_registry
+from ingest.loaders import supported_extensions
+from api.ingestion_queue import IngestionQueue, IngestionQueueFull
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
@@ -98,10 +105,17 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 REQUEST_COUNT = Counter('schoolbot_requests_total', 'Total requests', ['method', 'endpoint', 'status'])
 REQUEST_DURATION = Histogram('schoolbot_request_duration_seconds', 'Request duration', ['method', 'endpoint'])
 QUERY_COUNT = Counter('schoolbot_queries_total', 'Total queries', ['user_type', 'status'])
+QUERY_EMBEDDING_BATCH = Histogram(
+    'schoolbot_query_embedding_batch_size', 'Queries encoded per model pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+QUERY_EMBEDDING_DURATION = Histogram('schoolbot_query_embedding_seconds', 'Query embedding batch duration')
+VECTOR_SHARD_QUERY_DURATION = Histogram('schoolbot_vector_shard_query_seconds', 'Vector search duration per shard', ['shard'])
 
 # Inicializar componentes del sistema
 retriever = None
 embedding_pipeline = None
+ingestion_queue = None
 
 # Modelos Pydantic
 class QueryRequest(BaseModel):
@@ -153,6 +167,9 @@ class UserRegister(BaseModel):
             raise ValueError(f'user_type debe ser uno de: {allowed_types}')
         return v
 
+ALLOWED_DOCUMENT_TYPES = ['reglamento_escolar', 'calendario_academico', 'circular_apoderados', 
+                          'menu_almuerzos', 'manual_procedimientos', 'documento_general']
+
 class DocumentUpload(BaseModel):
     """Modelo para subida de documentos"""
     document_type: str = Field(..., description="Tipo de documento")
@@ -160,8 +177,7 @@ class DocumentUpload(BaseModel):
     
     @validator('document_type')
     def validate_document_type(cls, v):
-        allowed_types = ['reglamento_escolar', 'calendario_academico', 'circular_apoderados', 
-                        'menu_almuerzos', 'manual_procedimientos', 'documento_general']
+        allowed_types = ALLOWED_DOCUMENT_TYPES
         if v not in allowed_types:
             raise ValueError(f'document_type debe ser uno de: {allowed_types}')
         return v
@@ -238,20 +254,44 @@ async def metrics_middleware(request, call_next):
     
     return response
 
+def observe_query_batch(size: int, seconds: float):
+    """Registra cada lote de embeddings de consultas en Prometheus"""
+    QUERY_EMBEDDING_BATCH.observe(size)
+    QUERY_EMBEDDING_DURATION.observe(seconds)
+
+def observe_shard_query(shard: int, seconds: float):
+    """Registra la latencia de cada shard del índice vectorial en Prometheus"""
+    VECTOR_SHARD_QUERY_DURATION.labels(shard=str(shard)).observe(seconds)
+
 # Eventos de la aplicación
 @app.on_event("startup")
 async def startup_event():
     """Inicializa componentes del sistema al arrancar"""
-    global retriever, embedding_pipeline
+    global retriever, embedding_pipeline, ingestion_queue
     
     try:
         # Inicializar retriever semántico
         retriever = SemanticRetriever()
         retriever.initialize_models()
         retriever.initialize_vector_db()
-        
-        # Inicializar pipeline de embeddings
-        embedding_pipeline = EmbeddingPipeline()
+        if retriever.query_batcher is not None:
+            retriever.query_batcher.on_batch = observe_query_batch
+        if isinstance(retriever.vector_store, ShardedVectorStore):
+            retriever.vector_store.on_shard_query = observe_shard_query
+        
+        # Inicializar pipeline de embeddings; el snapshot es de solo lectura, por lo que
+        # las subidas se ingieren en su backend de origen y se exporta uno nuevo
+        store_config = None
+        snapshot_root = None
+        if retriever.vector_store.name == BACKEND_SNAPSHOT:
+            snapshot_root = retriever.vector_store.snapshot_root
+            store_config = {"backend": snapshot_source_backend(snapshot_root)}
+            logger.info(f"Backend snapshot: las subidas se ingieren en {store_config['backend']}")
+        embedding_pipeline = EmbeddingPipeline(store_config=store_config)
+        
+        # Iniciar cola de ingesta de documentos subidos
+        ingestion_queue = IngestionQueue(embedding_pipeline, snapshot_root=snapshot_root)
+        await ingestion_queue.start()
         
         logger.info("Sistema SchoolBot inicializado correctamente")
         
@@ -263,6 +303,12 @@ async def startup_event():
 async def shutdown_event():
     """Limpieza al cerrar la aplicación"""
     logger.info("Cerrando sistema SchoolBot")
+    
+    if ingestion_queue is not None:
+        await ingestion_queue.stop()
+    
+    if retriever is not None and retriever.query_batcher is not None:
+        await run_in_threadpool(retriever.query_batcher.close)
 
 # Endpoints principales
 @app.get("/", response_model=Dict[str, str])
@@ -282,6 +328,7 @@ async def health_check():
         components = {
             "retriever": "healthy" if retriever else "unhealthy",
             "embedding_pipeline": "healthy" if embedding_pipeline else "unhealthy",
+            "ingestion_queue": "healthy" if ingestion_queue else "unhealthy",
             "database": "healthy"  # Simplificado para el ejemplo
         }
         
@@ -308,8 +355,10 @@ async def query_endpoint(request: QueryRequest, current_user: dict = Depends(ver
     query_id = str(uuid.uuid4())
     
     try:
-        # Realizar búsqueda semántica
-        search_results = retriever.search(
+        # Realizar búsqueda semántica fuera del event loop; las consultas
+        # concurrentes se agrupan en el micro-batching de embeddings
+        search_results = await run_in_threadpool(
+            retriever.search,
             query=request.question,
             user_type=request.user_type,
             top_k=5,
@@ -436,9 +485,16 @@ async def login_user(user_credentials: UserLogin):
         logger.error(f"Error en login: {str(e)}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-@app.post("/api/v1/documents/upload")
+def save_upload(path: str, content: bytes):
+    """Escribe un archivo subido en disco"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+
+@app.post("/api/v1/documents/upload", status_code=status.HTTP_202_ACCEPTED)
 @limiter.limit("5/minute")
 async def upload_document(
+    request: Request,
     file: UploadFile = File(...),
     document_type: str = Form(...),
     description: Optional[str] = Form(None),
@@ -446,6 +502,9 @@ async def upload_document(
 ):
     """
     Sube un nuevo documento al sistema.
+    
+    El documento se guarda y se encola para su ingesta; la respuesta incluye el
+    id del trabajo para consultar su estado en /api/v1/documents/jobs/{job_id}.
     """
     try:
         # Verificar permisos (solo admin puede subir documentos)
@@ -453,8 +512,9 @@ async def upload_document(
             raise HTTPException(status_code=403, detail="Permisos insuficientes")
         
         # Verificar tipo de archivo
-        allowed_extensions = ['.pdf', '.docx', '.xlsx']
-        file_extension = os.path.splitext(file.filename)[1].lower()
+        allowed_extensions = supported_extensions()
+        filename = os.path.basename(file.filename)
+        file_extension = os.path.splitext(filename)[1].lower()
         
         if file_extension not in allowed_extensions:
             raise HTTPException(
@@ -462,24 +522,41 @@ async def upload_document(
                 detail=f"Tipo de archivo no soportado. Permitidos: {allowed_extensions}"
             )
         
-        # Guardar archivo temporalmente
-        temp_path = f"data/temp/{file.filename}"
-        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        if document_type not in ALLOWED_DOCUMENT_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"document_type debe ser uno de: {ALLOWED_DOCUMENT_TYPES}"
+            )
         
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Guardar archivo temporalmente (fuera del event loop)
+        temp_path = f"data/temp/{uuid.uuid4().hex}_{filename}"
+        content = await file.read()
+        await run_in_threadpool(save_upload, temp_path, content)
         
-        # Procesar documento (simplificado)
-        # En producción, usar el pipeline completo de ingesta
+        # Encolar la ingesta; la respuesta no espera a que termine
+        try:
+            job = ingestion_queue.submit(
+                temp_path,
+                filename,
+                document_type,
+                submitted_by=current_user["username"],
+                description=description
+            )
+        except IngestionQueueFull as e:
+            os.remove(temp_path)
+            logger.error(f"Documento rechazado: {str(e)}")
+            raise HTTPException(status_code=503, detail="Cola de ingesta llena, intente más tarde")
         
-        logger.info(f"Documento subido: {file.filename}")
+        logger.info(f"Documento subido: {filename} (trabajo {job.job_id})")
         
         return {
-            "message": "Documento subido exitosamente",
-            "filename": file.filename,
+            "message": "Documento recibido, ingesta en curso",
+            "filename": filename,
             "document_type": document_type,
-            "size": len(content)
+            "size": len(content),
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": f"/api/v1/documents/jobs/{job.job_id}"
         }
         
     except HTTPException:
@@ -488,6 +565,21 @@ async def upload_document(
         logger.error(f"Error subiendo documento: {str(e)}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.get("/api/v1/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, current_user: dict = Depends(verify_token)):
+    """
+    Obtiene el estado de un trabajo de ingesta.
+    """
+    # Verificar permisos (solo admin)
+    if current_user["user_type"] != "admin":
+        raise HTTPException(status_code=403, detail="Permisos insuficientes")
+    
+    job = ingestion_queue.get(job_id) if ingestion_queue else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo de ingesta no encontrado")
+    
+    return job.to_dict()
+
 @app.get("/api/v1/analytics/usage")
 async def get_usage_analytics(current_user: dict = Depends(verify_token)):
     """
@@ -506,6 +598,7 @@ async def get_usage_analytics(current_user: dict = Depends(verify_token)):
         
         return {
             "search_analytics": search_analytics,
+            "model_registry": get_registry().get_stats(),
             "system_metrics": metrics.decode('utf-8'),
             "timestamp": datetime.now().isoformat()
         }
@@ -0,0 +1,264 @@
+"""
+Módulo: ingestion_queue.py
+Descripción: Cola asíncrona de trabajos de ingesta para los documentos subidos por la API.
+El endpoint de subida solo guarda el archivo y encola el trabajo; un número acotado de
+workers lo mueve al corpus y ejecuta la ingesta (parseo, división, embeddings y escritura)
+en un pool de hilos, fuera del event loop de uvicorn.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import sys
+import uuid
+import shutil
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest.ingest_data import incremental_ingest
+from ingest.manifest import DEFAULT_MANIFEST_PATH
+from retriever.snapshot import export_snapshot
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+def default_queue_workers() -> int:
+    """Workers de la cola (INGEST_QUEUE_WORKERS, por defecto 1; las ingestas se serializan)"""
+    return max(1, int(os.getenv("INGEST_QUEUE_WORKERS", "1")))
+
+def default_queue_size() -> int:
+    """Trabajos en espera admitidos (INGEST_QUEUE_SIZE, por defecto 100)"""
+    return max(1, int(os.getenv("INGEST_QUEUE_SIZE", "100")))
+
+class IngestionQueueFull(Exception):
+    """La cola de ingesta no admite más trabajos"""
+
+@dataclass
+class IngestionJob:
+    """Trabajo de ingesta de un documento subido"""
+    job_id: str
+    filename: str
+    temp_path: str
+    document_type: str
+    submitted_by: str
+    description: Optional[str] = None
+    status: str = JOB_QUEUED
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    file_path: Optional[str] = None
+    summary: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("temp_path")
+        return data
+
+class IngestionQueue:
+    """
+    Cola de ingesta con concurrencia acotada.
+
+    max_workers corutinas consumen una asyncio.Queue de tamaño máximo
+    max_queue_size y delegan cada ingesta en un ThreadPoolExecutor del mismo
+    tamaño. Todos los trabajos escriben en el mismo EmbeddingPipeline (store,
+    índice de pre-filtrado, vectores cuantizados, persist/flush y estadísticas
+    de batching), que no es seguro entre hilos: el movimiento del archivo al
+    corpus y su ingesta se ejecutan bajo un lock de escritura común. Un archivo
+    con el nombre de otro ya existente se guarda con un sufijo numérico. El manifiesto y el índice
+    de secciones se recargan bajo su propio lock por si otro proceso (la CLI
+    de ingesta) los modificó. Si la API lee un snapshot (solo lectura), el
+    pipeline escribe en el backend de origen y cada trabajo exporta un
+    snapshot nuevo en snapshot_root.
+    """
+
+    def __init__(self, pipeline, docs_path: str = "data/docs",
+                 manifest_path: str = DEFAULT_MANIFEST_PATH,
+                 max_workers: Optional[int] = None,
+                 max_queue_size: Optional[int] = None,
+                 max_history: int = 1000,
+                 snapshot_root: Optional[str] = None):
+        """
+        Inicializa la cola.
+
+        Args:
+            pipeline: EmbeddingPipeline compartido por los trabajos
+            docs_path (str): Directorio del corpus donde se guardan los documentos
+            manifest_path (str): Ruta del manifiesto de ingesta
+            max_workers (Optional[int]): Trabajos simultáneos
+            max_queue_size (Optional[int]): Trabajos en espera admitidos
+            max_history (int): Trabajos terminados que se conservan para consulta
+            snapshot_root (Optional[str]): Directorio de snapshots que se exportan tras cada
+                ingesta (si la API usa el backend snapshot)
+        """
+        self.pipeline = pipeline
+        self.docs_path = docs_path
+        self.manifest_path = manifest_path
+        self.max_workers = max_workers or default_queue_workers()
+        self.max_queue_size = max_queue_size or default_queue_size()
+        self.max_history = max_history
+        self.snapshot_root = snapshot_root
+
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers: List[asyncio.Task] = []
+        self._manifest_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    async def start(self):
+        """Inicia los workers (llamar desde el evento de startup)"""
+        if self._workers:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+        self._workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.max_workers)
+        ]
+        logger.info(f"Cola de ingesta iniciada con {self.max_workers} workers")
+
+    async def stop(self):
+        """Detiene los workers; los trabajos en curso terminan antes de cerrar el pool"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self._executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+            self._executor = None
+        logger.info("Cola de ingesta detenida")
+
+    def submit(self, temp_path: str, filename: str, document_type: str,
+               submitted_by: str, description: Optional[str] = None) -> IngestionJob:
+        """
+        Encola un documento ya guardado en disco.
+
+        Returns:
+            IngestionJob: Trabajo creado (estado "queued")
+
+        Raises:
+            IngestionQueueFull: Si la cola está llena o no fue iniciada
+        """
+        if self._queue is None:
+            raise IngestionQueueFull("La cola de ingesta no está iniciada")
+
+        job = IngestionJob(
+            job_id=str(uuid.uuid4()),
+            filename=filename,
+            temp_path=temp_path,
+            document_type=document_type,
+            submitted_by=submitted_by,
+            description=description
+        )
+
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestionQueueFull(f"Cola de ingesta llena ({self.max_queue_size} trabajos en espera)")
+
+        self.jobs[job.job_id] = job
+        self._prune_history()
+        logger.info(f"Trabajo de ingesta {job.job_id} encolado: {filename}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Trabajo por id"""
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Número de trabajos por estado"""
+        counts = {JOB_QUEUED: 0, JOB_PROCESSING: 0, JOB_COMPLETED: 0, JOB_FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    def _prune_history(self):
+        """Descarta los trabajos terminados más antiguos"""
+        finished = [
+            job_id for job_id, job in self.jobs.items()
+            if job.status in (JOB_COMPLETED, JOB_FAILED)
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self.jobs[job_id]
+
+    async def _worker(self, worker_id: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                job.status = JOB_PROCESSING
+                job.started_at = datetime.now().isoformat()
+                job.summary = await loop.run_in_executor(self._executor, self._run_job, job)
+                job.status = JOB_COMPLETED
+                logger.info(f"Trabajo de ingesta {job.job_id} completado: {job.summary}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.status = JOB_FAILED
+                job.error = str(e)
+                logger.error(f"Error en trabajo de ingesta {job.job_id}: {str(e)}")
+
+            finally:
+                if job.status != JOB_PROCESSING:
+                    job.finished_at = datetime.now().isoformat()
+                self._queue.task_done()
+
+    def _corpus_path(self, filename: str) -> str:
+        """
+        Ruta libre en el corpus para un archivo subido.
+
+        Si ya existe un documento con ese nombre se agrega un sufijo numérico
+        (reglamento.pdf -> reglamento_1.pdf) en lugar de reemplazarlo.
+        """
+        file_path = os.path.join(self.docs_path, filename)
+        stem, extension = os.path.splitext(filename)
+        suffix = 1
+        while os.path.exists(file_path):
+            file_path = os.path.join(self.docs_path, f"{stem}_{suffix}{extension}")
+            suffix += 1
+        if suffix > 1:
+            logger.warning(f"Ya existe {filename} en el corpus; se guarda como {os.path.basename(file_path)}")
+        return file_path
+
+    def _run_job(self, job: IngestionJob) -> Dict[str, Any]:
+        """Mueve el archivo al corpus y lo ingiere (se ejecuta en el pool de hilos)"""
+        # Una ingesta a la vez sobre el pipeline compartido; el archivo se mueve bajo
+        # el mismo lock para que ningún trabajo reemplace uno que otro está leyendo
+        with self._write_lock:
+            os.makedirs(self.docs_path, exist_ok=True)
+            file_path = self._corpus_path(job.filename)
+            shutil.move(job.temp_path, file_path)
+            job.file_path = file_path
+
+            summary = incremental_ingest(
+                path=self.docs_path,
+                manifest_path=self.manifest_path,
+                pipeline=self.pipeline,
+                max_workers=1,
+                file_paths=[file_path],
+                document_types={file_path: job.document_type},
+                lock=self._manifest_lock
+            )
+
+            if self.snapshot_root is not None:
+                # Los retrievers cambian al snapshot nuevo al recargar
+                summary["snapshot"] = export_snapshot(
+                    self.pipeline.vector_db.store, self.snapshot_root, self.manifest_path
+                )["id"]
+            return summary
@@ -0,0 +1,188 @@
+"""
+Módulo: bench_embeddings.py
+Descripción: Benchmark de rendimiento de EmbeddingGenerator. Recorre combinaciones de backend,
+hilos, tamaño de lote y distribución de longitudes de texto (chunks reales de data/docs,
+fragmentos cortos y textos largos) y reporta textos/s, tokens/s, latencia p50/p99 por lote y
+RSS máximo, para medir regresiones y ajustar la configuración. Cada configuración se ejecuta
+en un proceso propio para que el RSS máximo sea el suyo y no el acumulado de las anteriores.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+
+Uso:
+    python src/benchmarks/bench_embeddings.py --batch-sizes 16 32 64 --threads 1 4 --output report/bench_embeddings.json
+    python src/benchmarks/bench_embeddings.py --backends torch onnx --lengths chunks long
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import resource
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest.loaders import parse_file, supported_extensions
+from ingest.text_splitter import FastTextSplitter
+from embeddings.generate_embeddings import EmbeddingGenerator
+from embeddings.batching import plan_fixed_batches, plan_token_batches
+from embeddings.onnx_backend import BACKEND_TORCH, BACKEND_ONNX, load_embedding_model
+
+LENGTH_DISTRIBUTIONS = ("chunks", "short", "long")
+
+def load_texts(path: str, distribution: str, count: int, chunk_size: int = 600, chunk_overlap: int = 80):
+    """
+    Textos de data/docs con la distribución de longitudes pedida.
+
+    chunks: los chunks que produce la ingesta; short: las primeras 120 letras
+    de cada chunk (consultas, títulos, ítems de menú); long: chunks
+    consecutivos unidos hasta ~2000 caracteres (el modelo los trunca).
+    """
+    pages = []
+    for file_path in sorted(glob.glob(os.path.join(path, "*"))):
+        if os.path.splitext(file_path)[1].lower() in supported_extensions():
+            pages.extend(page["page_content"] for page in parse_file(file_path))
+
+    splitter = FastTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = [chunk for page in pages for chunk in splitter.split_text(page)]
+    if not chunks:
+        raise ValueError(f"No hay documentos en {path}")
+
+    if distribution == "short":
+        texts = [chunk[:120] for chunk in chunks]
+    elif distribution == "long":
+        texts = ["\n".join(chunks[i:i + 4]) for i in range(0, len(chunks), 4)]
+    else:
+        texts = chunks
+
+    # Repetir el corpus hasta count textos
+    return list(itertools.islice(itertools.cycle(texts), count))
+
+def peak_rss_mb() -> float:
+    """
+    RSS máximo del proceso en MB.
+
+    En Linux se lee VmHWM, que empieza de cero en cada proceso lanzado con
+    spawn; ru_maxrss conserva tras exec el máximo del proceso padre. En otros
+    sistemas se usa ru_maxrss (KB en Linux, bytes en macOS).
+    """
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def make_generator(model_name: str, backend: str, threads: int) -> EmbeddingGenerator:
+    """Generador sin caché con el número de hilos indicado"""
+    import torch
+
+    torch.set_num_threads(threads)
+    generator = EmbeddingGenerator(model_name, use_cache=False, backend=backend)
+    generator.device = "cpu"
+    if backend == BACKEND_ONNX:
+        # Los hilos de ONNX Runtime se fijan al crear la sesión: una sesión por configuración
+        generator.model = load_embedding_model(num_threads=threads)
+        generator.embedding_dim = generator.model.get_sentence_embedding_dimension()
+    else:
+        generator.load_model()
+    return generator
+
+def run_config(generator: EmbeddingGenerator, texts, batch_size: int, max_batch_tokens: int):
+    """Codifica los textos lote a lote y mide cada lote"""
+    lengths = generator.count_tokens(texts)
+    if max_batch_tokens > 0:
+        batches = plan_token_batches(lengths, max_batch_tokens, batch_size)
+    else:
+        batches = plan_fixed_batches(len(texts), batch_size)
+
+    # Calentamiento (primer lote fuera de la medición)
+    generator.encode_normalized([texts[i] for i in batches[0]])
+
+    latencies = []
+    start = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        generator.encode_normalized([texts[i] for i in batch])
+        latencies.append(time.perf_counter() - batch_start)
+    seconds = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    tokens = sum(lengths)
+    return {
+        "texts": len(texts),
+        "batches": len(batches),
+        "tokens": tokens,
+        "mean_tokens_per_text": round(tokens / len(texts), 1),
+        "seconds": round(seconds, 3),
+        "texts_per_second": round(len(texts) / seconds, 2),
+        "tokens_per_second": round(tokens / seconds, 1),
+        "batch_p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "batch_p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+def run_isolated(model_name: str, backend: str, threads: int, texts, batch_size: int, max_batch_tokens: int):
+    """Carga el modelo y mide una configuración; se ejecuta en un proceso nuevo"""
+    generator = make_generator(model_name, backend, threads)
+    return run_config(generator, texts, batch_size, max_batch_tokens)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de rendimiento de EmbeddingGenerator")
+    parser.add_argument("--docs", default="data/docs", help="Directorio del corpus")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"))
+    parser.add_argument("--backends", nargs="+", default=[BACKEND_TORCH], choices=[BACKEND_TORCH, BACKEND_ONNX])
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1], help="Hilos de inferencia")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--lengths", nargs="+", default=list(LENGTH_DISTRIBUTIONS), choices=LENGTH_DISTRIBUTIONS,
+                        help="Distribuciones de longitud de texto")
+    parser.add_argument("--max-batch-tokens", type=int, default=0,
+                        help="Presupuesto de tokens por lote (0 = lotes fijos de --batch-sizes)")
+    parser.add_argument("--texts", type=int, default=512, help="Textos por configuración")
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    corpora = {distribution: load_texts(args.docs, distribution, args.texts) for distribution in args.lengths}
+
+    # "spawn": el proceso hijo no hereda el modelo ni la memoria del padre
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend, threads in itertools.product(args.backends, args.threads):
+        for distribution, batch_size in itertools.product(args.lengths, args.batch_sizes):
+            with context.Pool(1) as pool:
+                result = pool.apply(run_isolated, (args.model, backend, threads, corpora[distribution],
+                                                   batch_size, args.max_batch_tokens))
+            result.update(backend=backend, threads=threads, lengths=distribution, batch_size=batch_size)
+            results.append(result)
+            print(
+                f"{backend:>5} {threads:>2} hilos {distribution:>6} lote {batch_size:>3}: "
+                f"{result['texts_per_second']:>8.1f} textos/s {result['tokens_per_second']:>9.0f} tokens/s "
+                f"p50 {result['batch_p50_ms']:.1f} ms p99 {result['batch_p99_ms']:.1f} ms "
+                f"RSS {result['peak_rss_mb']:.0f} MB"
+            )
+
+    best = max(results, key=lambda result: result["tokens_per_second"])
+    report = {
+        "model": args.model,
+        "texts_per_config": args.texts,
+        "max_batch_tokens": args.max_batch_tokens,
+        "cpu_count": os.cpu_count(),
+        "best": {key: best[key] for key in ("backend", "threads", "lengths", "batch_size", "tokens_per_second")},
+        "results": results
+    }
+    print(f"Mejor configuración: {report['best']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
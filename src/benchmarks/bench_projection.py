@@ -0,0 +1,113 @@
+"""
+Módulo: bench_projection.py
+Descripción: Benchmark de la reducción de dimensión del índice en memoria. Compara PCA y
+truncación a varias dimensiones contra la búsqueda exacta en float32: recall@k, bytes del
+índice y latencia por consulta. Los vectores salen de la colección de ChromaDB o se generan
+con estructura de bajo rango (los embeddings reales concentran la varianza en pocas
+direcciones; con ruido isotrópico PCA no tendría nada que conservar).
+Autor: Tania Herrera
+Fecha: Octubre 2025
+
+Uso:
+    python src/benchmarks/bench_projection.py --vector-db data/vector_db --dims 64 128 192
+    python src/benchmarks/bench_projection.py --synthetic 100000 --dim 384 --output report/bench_projection.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings.projection import VectorProjection, PROJECTION_PCA, PROJECTION_TRUNCATE
+from embeddings.quantization import recall_at_k
+from benchmarks.bench_quantization import load_vectors, exact_search
+
+def structured_vectors(count: int, dim: int, rank: int = 48, seed: int = 0) -> np.ndarray:
+    """Vectores normalizados con varianza concentrada en `rank` direcciones"""
+    rng = np.random.default_rng(seed)
+    scales = (1.0 / np.sqrt(np.arange(1, rank + 1))).astype(np.float32)
+    latent = rng.standard_normal((count, rank)).astype(np.float32) * scales
+    vectors = latent @ rng.standard_normal((rank, dim)).astype(np.float32)
+    vectors += rng.standard_normal((count, dim)).astype(np.float32) * 0.05
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de proyección del índice (PCA / truncación)")
+    parser.add_argument("--vector-db", default="data/vector_db", help="Directorio de ChromaDB")
+    parser.add_argument("--synthetic", type=int, default=0, help="Usar N vectores sintéticos en lugar de la colección")
+    parser.add_argument("--dim", type=int, default=384, help="Dimensión de los vectores sintéticos")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 192], help="Dimensiones a evaluar")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = structured_vectors(args.synthetic, args.dim)
+    else:
+        vectors = load_vectors(args.vector_db)
+    print(f"Vectores: {len(vectors)} x {vectors.shape[1]}")
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.05
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    k = min(args.k, len(vectors))
+    exact, exact_ms = exact_search(vectors, queries, k)
+    results = {"float32": {"dims": int(vectors.shape[1]), "bytes": int(vectors.nbytes), "ms_per_query": round(exact_ms, 3)}}
+    print(f"{'float32':>14}: {vectors.nbytes / 1e6:.1f} MB, {exact_ms:.2f} ms/consulta")
+
+    for mode in (PROJECTION_PCA, PROJECTION_TRUNCATE):
+        for dims in args.dims:
+            if dims >= vectors.shape[1]:
+                continue
+
+            start = time.perf_counter()
+            projection = VectorProjection(mode, dims)
+            projection.fit(vectors)
+            fit_seconds = time.perf_counter() - start
+
+            projected = projection.transform(vectors)
+            # La proyección de la consulta forma parte de la latencia
+            start = time.perf_counter()
+            projected_queries = projection.transform(queries)
+            project_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            approximate, search_ms = exact_search(projected, projected_queries, k)
+            ms = project_ms + search_ms
+
+            name = f"{mode}-{dims}"
+            results[name] = {
+                "dims": dims,
+                "bytes": int(projected.nbytes),
+                "compression": round(vectors.nbytes / projected.nbytes, 2),
+                "ms_per_query": round(ms, 3),
+                "fit_seconds": round(fit_seconds, 3),
+                "explained_variance": projection.explained_variance,
+                "recall": {f"@{n}": round(recall_at_k(exact, approximate, n), 4) for n in (1, 5, k) if n <= k}
+            }
+            print(
+                f"{name:>14}: {projected.nbytes / 1e6:.1f} MB ({results[name]['compression']}x), "
+                f"{ms:.2f} ms/consulta, recall {results[name]['recall']}"
+            )
+
+    report = {
+        "source": "synthetic" if args.synthetic else args.vector_db,
+        "vectors": len(vectors),
+        "dimension": int(vectors.shape[1]),
+        "queries": len(queries),
+        "k": k,
+        "results": results
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
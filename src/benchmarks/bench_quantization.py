@@ -0,0 +1,120 @@
+"""
+Módulo: bench_quantization.py
+Descripción: Benchmark del almacenamiento cuantizado de vectores. Compara float16 e int8
+contra la búsqueda exacta en float32 sobre los embeddings de la colección de ChromaDB o
+sobre vectores sintéticos normalizados: recall@k, bytes del índice y latencia por consulta.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+
+Uso:
+    python src/benchmarks/bench_quantization.py --vector-db data/vector_db --output report/bench_quantization.json
+    python src/benchmarks/bench_quantization.py --synthetic 100000 --dim 384
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings.quantization import QuantizedVectorStore, STORAGE_FLOAT16, STORAGE_INT8, recall_at_k
+
+def load_vectors(vector_db: str, batch_size: int = 5000) -> np.ndarray:
+    """Embeddings float32 de la colección school_documents (store de VECTOR_INDEX_BACKEND)"""
+    from retriever.vector_store import create_vector_store
+
+    store = create_vector_store(vector_db)
+
+    batches = []
+    offset = 0
+    while True:
+        results = store.get(include=("embeddings",), limit=batch_size, offset=offset)
+        if not results["ids"]:
+            break
+        batches.append(results["embeddings"])
+        offset += len(results["ids"])
+    return np.concatenate(batches)
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Vectores aleatorios normalizados"""
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_search(vectors: np.ndarray, queries: np.ndarray, k: int):
+    """Top-k exacto en float32 y milisegundos por consulta"""
+    start = time.perf_counter()
+    results = []
+    for query in queries:
+        scores = vectors @ query
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        results.append([str(i) for i in candidates[np.argsort(-scores[candidates])]])
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de vectores cuantizados (float16 / int8)")
+    parser.add_argument("--vector-db", default="data/vector_db", help="Directorio de ChromaDB")
+    parser.add_argument("--synthetic", type=int, default=0, help="Usar N vectores aleatorios en lugar de la colección")
+    parser.add_argument("--dim", type=int, default=384, help="Dimensión de los vectores sintéticos")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+    else:
+        vectors = load_vectors(args.vector_db)
+    print(f"Vectores: {len(vectors)} x {vectors.shape[1]}")
+
+    # Consultas: vectores del corpus con ruido, para que tengan vecinos cercanos
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.05
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    k = min(args.k, len(vectors))
+    exact, exact_ms = exact_search(vectors, queries, k)
+    results = {"float32": {"bytes": int(vectors.nbytes), "ms_per_query": round(exact_ms, 3)}}
+    print(f"   float32: {vectors.nbytes / 1e6:.1f} MB, {exact_ms:.2f} ms/consulta")
+
+    ids = [str(i) for i in range(len(vectors))]
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in (STORAGE_FLOAT16, STORAGE_INT8):
+            store = QuantizedVectorStore(os.path.join(tmp, f"{mode}.npz"), mode)
+            store.upsert(ids, vectors)
+
+            start = time.perf_counter()
+            approximate = [[chunk_id for chunk_id, _ in store.search(query, k)] for query in queries]
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            results[mode] = {
+                "bytes": store.nbytes,
+                "compression": round(vectors.nbytes / store.nbytes, 2),
+                "ms_per_query": round(ms, 3),
+                "recall": {f"@{n}": round(recall_at_k(exact, approximate, n), 4) for n in (1, 5, k) if n <= k}
+            }
+            print(
+                f"{mode:>10}: {store.nbytes / 1e6:.1f} MB ({results[mode]['compression']}x), "
+                f"{ms:.2f} ms/consulta, recall {results[mode]['recall']}"
+            )
+
+    report = {
+        "source": "synthetic" if args.synthetic else args.vector_db,
+        "vectors": len(vectors),
+        "dimension": int(vectors.shape[1]),
+        "queries": len(queries),
+        "k": k,
+        "results": results
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Módulo: bench_text_splitter.py
+Descripción: Benchmark del divisor FastTextSplitter contra RecursiveCharacterTextSplitter
+de LangChain sobre el corpus de data/docs replicado N veces (por defecto 1000x).
+Verifica además que ambos produzcan exactamente los mismos chunks.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+
+Uso:
+    python src/benchmarks/bench_text_splitter.py --scale 1000 --output report/bench_splitter.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest.loaders import parse_file
+from ingest.text_splitter import FastTextSplitter
+
+def load_corpus(path: str, scale: int):
+    """Textos de data/docs repetidos `scale` veces (cada copia es un documento)"""
+    texts = []
+    for file_path in sorted(glob.glob(os.path.join(path, "*.txt"))):
+        texts.extend(page["page_content"] for page in parse_file(file_path))
+    return texts * scale
+
+def run_splitter(splitter, texts, repeats: int):
+    """Mejor tiempo de `repeats` ejecuciones y los chunks producidos"""
+    best = float("inf")
+    chunks = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = [chunk for text in texts for chunk in splitter.split_text(text)]
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de divisores de texto")
+    parser.add_argument("--docs", default="data/docs", help="Directorio del corpus")
+    parser.add_argument("--scale", type=int, default=1000, help="Veces que se replica el corpus")
+    parser.add_argument("--chunk-size", type=int, default=600)
+    parser.add_argument("--chunk-overlap", type=int, default=80)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.docs, args.scale)
+    total_mb = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    print(f"Corpus: {len(texts)} documentos, {total_mb:.1f} MB")
+
+    splitters = {
+        "langchain": RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+        "fast": FastTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+    }
+
+    results = {}
+    outputs = {}
+    for name, splitter in splitters.items():
+        seconds, chunks = run_splitter(splitter, texts, args.repeats)
+        outputs[name] = chunks
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "chunks": len(chunks),
+            "mb_per_second": round(total_mb / seconds, 2),
+            "chunks_per_second": round(len(chunks) / seconds, 1)
+        }
+        print(f"{name:>10}: {seconds:.3f} s, {len(chunks)} chunks, {total_mb / seconds:.1f} MB/s")
+
+    report = {
+        "scale": args.scale,
+        "documents": len(texts),
+        "corpus_mb": round(total_mb, 2),
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+        "identical_output": outputs["langchain"] == outputs["fast"],
+        "speedup": round(results["langchain"]["seconds"] / results["fast"]["seconds"], 2),
+        "results": results
+    }
+    print(f"Salida idéntica: {report['identical_output']}, speedup: {report['speedup']}x")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
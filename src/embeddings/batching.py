@@ -0,0 +1,137 @@
+"""
+Módulo: batching.py
+Descripción: Agrupación de textos por longitud para la generación de embeddings. Los textos
+se ordenan por número de tokens y se agrupan bajo un presupuesto de tokens con relleno
+(tamaño del lote x texto más largo del lote) en lugar de un número fijo de textos, de modo
+que los fragmentos cortos de circulares y menús no se rellenan hasta el largo de un
+reglamento. El orden original se restaura al devolver los vectores.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Sequence
+
+DEFAULT_MAX_BATCH_TOKENS = 4096
+DEFAULT_MAX_BATCH_SIZE = 256
+
+def default_max_batch_tokens() -> int:
+    """Presupuesto de tokens por lote (EMBEDDING_BATCH_TOKENS); 0 usa lotes de tamaño fijo"""
+    return max(0, int(os.getenv("EMBEDDING_BATCH_TOKENS", str(DEFAULT_MAX_BATCH_TOKENS))))
+
+@dataclass
+class BatchingStats:
+    """Estadísticas de rendimiento de la generación de embeddings"""
+    texts: int = 0
+    batches: int = 0
+    tokens: int = 0
+    padded_tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.texts / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def padding_ratio(self) -> float:
+        """Fracción de posiciones de relleno sobre el total procesado"""
+        if self.padded_tokens == 0:
+            return 0.0
+        return 1.0 - self.tokens / self.padded_tokens
+
+    def add_batch(self, lengths: Sequence[int], seconds: float):
+        """Acumula un lote ya procesado"""
+        self.texts += len(lengths)
+        self.batches += 1
+        self.tokens += sum(lengths)
+        self.padded_tokens += len(lengths) * max(lengths, default=0)
+        self.seconds += seconds
+
+    def merge(self, other: "BatchingStats"):
+        """Acumula las estadísticas de otra ejecución"""
+        self.texts += other.texts
+        self.batches += other.batches
+        self.tokens += other.tokens
+        self.padded_tokens += other.padded_tokens
+        self.seconds += other.seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["texts_per_second"] = round(self.texts_per_second, 2)
+        data["tokens_per_second"] = round(self.tokens_per_second, 2)
+        data["padding_ratio"] = round(self.padding_ratio, 4)
+        return data
+
+@dataclass
+class WriteStats:
+    """Estadísticas de escritura en la base de datos vectorial"""
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def add_batch(self, rows: int, seconds: float):
+        """Acumula un lote ya escrito"""
+        self.rows += rows
+        self.batches += 1
+        self.seconds += seconds
+
+    def merge(self, other: "WriteStats"):
+        """Acumula las estadísticas de otra escritura"""
+        self.rows += other.rows
+        self.batches += other.batches
+        self.seconds += other.seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["rows_per_second"] = round(self.rows_per_second, 2)
+        return data
+
+def plan_fixed_batches(count: int, batch_size: int) -> List[List[int]]:
+    """Lotes de tamaño fijo en el orden de entrada"""
+    return [list(range(i, min(i + batch_size, count))) for i in range(0, count, batch_size)]
+
+def plan_token_batches(lengths: Sequence[int], max_batch_tokens: int,
+                       max_batch_size: Optional[int] = DEFAULT_MAX_BATCH_SIZE) -> List[List[int]]:
+    """
+    Agrupa índices de textos ordenados por longitud bajo un presupuesto de tokens.
+
+    Un lote admite un texto más mientras (textos + 1) x longitud máxima del
+    lote no supere max_batch_tokens. Un texto que por sí solo excede el
+    presupuesto forma su propio lote.
+
+    Args:
+        lengths (Sequence[int]): Tokens de cada texto
+        max_batch_tokens (int): Tokens con relleno admitidos por lote
+        max_batch_size (Optional[int]): Textos máximos por lote
+
+    Returns:
+        List[List[int]]: Índices de los textos de cada lote
+    """
+    # De mayor a menor: el primer texto de cada lote fija su longitud de relleno
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+    batches = []
+    current: List[int] = []
+    current_max = 0
+    for index in order:
+        length = max(1, lengths[index])
+        longest = max(current_max, length)
+        full = max_batch_size is not None and len(current) >= max_batch_size
+        if current and (full or (len(current) + 1) * longest > max_batch_tokens):
+            batches.append(current)
+            current, longest = [], length
+        current.append(index)
+        current_max = longest
+
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,217 @@
+"""
+Módulo: embedding_cache.py
+Descripción: Caché persistente de embeddings en SQLite. Cada vector se guarda como blob
+float32 con clave (modelo, hash SHA-256 del texto normalizado), de modo que reingerir un
+corpus sin cambios o repetir la demo no vuelve a ejecutar el modelo. El tamaño se acota
+con expulsión LRU y se registran aciertos y fallos.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "data/vector_db/embedding_cache.sqlite"
+DEFAULT_CACHE_SIZE = 200_000
+
+# Límite de parámetros por sentencia en versiones antiguas de SQLite
+SQLITE_MAX_PARAMS = 900
+
+def default_cache_path() -> Optional[str]:
+    """Ruta de la caché (EMBEDDING_CACHE_PATH); vacía desactiva la caché"""
+    return os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH) or None
+
+def default_cache_size() -> int:
+    """Vectores máximos en caché (EMBEDDING_CACHE_SIZE, por defecto 200000)"""
+    return max(1, int(os.getenv("EMBEDDING_CACHE_SIZE", str(DEFAULT_CACHE_SIZE))))
+
+def text_key(text: str) -> bytes:
+    """Hash SHA-256 del texto con los espacios normalizados"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).digest()
+
+@dataclass
+class CacheStats:
+    """Contadores de uso de la caché"""
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+class EmbeddingCache:
+    """
+    Caché de embeddings en disco con expulsión LRU.
+
+    Cada acierto actualiza last_used; al superar max_entries se eliminan los
+    vectores usados hace más tiempo. Una misma conexión se comparte entre
+    hilos (la cola de ingesta y la API) protegida por un lock.
+    """
+
+    def __init__(self, cache_path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_CACHE_SIZE):
+        """
+        Inicializa la caché.
+
+        Args:
+            cache_path (str): Archivo SQLite de la caché
+            max_entries (int): Número máximo de vectores almacenados
+        """
+        self.cache_path = cache_path
+        self.max_entries = max(1, max_entries)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        logger.info(f"Caché de embeddings en {cache_path}: {self._entries} vectores")
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Busca los embeddings de varios textos.
+
+        Args:
+            model_name (str): Modelo que generó los vectores
+            texts (Sequence[str]): Textos a buscar
+
+        Returns:
+            List[Optional[np.ndarray]]: Vector float32 por texto, o None si no está en caché
+        """
+        keys = [text_key(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        now = time.time_ns()
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), SQLITE_MAX_PARAMS):
+                chunk = unique_keys[i:i + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *chunk]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model_name, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for vector in results if vector is not None)
+            self.stats.hits += hits
+            self.stats.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """
+        Guarda los embeddings de varios textos y aplica la expulsión LRU.
+
+        Args:
+            model_name (str): Modelo que generó los vectores
+            texts (Sequence[str]): Textos
+            vectors (Sequence[np.ndarray]): Vectores correspondientes
+        """
+        if len(texts) != len(vectors):
+            raise ValueError("El número de textos y de vectores no coincide")
+
+        now = time.time_ns()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            key = text_key(text)
+            vector = np.ascontiguousarray(vector, dtype=np.float32)
+            rows[key] = (model_name, key, vector.shape[-1], vector.tobytes(), now)
+
+        if not rows:
+            return
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                list(rows.values())
+            )
+            self._entries += self._conn.total_changes - before
+            self.stats.stores += len(rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Elimina los vectores menos usados recientemente (requiere el lock)"""
+        overflow = self._entries - self.max_entries
+        if overflow <= 0:
+            return
+
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE (model, text_hash) IN (
+                SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?
+            )
+            """,
+            (overflow,)
+        )
+        self._entries -= overflow
+        self.stats.evictions += overflow
+        logger.info(f"Caché de embeddings: {overflow} vectores expulsados (LRU)")
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de uso y tamaño actual"""
+        data = asdict(self.stats)
+        data["hit_ratio"] = self.stats.hit_ratio
+        data["entries"] = self._entries
+        data["max_entries"] = self.max_entries
+        return data
+
+    def close(self):
+        """Cierra la conexión"""
+        with self._lock:
+            self._conn.close()
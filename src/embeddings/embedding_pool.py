@@ -0,0 +1,164 @@
+"""
+Módulo: embedding_pool.py
+Descripción: Pool de procesos para generar embeddings en todos los núcleos. Cada worker
+carga su propia copia del modelo con un número fijo de hilos (y, en Linux, afinidad a un
+bloque de núcleos propio), de modo que los procesos no compiten por los mismos núcleos.
+Los textos se reparten en fragmentos contiguos y los vectores se reúnen en el orden de
+entrada.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from embeddings.batching import BatchingStats
+
+logger = logging.getLogger(__name__)
+
+# Textos mínimos por fragmento enviado a un worker
+MIN_SHARD_SIZE = 32
+# Fragmentos por worker para equilibrar la carga entre textos cortos y largos
+SHARDS_PER_WORKER = 4
+
+def default_pool_workers() -> int:
+    """Procesos de embeddings (EMBEDDING_WORKERS; 0 o 1 = sin pool)"""
+    return max(0, int(os.getenv("EMBEDDING_WORKERS", "0")))
+
+def default_threads_per_worker(num_workers: int) -> int:
+    """Hilos por worker (EMBEDDING_THREADS_PER_WORKER, por defecto núcleos / workers)"""
+    value = os.getenv("EMBEDDING_THREADS_PER_WORKER")
+    if value:
+        return max(1, int(value))
+    return max(1, (os.cpu_count() or 1) // max(1, num_workers))
+
+# Estado de cada proceso worker
+_worker_generator = None
+
+def _init_worker(model_name: str, backend: str, threads: int, counter, pin_cores: bool):
+    """Carga el modelo en el worker con hilos y núcleos fijos"""
+    global _worker_generator
+
+    # Antes de importar torch/onnxruntime para que respeten el límite de hilos
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+
+    with counter.get_lock():
+        worker_index = counter.value
+        counter.value += 1
+
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        block = cores[worker_index * threads:(worker_index + 1) * threads]
+        if len(block) == threads:
+            os.sched_setaffinity(0, block)
+
+    import torch
+    from embeddings.generate_embeddings import EmbeddingGenerator
+    from embeddings.onnx_backend import BACKEND_ONNX, load_embedding_model
+
+    torch.set_num_threads(threads)
+
+    generator = EmbeddingGenerator(model_name, use_cache=False, backend=backend)
+    generator.device = "cpu"
+    if backend == BACKEND_ONNX:
+        generator.model = load_embedding_model(num_threads=threads)
+        generator.embedding_dim = generator.model.get_sentence_embedding_dimension()
+    else:
+        generator.load_model()
+    _worker_generator = generator
+
+def _encode_shard(texts: List[str]) -> Tuple[np.ndarray, BatchingStats]:
+    """Codifica un fragmento de textos en el worker"""
+    embeddings = _worker_generator.generate_embeddings_batch(texts)
+    return embeddings, _worker_generator.last_batching_stats
+
+class EmbeddingWorkerPool:
+    """
+    Pool de procesos con una copia del modelo por worker.
+
+    Se inicia en el primer uso y se cierra con close(). Los procesos se crean
+    con "spawn" para no heredar hilos de torch del proceso principal.
+    """
+
+    def __init__(self, model_name: str, backend: str, num_workers: int,
+                 threads_per_worker: Optional[int] = None, pin_cores: bool = True):
+        """
+        Inicializa el pool.
+
+        Args:
+            model_name (str): Modelo de embeddings
+            backend (str): "torch" u "onnx"
+            num_workers (int): Procesos worker
+            threads_per_worker (Optional[int]): Hilos por worker
+            pin_cores (bool): Fijar cada worker a un bloque de núcleos propio (Linux)
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(self.num_workers)
+        self.pin_cores = pin_cores
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        """Crea los procesos y carga el modelo en cada uno"""
+        if self._executor is not None:
+            return
+
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.backend, self.threads_per_worker,
+                      context.Value("i", 0), self.pin_cores)
+        )
+        logger.info(
+            f"Pool de embeddings iniciado: {self.num_workers} workers x "
+            f"{self.threads_per_worker} hilos (backend {self.backend})"
+        )
+
+    def close(self):
+        """Detiene los procesos"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            logger.info("Pool de embeddings detenido")
+
+    def shard(self, count: int) -> List[Tuple[int, int]]:
+        """Rangos [inicio, fin) de los fragmentos para count textos"""
+        if count == 0:
+            return []
+        shards = min(self.num_workers * SHARDS_PER_WORKER, max(1, count // MIN_SHARD_SIZE))
+        size = -(-count // shards)
+        return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+    def encode(self, texts: List[str]) -> Tuple[np.ndarray, BatchingStats]:
+        """
+        Genera los embeddings normalizados de los textos en los workers.
+
+        Args:
+            texts (List[str]): Textos a codificar
+
+        Returns:
+            Tuple[np.ndarray, BatchingStats]: Matriz (n, dim) en el orden de entrada y
+            estadísticas agregadas (los segundos son de reloj, no la suma de los workers)
+        """
+        self.start()
+        start_time = time.perf_counter()
+
+        ranges = self.shard(len(texts))
+        results = list(self._executor.map(_encode_shard, [texts[start:end] for start, end in ranges]))
+
+        stats = BatchingStats()
+        for _, shard_stats in results:
+            stats.merge(shard_stats)
+        stats.seconds = time.perf_counter() - start_time
+
+        return np.concatenate([embeddings for embeddings, _ in results]), stats
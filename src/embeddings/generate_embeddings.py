@@ -14,9 +14,13 @@ contenido en español y el contexto educativo.
 """
 
 import os
+import sys
+import time
 import logging
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Callable, Set, Union
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pickle
 import json
@@ -27,14 +31,49 @@ from sentence_transformers import SentenceTransformer
 import torch
 from transformers import AutoTokenizer, AutoModel
 
-# Dependencias para base de datos vectorial
-import chromadb
-from chromadb.config import Settings
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings.embedding_cache import EmbeddingCache, default_cache_path, default_cache_size
+from embeddings.batching import BatchingStats, WriteStats, plan_fixed_batches, plan_token_batches, default_max_batch_tokens
+from embeddings.onnx_backend import BACKEND_ONNX, default_backend
+from embeddings.model_registry import get_registry, model_lock
+from embeddings.embedding_pool import EmbeddingWorkerPool, default_pool_workers
+from embeddings.quantization import QuantizedVectorStore, STORAGE_FLOAT32, QUANTIZED_INDEX_FILE, default_storage_mode
+from embeddings.projection import (
+    VectorProjection, PROJECTION_FILE, load_projection, default_projection_mode, default_projection_dims
+)
+from retriever.vector_store import create_vector_store
+from retriever.prefilter import DocumentTypeIndex, PREFILTER_FILE, filter_values
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Filas por upsert en el store vectorial (acotado por el máximo que admite el backend)
+DEFAULT_WRITE_BATCH_SIZE = 1000
+
+def default_write_batch_size() -> int:
+    """Filas por escritura en la base de datos vectorial (VECTOR_DB_WRITE_BATCH)"""
+    return max(1, int(os.getenv("VECTOR_DB_WRITE_BATCH", str(DEFAULT_WRITE_BATCH_SIZE))))
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """
+    Agrupa un iterable en listas de tamaño fijo sin materializarlo completo.
+    
+    Args:
+        items (Iterable[Any]): Elementos a agrupar
+        batch_size (int): Tamaño de cada lote
+        
+    Yields:
+        List[Any]: Lotes de como máximo batch_size elementos
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 class EmbeddingGenerator:
     """
     Clase principal para la generación de embeddings vectoriales.
@@ -43,27 +82,56 @@ class EmbeddingGenerator:
     sentence-transformers, optimizados para contenido educativo en español.
     """
     
-    def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+                 cache: Optional[EmbeddingCache] = None, use_cache: bool = True,
+                 backend: Optional[str] = None, pool: Optional[EmbeddingWorkerPool] = None):
         """
         Inicializa el generador de embeddings.
         
         Args:
             model_name (str): Nombre del modelo de sentence-transformers a usar
+            cache (Optional[EmbeddingCache]): Caché de embeddings; si no se indica se abre
+                la de EMBEDDING_CACHE_PATH
+            use_cache (bool): Usar la caché persistente de embeddings
+            backend (Optional[str]): "torch" u "onnx" (int8 en CPU); por defecto MODEL_BACKEND
+            pool (Optional[EmbeddingWorkerPool]): Pool de procesos para los textos no cacheados
         """
         self.model_name = model_name
         self.model = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backend = backend or default_backend()
+        self.pool = pool
+        self.device = "cuda" if torch.cuda.is_available() and self.backend != BACKEND_ONNX else "cpu"
         self.embedding_dim = 384  # Dimensión del modelo por defecto
         
+        # Los vectores int8 son compatibles pero no idénticos: se cachean por separado
+        self.cache_key = model_name if self.backend != BACKEND_ONNX else f"{model_name}#onnx"
+        
+        self.cache = cache
+        if self.cache is None and use_cache and default_cache_path():
+            try:
+                self.cache = EmbeddingCache(default_cache_path(), default_cache_size())
+            except Exception as e:
+                logger.error(f"Error abriendo caché de embeddings, se continúa sin caché: {str(e)}")
+        
+        # Presupuesto de tokens por lote (0 = lotes de tamaño fijo) y rendimiento acumulado
+        self.max_batch_tokens = default_max_batch_tokens()
+        self.batching_stats = BatchingStats()
+        self.last_batching_stats = BatchingStats()
+        
         logger.info(f"EmbeddingGenerator inicializado con modelo: {model_name}")
-        logger.info(f"Dispositivo utilizado: {self.device}")
+        logger.info(f"Dispositivo utilizado: {self.device} (backend {self.backend})")
     
     def load_model(self):
         """
-        Carga el modelo de sentence-transformers.
+        Carga el modelo de sentence-transformers (o su versión ONNX exportada).
+        
+        El modelo se obtiene del registro del proceso, por lo que el retriever
+        y otros generadores con el mismo modelo comparten la instancia.
         """
         try:
-            self.model = SentenceTransformer(self.model_name, device=self.device)
+            self.model = get_registry().get_embedding_model(self.model_name, self.backend, self.device)
+            if self.backend == BACKEND_ONNX and self.model.config.get("model_name") != self.model_name:
+                logger.warning(f"El modelo ONNX fue exportado desde {self.model.config.get('model_name')}, no desde {self.model_name}")
             self.embedding_dim = self.model.get_sentence_embedding_dimension()
             logger.info(f"Modelo cargado exitosamente. Dimensión: {self.embedding_dim}")
         except Exception as e:
@@ -80,18 +148,20 @@ class EmbeddingGenerator:
         Returns:
             np.ndarray: Vector embedding normalizado
         """
+        if self.cache is not None:
+            cached = self.cache.get_many(self.cache_key, [text])[0]
+            if cached is not None:
+                return cached
+        
         if self.model is None:
             self.load_model()
         
         try:
-            # Generar embedding
-            embedding = self.model.encode(text, convert_to_tensor=True)
-            
-            # Normalizar el embedding
-            embedding = embedding / np.linalg.norm(embedding)
+            # Generar embedding normalizado
+            embedding = self.encode_normalized([text])[0]
             
-            # Convertir a numpy array
-            embedding = embedding.cpu().numpy()
+            if self.cache is not None:
+                self.cache.put_many(self.cache_key, [text], [embedding])
             
             return embedding
             
@@ -99,41 +169,173 @@ class EmbeddingGenerator:
             logger.error(f"Error generando embedding: {str(e)}")
             raise
     
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> List[np.ndarray]:
+    def encode_in_batches(self, texts: List[str], batch_size: int = 32,
+                          max_batch_tokens: Optional[int] = None,
+                          out: Optional[np.ndarray] = None,
+                          rows: Optional[List[int]] = None) -> Tuple[np.ndarray, BatchingStats]:
         """
-        Genera embeddings para una lista de textos en lotes.
+        Codifica los textos en este proceso, en lotes por presupuesto de tokens o fijos.
+        
+        Cada lote se escribe directamente en su fila de la matriz de salida, sin
+        listas intermedias de vectores.
         
         Args:
-            texts (List[str]): Lista de textos para procesar
-            batch_size (int): Tamaño del lote para procesamiento
+            texts (List[str]): Textos a codificar
+            batch_size (int): Tamaño del lote en modo fijo
+            max_batch_tokens (Optional[int]): Tokens con relleno por lote (0 = modo fijo)
+            out (Optional[np.ndarray]): Matriz float32 preasignada donde escribir
+            rows (Optional[List[int]]): Fila de out para cada texto (por defecto 0..n-1)
             
         Returns:
-            List[np.ndarray]: Lista de embeddings generados
+            Tuple[np.ndarray, BatchingStats]: Matriz de salida y rendimiento
         """
         if self.model is None:
             self.load_model()
         
+        if max_batch_tokens is None:
+            max_batch_tokens = self.max_batch_tokens
+        
+        if out is None:
+            out = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        if rows is None:
+            rows = list(range(len(texts)))
+        
+        lengths = self.count_tokens(texts)
+        stats = BatchingStats()
+        
+        if max_batch_tokens:
+            batches = plan_token_batches(lengths, max_batch_tokens)
+        else:
+            batches = plan_fixed_batches(len(texts), batch_size)
+        
+        # Procesar en lotes para eficiencia
+        for number, batch in enumerate(batches, start=1):
+            batch_texts = [texts[k] for k in batch]
+            start = time.perf_counter()
+            
+            # Escribir cada vector en su fila original
+            out[[rows[k] for k in batch]] = self.encode_normalized(batch_texts)
+            
+            stats.add_batch([lengths[k] for k in batch], time.perf_counter() - start)
+            logger.debug(f"Procesado lote {number}/{len(batches)} ({len(batch)} textos)")
+        
+        return out, stats
+    
+    def encode_normalized(self, texts: List[str]) -> np.ndarray:
+        """
+        Codifica un lote de textos con el backend activo y normaliza los vectores.
+        
+        Args:
+            texts (List[str]): Textos del lote
+            
+        Returns:
+            np.ndarray: Matriz (n, dim) de vectores con norma 1
+        """
+        if self.backend == BACKEND_ONNX:
+            embeddings = self.model.encode(texts, batch_size=len(texts))
+            return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        
+        embeddings = self.model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_tensor=True,
+            show_progress_bar=False
+        )
+        embeddings = embeddings / torch.norm(embeddings, dim=1, keepdim=True)
+        return embeddings.cpu().numpy()
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Cuenta los tokens de cada texto con el tokenizador del modelo.
+        
+        Args:
+            texts (List[str]): Textos a medir
+            
+        Returns:
+            List[int]: Tokens por texto (incluye tokens especiales y truncamiento)
+        """
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            # Aproximación por palabras si el modelo no expone tokenizador
+            return [len(text.split()) + 2 for text in texts]
+        
+        max_length = getattr(self.model, "max_seq_length", None) or 512
+        # El tokenizador del modelo compartido no admite llamadas concurrentes
+        with model_lock(self.model):
+            encoded = tokenizer(list(texts), add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+    
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32,
+                                  max_batch_tokens: Optional[int] = None) -> np.ndarray:
+        """
+        Genera embeddings para una lista de textos en lotes.
+        
+        El resultado es una única matriz float32 contigua (n, dim): los vectores
+        cacheados y los lotes codificados se escriben en sus filas de una matriz
+        preasignada.
+        
+        Los textos presentes en la caché no se vuelven a codificar; si todos
+        están en caché el modelo ni siquiera se carga. Con un presupuesto de
+        tokens los textos restantes se ordenan por longitud y se agrupan de modo
+        que cada lote rellene lo menos posible; los vectores se devuelven en el
+        orden de entrada. Con un pool de procesos los textos restantes se
+        reparten entre sus workers.
+        
+        Args:
+            texts (List[str]): Lista de textos para procesar
+            batch_size (int): Tamaño del lote en modo fijo
+            max_batch_tokens (Optional[int]): Tokens con relleno por lote; por defecto
+                EMBEDDING_BATCH_TOKENS (0 = lotes fijos de batch_size textos en orden)
+            
+        Returns:
+            np.ndarray: Matriz (len(texts), dim) de embeddings normalizados
+        """
+        self.last_batching_stats = BatchingStats()
+        if not texts:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        
+        if self.cache is not None:
+            cached = self.cache.get_many(self.cache_key, texts)
+        else:
+            cached = [None] * len(texts)
+        
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if not missing:
+            logger.info(f"Recuperados {len(cached)} embeddings desde la caché")
+            return np.array(cached, dtype=np.float32)
+        
         try:
-            embeddings = []
-            
-            # Procesar en lotes para eficiencia
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                batch_embeddings = self.model.encode(
-                    batch_texts,
-                    convert_to_tensor=True,
-                    show_progress_bar=True
-                )
-                
-                # Normalizar embeddings
-                batch_embeddings = batch_embeddings / torch.norm(batch_embeddings, dim=1, keepdim=True)
-                
-                # Convertir a numpy y agregar a la lista
-                embeddings.extend(batch_embeddings.cpu().numpy())
-                
-                logger.info(f"Procesado lote {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}")
+            missing_texts = [texts[i] for i in missing]
+            if self.pool is not None:
+                # Cada worker del pool tiene su propia copia del modelo
+                generated, stats = self.pool.encode(missing_texts)
+                if len(missing) == len(texts):
+                    embeddings = generated
+                else:
+                    embeddings = np.empty((len(texts), generated.shape[1]), dtype=np.float32)
+                    embeddings[missing] = generated
+            else:
+                if self.model is None:
+                    self.load_model()
+                embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+                _, stats = self.encode_in_batches(missing_texts, batch_size, max_batch_tokens,
+                                                  out=embeddings, rows=missing)
+            
+            hits = [i for i, embedding in enumerate(cached) if embedding is not None]
+            if hits:
+                embeddings[hits] = np.stack([cached[i] for i in hits])
+            
+            if self.cache is not None:
+                self.cache.put_many(self.cache_key, missing_texts, [embeddings[i] for i in missing])
             
-            logger.info(f"Generados {len(embeddings)} embeddings")
+            self.last_batching_stats = stats
+            self.batching_stats.merge(stats)
+            logger.info(
+                f"Generados {len(missing)} embeddings en {stats.batches} lotes "
+                f"({len(hits)} recuperados desde la caché): "
+                f"{stats.texts_per_second:.1f} textos/s, {stats.tokens_per_second:.0f} tokens/s, "
+                f"relleno {stats.padding_ratio:.1%}"
+            )
             return embeddings
             
         except Exception as e:
@@ -168,87 +370,275 @@ class EmbeddingGenerator:
 
 class VectorDatabase:
     """
-    Clase para manejar la base de datos vectorial ChromaDB.
+    Clase para manejar la base de datos vectorial (ChromaDB, NumPy o HNSW según la configuración).
     
     Esta clase proporciona una interfaz para almacenar y consultar
     embeddings en la base de datos vectorial.
     """
     
-    def __init__(self, persist_directory: str = "data/vector_db"):
+    def __init__(self, persist_directory: str = "data/vector_db", storage: Optional[str] = None,
+                 write_batch_size: Optional[int] = None, projection: Optional[str] = None,
+                 projection_dims: Optional[int] = None, store_config: Optional[Dict[str, Any]] = None):
         """
         Inicializa la base de datos vectorial.
         
         Args:
             persist_directory (str): Directorio para persistir la base de datos
+            storage (Optional[str]): Formato de los vectores para la búsqueda en memoria
+                ("float32" = solo el store, "float16" o "int8"); por defecto VECTOR_STORAGE
+            write_batch_size (Optional[int]): Filas por upsert; por defecto VECTOR_DB_WRITE_BATCH
+            projection (Optional[str]): Reducción de dimensión del índice en memoria
+                ("none", "pca" o "truncate"); por defecto VECTOR_PROJECTION
+            projection_dims (Optional[int]): Dimensiones tras la proyección; por defecto VECTOR_PROJECTION_DIMS
+            store_config (Optional[Dict[str, Any]]): Sección AGENT_CONFIG["retriever"] con el
+                backend de almacenamiento ("chroma", "numpy" o "hnsw"); por defecto VECTOR_INDEX_BACKEND
         """
         self.persist_directory = persist_directory
-        self.client = None
-        self.collection = None
+        self.store_config = store_config
+        self.store = None
+        self.write_batch_size = write_batch_size or default_write_batch_size()
+        self.write_stats = WriteStats()
         
         # Crear directorio si no existe
         os.makedirs(persist_directory, exist_ok=True)
         
-        logger.info(f"VectorDatabase inicializada en: {persist_directory}")
+        # Índice en memoria (cuantizado y/o proyectado); el store conserva textos,
+        # metadatos y los float32 originales
+        self.storage = storage or default_storage_mode()
+        self.projection = load_projection(persist_directory, projection or default_projection_mode(),
+                                          projection_dims or default_projection_dims())
+        self.quantized = None
+        self._rebuild_pending = False
+        if self.storage != STORAGE_FLOAT32 or self.projection is not None:
+            self.quantized = QuantizedVectorStore(os.path.join(persist_directory, QUANTIZED_INDEX_FILE), self.storage)
+            self._check_projection()
+        
+        # Ids por document_type para el pre-filtrado de búsquedas por rol
+        self.document_types = DocumentTypeIndex(os.path.join(persist_directory, PREFILTER_FILE))
+        
+        logger.info(f"VectorDatabase inicializada en: {persist_directory} (vectores {self.storage})")
+    
+    def _check_projection(self):
+        """Descarta el índice en memoria si no corresponde a la proyección configurada"""
+        if self.projection is not None and len(self.quantized) and (
+                not self.projection.fitted or self.quantized.codes.shape[1] != self.projection.dims):
+            logger.warning("El índice en memoria no corresponde a la proyección configurada; se reconstruirá")
+            self.quantized.clear()
+            self._rebuild_pending = True
+    
+    def _index_writable(self) -> bool:
+        """El índice en memoria puede recibir los vectores de cada lote escrito"""
+        if self.quantized is None or self._rebuild_pending:
+            return False
+        return self.projection is None or self.projection.fitted
+    
+    def _index_ready(self) -> bool:
+        """El índice en memoria puede responder búsquedas"""
+        return self._index_writable() and len(self.quantized) > 0
+    
+    def _check_index_coverage(self):
+        """
+        Marca el índice en memoria para reconstruir si no cubre el store, p. ej.
+        tras una ingesta interrumpida entre persist() y flush() o una colección
+        anterior al índice.
+        """
+        if self.quantized is None or self._rebuild_pending:
+            return
+        count = self.store.count()
+        if len(self.quantized) != count:
+            logger.warning(
+                f"El índice en memoria tiene {len(self.quantized)} vectores y el store {count}; "
+                f"se reconstruirá"
+            )
+            self._rebuild_pending = True
     
     def initialize(self):
         """
-        Inicializa la conexión con ChromaDB.
+        Abre el store vectorial configurado (ChromaDB, NumPy o HNSW).
         """
         try:
-            self.client = chromadb.PersistentClient(
-                path=self.persist_directory,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            self.store = create_vector_store(self.persist_directory, self.store_config)
             
-            # Crear o obtener colección
-            self.collection = self.client.get_or_create_collection(
-                name="school_documents",
-                metadata={"hnsw:space": "cosine"}
-            )
+            # No superar el máximo de filas por llamada que admite el backend
+            if self.store.max_batch_size:
+                self.write_batch_size = min(self.write_batch_size, self.store.max_batch_size)
             
-            logger.info("Conexión con ChromaDB establecida")
+            self._check_index_coverage()
+            logger.info(f"Store vectorial {self.store.name} abierto")
             
         except Exception as e:
-            logger.error(f"Error inicializando ChromaDB: {str(e)}")
+            logger.error(f"Error inicializando el store vectorial: {str(e)}")
             raise
     
-    def store_embeddings(self, chunks: List[Dict[str, Any]], embeddings: List[np.ndarray]):
+    def reload_if_changed(self) -> bool:
+        """
+        Vuelve a cargar el store, el índice en memoria y el índice por document_type
+        si otro proceso los reescribió desde que se abrieron.
+        
+        Un escritor de larga vida (el pipeline de la API) lo llama antes de cada
+        ingesta: persist() reescribe esos archivos desde la copia en memoria y, sin
+        recargarlos, borraría lo que otra ingesta (p. ej. la CLI) escribió.
+        
+        Returns:
+            bool: Si se recargó algo
+        """
+        changed = self.document_types.reload_if_changed()
+        if self.quantized is not None and self.quantized.reload_if_changed():
+            if self.projection is not None:
+                self.projection = load_projection(self.persist_directory, self.projection.mode, self.projection.dims)
+            self._check_projection()
+            changed = True
+        
+        if self.store is None:
+            self.initialize()
+            return changed
+        if self.store.reload_if_changed():
+            changed = True
+        if changed:
+            logger.info("Base vectorial recargada: otro proceso la modificó")
+            self._check_index_coverage()
+        return changed
+    
+    def store_embeddings(self, chunks: List[Dict[str, Any]],
+                         embeddings: Union[np.ndarray, List[np.ndarray]]) -> WriteStats:
         """
         Almacena chunks con sus embeddings en la base de datos.
         
+        Usa upsert en lotes de write_batch_size filas: los ids ya existentes se
+        reemplazan, por lo que repetir una ingesta no duplica ni falla. Si un id
+        aparece más de una vez en la llamada se conserva la última aparición.
+        
         Args:
             chunks (List[Dict[str, Any]]): Lista de chunks con metadatos
-            embeddings (List[np.ndarray]): Lista de embeddings correspondientes
+            embeddings (Union[np.ndarray, List[np.ndarray]]): Matriz (n, dim) float32 o
+                lista de embeddings correspondientes
+            
+        Returns:
+            WriteStats: Filas, lotes y tiempo de escritura de esta llamada
         """
-        if self.collection is None:
+        if self.store is None:
             self.initialize()
         
         try:
-            # Preparar datos para ChromaDB
-            ids = [chunk['id'] for chunk in chunks]
-            documents = [chunk['text'] for chunk in chunks]
-            metadatas = [chunk['metadata'] for chunk in chunks]
-            
-            # Convertir embeddings a lista de listas
-            embedding_list = [embedding.tolist() for embedding in embeddings]
-            
-            # Almacenar en ChromaDB
-            self.collection.add(
-                ids=ids,
-                embeddings=embedding_list,
-                documents=documents,
-                metadatas=metadatas
-            )
+            # Una sola conversión de la matriz completa (sin copia si ya es float32 contigua)
+            matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if matrix.ndim != 2 or len(matrix) != len(chunks):
+                raise ValueError(f"Se esperaba una matriz de {len(chunks)} embeddings, forma recibida {matrix.shape}")
+            
+            # Última aparición de cada id (ChromaDB rechaza ids repetidos en una misma llamada)
+            rows = list({chunk['id']: i for i, chunk in enumerate(chunks)}.values())
+            if len(rows) < len(chunks):
+                logger.warning(f"{len(chunks) - len(rows)} chunks con id repetido; se conserva la última versión")
+                rows.sort()
+                chunks = [chunks[i] for i in rows]
+                matrix = matrix[rows]
             
-            logger.info(f"Almacenados {len(chunks)} chunks en la base de datos vectorial")
+            stats = WriteStats()
+            for start in range(0, len(chunks), self.write_batch_size):
+                batch_start = time.perf_counter()
+                batch = chunks[start:start + self.write_batch_size]
+                vectors = matrix[start:start + self.write_batch_size]
+                ids = [chunk['id'] for chunk in batch]
+                
+                self.store.upsert(
+                    ids,
+                    vectors,
+                    [chunk['text'] for chunk in batch],
+                    [chunk['metadata'] for chunk in batch]
+                )
+                self.document_types.add(ids, [chunk['metadata'] for chunk in batch])
+                
+                if self._index_writable():
+                    if self.projection is not None:
+                        vectors = self.projection.transform(vectors)
+                    self.quantized.upsert(ids, vectors)
+                elif self.quantized is not None:
+                    # La proyección PCA se ajusta con toda la colección en flush()
+                    self._rebuild_pending = True
+                
+                stats.add_batch(len(batch), time.perf_counter() - batch_start)
+            
+            self.write_stats.merge(stats)
+            logger.info(
+                f"Almacenados {stats.rows} chunks en {stats.batches} lotes "
+                f"({stats.rows_per_second:.0f} filas/s)"
+            )
+            return stats
             
         except Exception as e:
             logger.error(f"Error almacenando embeddings: {str(e)}")
             raise
     
+    def delete_embeddings(self, ids: List[str]):
+        """
+        Elimina chunks de la base de datos por id.
+        
+        Args:
+            ids (List[str]): Ids de los chunks a eliminar
+        """
+        if self.store is None:
+            self.initialize()
+        
+        if not ids:
+            return
+        
+        try:
+            self.store.delete(ids=ids)
+            self.document_types.remove(ids)
+            if self.quantized is not None:
+                self.quantized.remove(ids)
+            logger.info(f"Eliminados {len(ids)} chunks de la base de datos vectorial")
+        
+        except Exception as e:
+            logger.error(f"Error eliminando embeddings: {str(e)}")
+            raise
+    
+    def get_existing_ids(self, ids: List[str]) -> Set[str]:
+        """
+        Ids que ya están almacenados en la colección.
+        
+        Args:
+            ids (List[str]): Ids a verificar
+            
+        Returns:
+            Set[str]: Subconjunto de ids presentes en la base de datos
+        """
+        if self.store is None:
+            self.initialize()
+        
+        if not ids:
+            return set()
+        
+        try:
+            results = self.store.get(ids=list(ids), include=())
+            return set(results['ids'])
+        
+        except Exception as e:
+            logger.error(f"Error verificando ids en la base de datos: {str(e)}")
+            raise
+    
+    def delete_by_source(self, source: str):
+        """
+        Elimina todos los chunks de un archivo de origen.
+        
+        Args:
+            source (str): Valor del metadato source de los chunks
+        """
+        if self.store is None:
+            self.initialize()
+        
+        try:
+            ids = self.store.get(where={"source": source}, include=())['ids']
+            if self.quantized is not None:
+                self.quantized.remove(ids)
+            self.document_types.remove(ids)
+            self.store.delete(where={"source": source})
+            logger.info(f"Eliminados los chunks de {source} de la base de datos vectorial")
+        
+        except Exception as e:
+            logger.error(f"Error eliminando chunks de {source}: {str(e)}")
+            raise
+    
     def search_similar(self, query_embedding: np.ndarray, top_k: int = 5, 
                       filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
@@ -262,25 +652,24 @@ class VectorDatabase:
         Returns:
             List[Dict[str, Any]]: Lista de documentos similares
         """
-        if self.collection is None:
+        if self.store is None:
             self.initialize()
         
+        if self._index_ready():
+            return self._search_quantized(query_embedding, top_k, filters)
+        
         try:
             # Realizar búsqueda
-            results = self.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=top_k,
-                where=filters
-            )
+            results = self.store.query(query_embedding, top_k, filters)
             
             # Formatear resultados
             similar_docs = []
-            for i in range(len(results['ids'][0])):
+            for result in results:
                 doc = {
-                    'id': results['ids'][0][i],
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i]
+                    'id': result['id'],
+                    'text': result['text'],
+                    'metadata': result['metadata'],
+                    'distance': 1.0 - result['similarity_score']
                 }
                 similar_docs.append(doc)
             
@@ -291,6 +680,179 @@ class VectorDatabase:
             logger.error(f"Error en búsqueda similar: {str(e)}")
             raise
     
+    def _search_quantized(self, query_embedding: np.ndarray, top_k: int,
+                          filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Búsqueda sobre el índice cuantizado; el store solo aporta textos y metadatos.
+        """
+        try:
+            allowed_ids = None
+            values = filter_values(filters)
+            if values is not None and self.document_types.exists:
+                allowed_ids = set(self.document_types.ids_for(values))
+            elif filters:
+                allowed_ids = set(self.store.get(where=filters, include=())['ids'])
+            
+            if self.projection is not None:
+                query_embedding = self.projection.transform(query_embedding)
+            
+            hits = self.quantized.search(query_embedding, top_k, allowed_ids)
+            if not hits:
+                return []
+            
+            results = self.store.get(ids=[chunk_id for chunk_id, _ in hits])
+            found = {
+                chunk_id: (document, metadata)
+                for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            }
+            
+            similar_docs = [
+                {
+                    'id': chunk_id,
+                    'text': found[chunk_id][0],
+                    'metadata': found[chunk_id][1],
+                    'distance': 1.0 - score
+                }
+                for chunk_id, score in hits if chunk_id in found
+            ]
+            
+            logger.info(f"Encontrados {len(similar_docs)} documentos similares (índice {self.storage})")
+            return similar_docs
+            
+        except Exception as e:
+            logger.error(f"Error en búsqueda sobre índice cuantizado: {str(e)}")
+            raise
+    
+    def persist(self):
+        """
+        Escribe en disco los cambios del store (ChromaDB ya escribe en cada llamada),
+        el índice en memoria y el índice por document_type; la primera vez en una
+        colección anterior a este último, lo construye desde el store.
+        
+        El índice en memoria se guarda junto al store para que los ficheros que el
+        manifiesto da por ingeridos estén también en él; si está pendiente de
+        reconstrucción se deja para flush().
+        """
+        if self.store is None:
+            return
+        self.store.persist()
+        if self._index_writable() and self.quantized.dirty:
+            self.quantized.save()
+            logger.info(f"Índice {self.storage} guardado: {len(self.quantized)} vectores")
+        if not self.document_types.exists and self.store.count() > len(self.document_types):
+            self.rebuild_document_type_index()
+        elif self.document_types.dirty or not self.document_types.exists:
+            self.document_types.save()
+    
+    def rebuild_document_type_index(self, batch_size: int = 5000):
+        """
+        Reconstruye el índice por document_type desde los metadatos del store.
+        
+        Args:
+            batch_size (int): Chunks leídos por consulta al store
+        """
+        if self.store is None:
+            self.initialize()
+        
+        try:
+            self.document_types.clear()
+            offset = 0
+            while True:
+                results = self.store.get(include=("metadatas",), limit=batch_size, offset=offset)
+                if not results['ids']:
+                    break
+                self.document_types.add(results['ids'], results['metadatas'])
+                offset += len(results['ids'])
+            
+            self.document_types.save()
+            logger.info(f"Índice por document_type reconstruido: {len(self.document_types)} chunks")
+            
+        except Exception as e:
+            logger.error(f"Error reconstruyendo índice por document_type: {str(e)}")
+            raise
+    
+    def flush(self):
+        """
+        Persiste el store y el índice en memoria; reconstruye este último si la
+        proyección está pendiente de ajuste o si la escala int8, calibrada con el
+        primer lote escrito, recorta más de INT8_CLIP_WARNING de los valores.
+        """
+        self.persist()
+        if self.quantized is not None and self.quantized.quantizer.needs_refit:
+            logger.info(
+                f"Calibración int8 desactualizada ({self.quantized.quantizer.clip_ratio:.1%} de valores "
+                f"recortados); se recalibra con toda la colección"
+            )
+            self._rebuild_pending = True
+        if self._rebuild_pending:
+            self.rebuild_quantized_index()
+    
+    def rebuild_quantized_index(self, batch_size: int = 5000, refit_projection: bool = False):
+        """
+        Reconstruye el índice en memoria desde los float32 del store.
+        
+        Sirve para migrar una colección existente, para recalibrar la escala
+        int8 con todo el corpus en lugar del primer lote ingerido y para
+        ajustar la proyección PCA (la primera vez o con refit_projection).
+        
+        Args:
+            batch_size (int): Vectores leídos por consulta al store
+            refit_projection (bool): Volver a ajustar una proyección PCA ya ajustada
+        """
+        if self.quantized is None:
+            raise ValueError("La base de datos está en modo float32 sin proyección; no hay índice en memoria")
+        
+        if self.store is None:
+            self.initialize()
+        
+        try:
+            def read_batches():
+                offset = 0
+                while True:
+                    results = self.store.get(include=("embeddings",), limit=batch_size, offset=offset)
+                    if not results['ids']:
+                        return
+                    yield results['ids'], results['embeddings']
+                    offset += len(results['ids'])
+            
+            def index_batches():
+                for ids, vectors in read_batches():
+                    if self.projection is not None:
+                        vectors = self.projection.transform(vectors)
+                    yield ids, vectors
+            
+            # Ajuste de la proyección con toda la colección
+            if self.projection is not None:
+                if refit_projection or not self.projection.fitted:
+                    projection = VectorProjection(self.projection.mode, self.projection.dims)
+                    for _, vectors in read_batches():
+                        projection.partial_fit(vectors)
+                    projection.finalize()
+                    self.projection = projection
+                self.projection.save(os.path.join(self.persist_directory, PROJECTION_FILE))
+            
+            # Rango por dimensión de todo el corpus (int8)
+            low = high = None
+            for _, vectors in index_batches():
+                low = vectors.min(axis=0) if low is None else np.minimum(low, vectors.min(axis=0))
+                high = vectors.max(axis=0) if high is None else np.maximum(high, vectors.max(axis=0))
+            
+            self.quantized.clear()
+            if low is not None:
+                self.quantized.quantizer.fit(np.stack([low, high]))
+            
+            # Última pasada: cuantizar
+            for ids, vectors in index_batches():
+                self.quantized.upsert(ids, vectors)
+            
+            self.quantized.save()
+            self._rebuild_pending = False
+            logger.info(f"Índice {self.storage} reconstruido: {self.quantized.get_stats()}")
+            
+        except Exception as e:
+            logger.error(f"Error reconstruyendo índice cuantizado: {str(e)}")
+            raise
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Obtiene estadísticas de la colección.
@@ -298,14 +860,14 @@ class VectorDatabase:
         Returns:
             Dict[str, Any]: Estadísticas de la colección
         """
-        if self.collection is None:
+        if self.store is None:
             self.initialize()
         
         try:
-            count = self.collection.count()
+            count = self.store.count()
             
             # Obtener metadatos de algunos documentos para análisis
-            sample_results = self.collection.get(limit=100)
+            sample_results = self.store.get(limit=100)
             
             # Analizar tipos de documentos
             doc_types = {}
@@ -319,6 +881,12 @@ class VectorDatabase:
                 'document_types': doc_types,
                 'last_updated': datetime.now().isoformat()
             }
+            if self.quantized is not None:
+                stats['quantized_index'] = self.quantized.get_stats()
+            if self.projection is not None:
+                stats['projection'] = self.projection.to_dict()
+            stats['vector_store'] = self.store.get_stats()
+            stats['prefilter'] = self.document_types.get_stats()
             
             return stats
             
@@ -334,19 +902,36 @@ class EmbeddingPipeline:
     desde el procesamiento de chunks hasta su almacenamiento en la base de datos.
     """
     
-    def __init__(self, vector_db_path: str = "data/vector_db"):
+    def __init__(self, vector_db_path: str = "data/vector_db", num_workers: Optional[int] = None,
+                 store_config: Optional[Dict[str, Any]] = None):
         """
         Inicializa el pipeline de embeddings.
         
         Args:
             vector_db_path (str): Ruta a la base de datos vectorial
+            num_workers (Optional[int]): Procesos para generar embeddings; por defecto
+                EMBEDDING_WORKERS (0 o 1 = en este proceso)
+            store_config (Optional[Dict[str, Any]]): Sección AGENT_CONFIG["retriever"] (backend del store)
         """
         self.embedding_generator = EmbeddingGenerator()
-        self.vector_db = VectorDatabase(vector_db_path)
+        self.vector_db = VectorDatabase(vector_db_path, store_config=store_config)
+        
+        num_workers = default_pool_workers() if num_workers is None else num_workers
+        if num_workers > 1:
+            self.embedding_generator.pool = EmbeddingWorkerPool(
+                self.embedding_generator.model_name,
+                self.embedding_generator.backend,
+                num_workers
+            )
         
         logger.info("EmbeddingPipeline inicializado")
     
-    def process_chunks(self, chunks: List[Dict[str, Any]]) -> Tuple[List[np.ndarray], List[Dict[str, Any]]]:
+    def close(self):
+        """Libera los procesos del pool de embeddings, si existe"""
+        if self.embedding_generator.pool is not None:
+            self.embedding_generator.pool.close()
+    
+    def process_chunks(self, chunks: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
         """
         Procesa una lista de chunks generando sus embeddings.
         
@@ -354,7 +939,7 @@ class EmbeddingPipeline:
             chunks (List[Dict[str, Any]]): Lista de chunks a procesar
             
         Returns:
-            Tuple[List[np.ndarray], List[Dict[str, Any]]]: Embeddings y chunks procesados
+            Tuple[np.ndarray, List[Dict[str, Any]]]: Matriz de embeddings y chunks procesados
         """
         try:
             # Preprocesar textos
@@ -367,7 +952,7 @@ class EmbeddingPipeline:
             processed_chunks = []
             for i, chunk in enumerate(chunks):
                 processed_chunk = chunk.copy()
-                processed_chunk['embedding_dimension'] = len(embeddings[i])
+                processed_chunk['embedding_dimension'] = embeddings.shape[1]
                 processed_chunk['processed_at'] = datetime.now().isoformat()
                 processed_chunks.append(processed_chunk)
             
@@ -378,17 +963,111 @@ class EmbeddingPipeline:
             logger.error(f"Error procesando chunks: {str(e)}")
             raise
     
-    def store_in_database(self, chunks: List[Dict[str, Any]], embeddings: List[np.ndarray]):
+    def process_stream(self, chunks: Iterable[Dict[str, Any]], batch_size: int = 256,
+                       on_batch_stored: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                       pipelined: bool = True) -> Dict[str, Any]:
+        """
+        Procesa un flujo de chunks en lotes de tamaño fijo.
+        
+        Con pipelined=True el lote N se escribe en un hilo mientras se generan los
+        embeddings del lote N+1; como mucho hay un lote en escritura, por lo que la
+        memoria sigue acotada por batch_size y no por el tamaño del corpus.
+        on_batch_stored se invoca en orden y solo cuando el lote ya está escrito.
+        
+        Args:
+            chunks (Iterable[Dict[str, Any]]): Flujo de chunks (p. ej. un generador)
+            batch_size (int): Chunks por lote
+            on_batch_stored (Optional[Callable]): Se invoca con cada lote ya almacenado
+            pipelined (bool): Solapar la escritura de un lote con los embeddings del siguiente
+            
+        Returns:
+            Dict[str, Any]: Total de chunks y lotes procesados, rendimiento de la
+            generación de embeddings y de la escritura, y contadores de la caché
+        """
+        total_chunks = 0
+        total_batches = 0
+        throughput = BatchingStats()
+        writes = WriteStats()
+        start_time = time.perf_counter()
+        
+        def finish(pending):
+            future, batch = pending
+            writes.merge(future.result())
+            if on_batch_stored is not None:
+                on_batch_stored(batch)
+        
+        writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-db-writer") if pipelined else None
+        pending = None
+        try:
+            for batch in iter_batches(chunks, batch_size):
+                embeddings, processed_chunks = self.process_chunks(batch)
+                throughput.merge(self.embedding_generator.last_batching_stats)
+                
+                total_chunks += len(batch)
+                total_batches += 1
+                
+                if writer is None:
+                    writes.merge(self.store_in_database(processed_chunks, embeddings))
+                    if on_batch_stored is not None:
+                        on_batch_stored(batch)
+                    continue
+                
+                # Esperar la escritura anterior antes de encolar la siguiente
+                if pending is not None:
+                    finish(pending)
+                pending = (writer.submit(self.store_in_database, processed_chunks, embeddings), batch)
+            
+            if pending is not None:
+                finish(pending)
+                pending = None
+        finally:
+            if writer is not None:
+                # Si falló la generación, no dejar la última escritura a medias
+                if pending is not None:
+                    pending[0].exception()
+                writer.shutdown()
+        
+        self.vector_db.flush()
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Flujo procesado: {total_chunks} chunks en {total_batches} lotes")
+        result = {'chunks': total_chunks, 'batches': total_batches}
+        
+        cache = self.embedding_generator.cache
+        if cache is not None:
+            result['embedding_cache'] = cache.get_stats()
+            logger.info(f"Caché de embeddings: {result['embedding_cache']}")
+        
+        result['throughput'] = throughput.to_dict()
+        logger.info(f"Rendimiento de embeddings: {result['throughput']}")
+        
+        # rows_per_second de extremo a extremo; write_seconds es el tiempo de escritura (solapado)
+        result['write'] = {
+            'rows': writes.rows,
+            'batches': writes.batches,
+            'write_seconds': round(writes.seconds, 3),
+            'write_rows_per_second': round(writes.rows_per_second, 2),
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(writes.rows / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        logger.info(f"Escritura en la base de datos vectorial: {result['write']}")
+        
+        return result
+    
+    def store_in_database(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray) -> WriteStats:
         """
         Almacena chunks y embeddings en la base de datos vectorial.
         
         Args:
             chunks (List[Dict[str, Any]]): Chunks procesados
-            embeddings (List[np.ndarray]): Embeddings correspondientes
+            embeddings (np.ndarray): Matriz de embeddings correspondientes
+            
+        Returns:
+            WriteStats: Estadísticas de la escritura
         """
         try:
-            self.vector_db.store_embeddings(chunks, embeddings)
+            stats = self.vector_db.store_embeddings(chunks, embeddings)
             logger.info("Chunks y embeddings almacenados en la base de datos")
+            return stats
             
         except Exception as e:
             logger.error(f"Error almacenando en base de datos: {str(e)}")
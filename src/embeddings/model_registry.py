@@ -0,0 +1,173 @@
+"""
+Módulo: model_registry.py
+Descripción: Registro de modelos compartidos por proceso. EmbeddingGenerator, SemanticRetriever
+y QueryTool piden el modelo de embeddings y el cross-encoder al registro, que carga una sola
+instancia por (tipo, modelo, backend, dispositivo) y la entrega envuelta en SharedModel, cuyas
+llamadas a encode y predict se serializan con un lock (los tokenizadores rápidos de Hugging
+Face no admiten llamadas concurrentes).
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import time
+import logging
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KIND_EMBEDDING = "embedding"
+KIND_CROSS_ENCODER = "cross_encoder"
+
+ModelKey = Tuple[str, str, str, str]
+
+@dataclass
+class RegistryStats:
+    """Cargas y reutilizaciones de modelos"""
+    loads: int = 0
+    hits: int = 0
+    load_seconds: float = 0.0
+
+class SharedModel:
+    """
+    Modelo compartido entre hilos.
+
+    encode y predict se ejecutan de a uno con el lock del modelo; el resto
+    de atributos (tokenizer, max_seq_length, config...) se delegan al
+    modelo original.
+    """
+
+    def __init__(self, model: Any, key: ModelKey):
+        self.model = model
+        self.key = key
+        self.lock = threading.RLock()
+
+    def encode(self, *args, **kwargs):
+        with self.lock:
+            return self.model.encode(*args, **kwargs)
+
+    def predict(self, *args, **kwargs):
+        with self.lock:
+            return self.model.predict(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.model, name)
+
+def model_lock(model: Any):
+    """Lock de un modelo compartido, o un contexto vacío si no lo es"""
+    return getattr(model, "lock", None) or nullcontext()
+
+class ModelRegistry:
+    """
+    Instancias de modelos por (tipo, modelo, backend, dispositivo).
+
+    Cada clave tiene su propio lock de carga: dos hilos que piden el mismo
+    modelo esperan a una sola carga, y modelos distintos se cargan en
+    paralelo.
+    """
+
+    def __init__(self):
+        self._models: Dict[ModelKey, SharedModel] = {}
+        self._loading: Dict[ModelKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = RegistryStats()
+
+    def get_or_load(self, key: ModelKey, loader: Callable[[], Any]) -> SharedModel:
+        """
+        Devuelve el modelo registrado con key, cargándolo con loader la primera vez.
+
+        Args:
+            key (ModelKey): (tipo, modelo, backend, dispositivo)
+            loader (Callable[[], Any]): Crea el modelo
+
+        Returns:
+            SharedModel: Instancia compartida
+        """
+        with self._lock:
+            shared = self._models.get(key)
+            if shared is not None:
+                self.stats.hits += 1
+                return shared
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                shared = self._models.get(key)
+                if shared is not None:
+                    self.stats.hits += 1
+                    return shared
+
+            start = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                logger.error(f"Error cargando modelo {key}: {str(e)}")
+                raise
+            elapsed = time.perf_counter() - start
+
+            shared = SharedModel(model, key)
+            with self._lock:
+                self._models[key] = shared
+                self._loading.pop(key, None)
+                self.stats.loads += 1
+                self.stats.load_seconds += elapsed
+
+            logger.info(f"Modelo {key[1]} ({key[0]}, {key[2]}, {key[3]}) cargado en {elapsed:.1f} s y registrado")
+            return shared
+
+    def get_embedding_model(self, model_name: str, backend: str, device: str,
+                            onnx_dir: Optional[str] = None) -> SharedModel:
+        """Modelo de embeddings compartido (SentenceTransformer u ONNX)"""
+        from embeddings.onnx_backend import BACKEND_ONNX, load_embedding_model, default_onnx_dir
+
+        if backend == BACKEND_ONNX:
+            # El modelo ONNX se identifica por el directorio exportado
+            onnx_dir = onnx_dir or default_onnx_dir()
+            return self.get_or_load((KIND_EMBEDDING, onnx_dir, backend, "cpu"),
+                                    lambda: load_embedding_model(onnx_dir))
+
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(model_name, device=device)
+
+        return self.get_or_load((KIND_EMBEDDING, model_name, backend, device), load)
+
+    def get_cross_encoder(self, model_name: str, backend: str, device: Optional[str] = None,
+                          onnx_dir: Optional[str] = None) -> SharedModel:
+        """Cross-encoder de re-ranking compartido"""
+        from embeddings.onnx_backend import BACKEND_ONNX, load_cross_encoder, default_onnx_dir
+
+        if backend == BACKEND_ONNX:
+            onnx_dir = onnx_dir or default_onnx_dir()
+            return self.get_or_load((KIND_CROSS_ENCODER, onnx_dir, backend, "cpu"),
+                                    lambda: load_cross_encoder(onnx_dir))
+
+        def load():
+            from sentence_transformers import CrossEncoder
+            return CrossEncoder(model_name, device=device)
+
+        return self.get_or_load((KIND_CROSS_ENCODER, model_name, backend, device or "auto"), load)
+
+    def loaded(self) -> Dict[ModelKey, SharedModel]:
+        """Modelos cargados"""
+        with self._lock:
+            return dict(self._models)
+
+    def clear(self):
+        """Olvida los modelos registrados (las instancias en uso siguen vivas)"""
+        with self._lock:
+            self._models.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        data = asdict(self.stats)
+        data["models"] = ["/".join(key) for key in self.loaded()]
+        return data
+
+# Registro del proceso
+_registry = ModelRegistry()
+
+def get_registry() -> ModelRegistry:
+    """Registro de modelos compartido por todo el proceso"""
+    return _registry
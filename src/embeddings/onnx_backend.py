@@ -0,0 +1,277 @@
+"""
+Módulo: onnx_backend.py
+Descripción: Backend de ONNX Runtime para CPU con modelos cuantizados a int8. Exporta el
+modelo de embeddings (paraphrase-multilingual-MiniLM-L12-v2) y el cross-encoder de
+re-ranking (ms-marco-MiniLM-L-6-v2) a ONNX, los cuantiza dinámicamente y los carga desde un
+directorio local. Reproduce el pooling por promedio de sentence-transformers y la sigmoide
+de CrossEncoder, por lo que los vectores y scores son compatibles con los de PyTorch.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import json
+import inspect
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKENDS = (BACKEND_TORCH, BACKEND_ONNX)
+
+DEFAULT_ONNX_DIR = "data/models/onnx"
+EMBEDDING_SUBDIR = "embedding"
+RERANKER_SUBDIR = "reranker"
+
+CONFIG_FILE = "onnx_config.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+def default_backend() -> str:
+    """Backend de inferencia de los modelos (MODEL_BACKEND: torch u onnx)"""
+    backend = os.getenv("MODEL_BACKEND", BACKEND_TORCH).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"MODEL_BACKEND desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    return backend
+
+def default_onnx_dir() -> str:
+    """Directorio de los modelos exportados (ONNX_MODEL_DIR)"""
+    return os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+
+def _model_path(model_dir: str) -> str:
+    """Grafo que se carga de un directorio exportado (el int8 si existe)"""
+    model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+    if not os.path.exists(model_path):
+        model_path = os.path.join(model_dir, MODEL_FILE)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"No hay modelo ONNX en {model_dir}; exportarlo con "
+            f"python src/embeddings/onnx_backend.py --output {os.path.dirname(model_dir) or '.'}"
+        )
+    return model_path
+
+def _session(model_path: str, num_threads: Optional[int] = None):
+    """Crea la sesión de ONNX Runtime para un grafo exportado"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+
+    session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+    logger.info(f"Modelo ONNX cargado: {model_path}")
+    return session
+
+def _load_config(model_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class _ONNXModel:
+    """Sesión de ONNX Runtime con su tokenizador"""
+
+    def __init__(self, model_dir: str, num_threads: Optional[int] = None):
+        from transformers import AutoTokenizer
+
+        self.model_dir = model_dir
+        self.config = _load_config(model_dir)
+        self.max_seq_length = self.config.get("max_seq_length", 512)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model_path = _model_path(model_dir)
+        self.session = _session(self.model_path, num_threads)
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def _run(self, *texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = self.tokenizer(
+            *[list(t) for t in texts],
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {
+            name: encoded[name].astype(np.int64)
+            for name in ("input_ids", "attention_mask", "token_type_ids")
+            if name in self.input_names and name in encoded
+        }
+        return self.session.run(None, feeds)[0], encoded["attention_mask"]
+
+class ONNXEmbeddingModel(_ONNXModel):
+    """
+    Modelo de embeddings en ONNX con la interfaz de encode de SentenceTransformer.
+
+    Devuelve arreglos numpy float32 sin normalizar; la normalización la
+    aplica EmbeddingGenerator igual que con el backend de PyTorch.
+    """
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["embedding_dim"]
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Genera embeddings con pooling por promedio sobre la máscara de atención.
+
+        Args:
+            texts (Union[str, List[str]]): Texto o lista de textos
+            batch_size (int): Textos por ejecución del grafo
+
+        Returns:
+            np.ndarray: (dim,) para un texto o (n, dim) para una lista
+        """
+        single = isinstance(texts, str)
+        items = [texts] if single else list(texts)
+
+        outputs = []
+        for i in range(0, len(items), batch_size):
+            token_embeddings, attention_mask = self._run(items[i:i + batch_size])
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            outputs.append(pooled.astype(np.float32))
+
+        if not outputs:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        embeddings = np.concatenate(outputs)
+        return embeddings[0] if single else embeddings
+
+class ONNXCrossEncoder(_ONNXModel):
+    """Cross-encoder de re-ranking en ONNX con la interfaz de predict de CrossEncoder"""
+
+    def predict(self, sentence_pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Calcula el score de relevancia de cada par (consulta, documento).
+
+        Con una sola etiqueta aplica la sigmoide, igual que CrossEncoder.
+
+        Returns:
+            np.ndarray: Score por par
+        """
+        scores = []
+        for i in range(0, len(sentence_pairs), batch_size):
+            batch = sentence_pairs[i:i + batch_size]
+            logits, _ = self._run([pair[0] for pair in batch], [pair[1] for pair in batch])
+            if logits.shape[-1] == 1:
+                logits = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+            scores.append(logits.astype(np.float32))
+
+        return np.concatenate(scores) if scores else np.zeros(0, np.float32)
+
+def load_embedding_model(onnx_dir: Optional[str] = None, num_threads: Optional[int] = None) -> ONNXEmbeddingModel:
+    """Carga el modelo de embeddings exportado en onnx_dir/embedding"""
+    return ONNXEmbeddingModel(os.path.join(onnx_dir or default_onnx_dir(), EMBEDDING_SUBDIR), num_threads)
+
+def load_cross_encoder(onnx_dir: Optional[str] = None, num_threads: Optional[int] = None) -> ONNXCrossEncoder:
+    """Carga el cross-encoder exportado en onnx_dir/reranker"""
+    return ONNXCrossEncoder(os.path.join(onnx_dir or default_onnx_dir(), RERANKER_SUBDIR), num_threads)
+
+def export_model(model_name: str, output_dir: str, kind: str = "embedding",
+                 quantize: bool = True, max_seq_length: Optional[int] = None) -> str:
+    """
+    Exporta un modelo de Hugging Face a ONNX y opcionalmente lo cuantiza a int8.
+
+    Args:
+        model_name (str): Modelo de embeddings o cross-encoder
+        output_dir (str): Directorio de salida
+        kind (str): "embedding" o "reranker"
+        quantize (bool): Generar además la versión int8 (cuantización dinámica)
+        max_seq_length (Optional[int]): Longitud máxima de tokens
+
+    Returns:
+        str: Ruta del modelo que cargará el backend
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        config: Dict[str, Any] = {"model_name": model_name, "kind": kind}
+        if kind == "embedding":
+            from sentence_transformers import SentenceTransformer
+
+            st_model = SentenceTransformer(model_name, device="cpu")
+            model = AutoModel.from_pretrained(model_name)
+            config["max_seq_length"] = max_seq_length or st_model.max_seq_length
+            config["embedding_dim"] = st_model.get_sentence_embedding_dimension()
+            config["pooling"] = "mean"
+            output_names = ["token_embeddings"]
+        elif kind == "reranker":
+            model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            config["max_seq_length"] = max_seq_length or 512
+            config["num_labels"] = model.config.num_labels
+            output_names = ["logits"]
+        else:
+            raise ValueError(f"Tipo de modelo desconocido: {kind}")
+
+        model.eval()
+        if kind == "reranker":
+            sample = tokenizer(["consulta de ejemplo"], ["documento de ejemplo"], return_tensors="pt")
+        else:
+            sample = tokenizer(["texto de ejemplo"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes[output_names[0]] = {0: "batch", 1: "sequence"} if kind == "embedding" else {0: "batch"}
+
+        class FirstOutput(torch.nn.Module):
+            """Recibe las entradas por nombre y devuelve solo la primera salida"""
+
+            def __init__(self, wrapped):
+                super().__init__()
+                self.wrapped = wrapped
+
+            def forward(self, *inputs):
+                return self.wrapped(**dict(zip(input_names, inputs)))[0]
+
+        # Desde torch 2.5 export() acepta dynamo=...; dynamic_axes es del exportador TorchScript
+        export_options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+        model_path = os.path.join(output_dir, MODEL_FILE)
+        with torch.no_grad():
+            torch.onnx.export(
+                FirstOutput(model),
+                tuple(sample[name] for name in input_names),
+                model_path,
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                **export_options
+            )
+
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            quantize_dynamic(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+            config["quantization"] = "int8"
+
+        tokenizer.save_pretrained(output_dir)
+        with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+        exported = os.path.join(output_dir, QUANTIZED_MODEL_FILE if quantize else MODEL_FILE)
+        logger.info(f"Modelo {model_name} exportado a {exported}")
+        return exported
+
+    except Exception as e:
+        logger.error(f"Error exportando {model_name} a ONNX: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta los modelos de embeddings y re-ranking a ONNX int8")
+    parser.add_argument("--output", default=DEFAULT_ONNX_DIR, help="Directorio de salida")
+    parser.add_argument("--embedding-model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--rerank-model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--no-quantize", action="store_true", help="Exportar solo en float32")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_model(args.embedding_model, os.path.join(args.output, EMBEDDING_SUBDIR), "embedding",
+                 quantize=not args.no_quantize)
+    export_model(args.rerank_model, os.path.join(args.output, RERANKER_SUBDIR), "reranker",
+                 quantize=not args.no_quantize)
@@ -0,0 +1,193 @@
+"""
+Módulo: projection.py
+Descripción: Reducción de dimensión del índice de búsqueda en memoria. La proyección PCA se
+ajusta durante la ingesta a partir de los vectores de la colección (acumulando media y matriz
+de Gram por lotes, sin cargar el corpus completo) y se guarda junto a la colección; la
+truncación conserva las primeras dimensiones y solo tiene sentido con modelos entrenados con
+Matryoshka. Documentos y consultas se proyectan igual y se vuelven a normalizar.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import logging
+import numpy as np
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_NONE = "none"
+PROJECTION_PCA = "pca"
+PROJECTION_TRUNCATE = "truncate"
+PROJECTION_MODES = (PROJECTION_NONE, PROJECTION_PCA, PROJECTION_TRUNCATE)
+
+PROJECTION_FILE = "projection.npz"
+DEFAULT_PROJECTION_DIMS = 128
+
+def default_projection_mode() -> str:
+    """Proyección del índice en memoria (VECTOR_PROJECTION: none, pca o truncate)"""
+    mode = os.getenv("VECTOR_PROJECTION", PROJECTION_NONE).lower()
+    if mode not in PROJECTION_MODES:
+        raise ValueError(f"VECTOR_PROJECTION desconocido: {mode} (opciones: {', '.join(PROJECTION_MODES)})")
+    return mode
+
+def default_projection_dims() -> int:
+    """Dimensiones tras la proyección (VECTOR_PROJECTION_DIMS, por defecto 128)"""
+    return max(1, int(os.getenv("VECTOR_PROJECTION_DIMS", str(DEFAULT_PROJECTION_DIMS))))
+
+def load_projection(persist_directory: str, mode: str, dims: int) -> Optional["VectorProjection"]:
+    """
+    Proyección configurada para una colección.
+
+    Devuelve la guardada en persist_directory si coincide con mode y dims;
+    si no, una nueva (sin ajustar en PCA). None si mode es "none".
+    """
+    if mode == PROJECTION_NONE:
+        return None
+
+    projection = VectorProjection.load(os.path.join(persist_directory, PROJECTION_FILE))
+    if projection is not None and projection.mode == mode and projection.dims == dims:
+        return projection
+    return VectorProjection(mode, dims)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class VectorProjection:
+    """
+    Proyección lineal a menos dimensiones.
+
+    En PCA se ajusta con partial_fit por lotes y finalize; transform resta
+    la media, proyecta sobre las componentes principales y normaliza, de
+    modo que el producto punto sigue siendo una similitud coseno.
+    """
+
+    def __init__(self, mode: str, dims: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None,
+                 explained_variance: Optional[float] = None):
+        """
+        Inicializa la proyección.
+
+        Args:
+            mode (str): "pca" o "truncate"
+            dims (int): Dimensiones de salida
+            mean (Optional[np.ndarray]): Media de los vectores (PCA)
+            components (Optional[np.ndarray]): Matriz (dim, dims) de componentes (PCA)
+            explained_variance (Optional[float]): Fracción de varianza conservada (PCA)
+        """
+        if mode not in (PROJECTION_PCA, PROJECTION_TRUNCATE):
+            raise ValueError(f"Proyección no soportada: {mode}")
+
+        self.mode = mode
+        self.dims = dims
+        self.mean = mean
+        self.components = components
+        self.explained_variance = explained_variance
+
+        self._count = 0
+        self._sum: Optional[np.ndarray] = None
+        self._gram: Optional[np.ndarray] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.mode == PROJECTION_TRUNCATE or self.components is not None
+
+    def partial_fit(self, vectors: np.ndarray):
+        """Acumula media y matriz de Gram de un lote (solo PCA)"""
+        if self.mode != PROJECTION_PCA:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if self._sum is None:
+            self._sum = np.zeros(vectors.shape[1])
+            self._gram = np.zeros((vectors.shape[1], vectors.shape[1]))
+        self._count += len(vectors)
+        self._sum += vectors.sum(axis=0)
+        self._gram += vectors.T @ vectors
+
+    def finalize(self):
+        """Calcula las componentes principales a partir de lo acumulado"""
+        if self.mode != PROJECTION_PCA:
+            return
+        if self._count == 0:
+            raise ValueError("No hay vectores para ajustar la proyección PCA")
+        if self.dims >= len(self._sum):
+            raise ValueError(f"La proyección a {self.dims} dimensiones no reduce vectores de {len(self._sum)}")
+
+        mean = self._sum / self._count
+        covariance = self._gram / self._count - np.outer(mean, mean)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:self.dims]
+
+        self.mean = mean.astype(np.float32)
+        self.components = np.ascontiguousarray(eigenvectors[:, order], dtype=np.float32)
+        self.explained_variance = float(eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12))
+
+        self._count, self._sum, self._gram = 0, None, None
+        logger.info(
+            f"Proyección PCA ajustada a {self.dims} dimensiones "
+            f"({self.explained_variance:.1%} de la varianza)"
+        )
+
+    def fit(self, vectors: np.ndarray) -> "VectorProjection":
+        """Ajusta la proyección con una matriz completa"""
+        self.partial_fit(vectors)
+        self.finalize()
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Proyecta y normaliza uno o varios vectores.
+
+        Args:
+            vectors (np.ndarray): Vector (dim,) o matriz (n, dim)
+
+        Returns:
+            np.ndarray: Vectores float32 de dims dimensiones
+        """
+        if not self.fitted:
+            raise ValueError("La proyección PCA no está ajustada")
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mode == PROJECTION_TRUNCATE:
+            projected = vectors[..., :self.dims]
+        else:
+            projected = (vectors - self.mean) @ self.components
+        return _normalize(projected).astype(np.float32)
+
+    def save(self, path: str):
+        """Guarda la proyección de forma atómica"""
+        arrays = {"mode": np.array(self.mode), "dims": np.array(self.dims)}
+        if self.mode == PROJECTION_PCA:
+            arrays.update(
+                mean=self.mean,
+                components=self.components,
+                explained_variance=np.array(self.explained_variance)
+            )
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorProjection"]:
+        """Carga una proyección guardada, o None si no existe"""
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as data:
+            mode = str(data["mode"])
+            if mode == PROJECTION_PCA:
+                return cls(mode, int(data["dims"]), np.array(data["mean"]), np.array(data["components"]),
+                           float(data["explained_variance"]))
+            return cls(mode, int(data["dims"]))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "dims": self.dims,
+            "fitted": self.fitted,
+            "explained_variance": self.explained_variance
+        }
@@ -0,0 +1,372 @@
+"""
+Módulo: quantization.py
+Descripción: Almacenamiento cuantizado de vectores para la búsqueda en memoria. Los
+embeddings se guardan como float16 o como int8 por dimensión (uint8 con escala y offset
+por dimensión) en un archivo .npz junto a la colección de ChromaDB, que sigue siendo la
+fuente de textos y metadatos. Las consultas se puntúan descuantizando al vuelo por
+bloques, sin materializar la matriz float32 completa.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STORAGE_FLOAT32 = "float32"
+STORAGE_FLOAT16 = "float16"
+STORAGE_INT8 = "int8"
+STORAGE_MODES = (STORAGE_FLOAT32, STORAGE_FLOAT16, STORAGE_INT8)
+
+QUANTIZED_INDEX_FILE = "quantized_vectors.npz"
+
+# Filas descuantizadas a la vez al puntuar (el bloque float32 cabe en la caché L2)
+SCORE_BLOCK_ROWS = 1024
+# Margen relativo al calibrar int8, para valores algo fuera del rango inicial
+INT8_RANGE_MARGIN = 0.1
+# Fracción de valores recortados a partir de la cual VectorDatabase.flush() recalibra
+INT8_CLIP_WARNING = 0.01
+
+def default_storage_mode() -> str:
+    """Formato de los vectores en memoria (VECTOR_STORAGE: float32, float16 o int8)"""
+    mode = os.getenv("VECTOR_STORAGE", STORAGE_FLOAT32).lower()
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"VECTOR_STORAGE desconocido: {mode} (opciones: {', '.join(STORAGE_MODES)})")
+    return mode
+
+def recall_at_k(exact: Sequence[Sequence[str]], approximate: Sequence[Sequence[str]], k: int) -> float:
+    """
+    Recall@k promedio de una búsqueda aproximada frente a la exacta.
+
+    Args:
+        exact (Sequence[Sequence[str]]): Ids exactos por consulta (ordenados)
+        approximate (Sequence[Sequence[str]]): Ids aproximados por consulta
+        k (int): Resultados considerados
+
+    Returns:
+        float: Fracción de los k vecinos exactos recuperados
+    """
+    if not exact:
+        return 0.0
+    hits = sum(len(set(e[:k]) & set(a[:k])) / max(1, min(k, len(e))) for e, a in zip(exact, approximate))
+    return hits / len(exact)
+
+class ScalarQuantizer:
+    """
+    Cuantizador escalar float16 o int8 por dimensión.
+
+    El modo float32 no cuantiza; se usa cuando el índice en memoria solo
+    reduce la dimensión (ver embeddings/projection.py).
+
+    En int8 cada dimensión d guarda code = round((x - offset[d]) / scale[d])
+    en [0, 255]. El producto punto con una consulta q se calcula como
+    codes @ (q * scale) + q @ offset, sin descuantizar vector por vector.
+    """
+
+    def __init__(self, mode: str, scale: Optional[np.ndarray] = None, offset: Optional[np.ndarray] = None):
+        """
+        Inicializa el cuantizador.
+
+        Args:
+            mode (str): "float32", "float16" o "int8"
+            scale (Optional[np.ndarray]): Escala por dimensión (int8)
+            offset (Optional[np.ndarray]): Offset por dimensión (int8)
+        """
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Modo de cuantización no soportado: {mode}")
+
+        self.mode = mode
+        self.scale = scale
+        self.offset = offset
+        self.clipped = 0
+        self.encoded_values = 0
+
+    @property
+    def dtype(self):
+        if self.mode == STORAGE_INT8:
+            return np.uint8
+        return np.float16 if self.mode == STORAGE_FLOAT16 else np.float32
+
+    @property
+    def fitted(self) -> bool:
+        return self.mode != STORAGE_INT8 or self.scale is not None
+
+    @property
+    def clip_ratio(self) -> float:
+        """Fracción de valores recortados desde la calibración (o la carga)"""
+        return self.clipped / self.encoded_values if self.encoded_values else 0.0
+
+    @property
+    def needs_refit(self) -> bool:
+        """La calibración recorta demasiados valores (p. ej. se ajustó con un primer lote pequeño)"""
+        return self.mode == STORAGE_INT8 and self.clip_ratio > INT8_CLIP_WARNING
+
+    def fit(self, vectors: np.ndarray, margin: float = INT8_RANGE_MARGIN):
+        """Calibra escala y offset por dimensión a partir de una muestra (solo int8)"""
+        if self.mode != STORAGE_INT8:
+            return
+
+        low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        width = np.maximum(high - low, 1e-6)
+        low -= width * margin
+        high += width * margin
+
+        self.offset = low
+        self.scale = (high - low) / 255.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Cuantiza una matriz (n, dim) float32"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mode != STORAGE_INT8:
+            return vectors.astype(self.dtype)
+
+        if not self.fitted:
+            self.fit(vectors)
+
+        codes = np.rint((vectors - self.offset) / self.scale)
+        clipped = int(np.count_nonzero((codes < 0) | (codes > 255)))
+        self.clipped += clipped
+        self.encoded_values += codes.size
+        if clipped and self.needs_refit:
+            logger.warning(
+                f"{self.clipped} valores int8 recortados ({self.clip_ratio:.1%}); "
+                f"el índice se recalibrará en VectorDatabase.flush()"
+            )
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Descuantiza a float32"""
+        if self.mode != STORAGE_INT8:
+            return codes.astype(np.float32)
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, query: np.ndarray, codes: np.ndarray, block_rows: int = SCORE_BLOCK_ROWS) -> np.ndarray:
+        """
+        Producto punto de la consulta con cada vector cuantizado.
+
+        Args:
+            query (np.ndarray): Vector de consulta (dim,)
+            codes (np.ndarray): Vectores cuantizados (n, dim)
+            block_rows (int): Filas convertidas a float32 por bloque
+
+        Returns:
+            np.ndarray: Score float32 por vector
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self.mode == STORAGE_FLOAT32:
+            return codes @ query
+        if self.mode == STORAGE_FLOAT16:
+            weights, bias = query, 0.0
+        else:
+            weights, bias = query * self.scale, float(query @ self.offset)
+
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_rows):
+            block = codes[start:start + block_rows]
+            result[start:start + len(block)] = block.astype(np.float32) @ weights
+        return result + bias
+
+class QuantizedVectorStore:
+    """
+    Vectores cuantizados en memoria con sus ids, persistidos como .npz.
+
+    upsert reemplaza los vectores de ids existentes; las filas se guardan en
+    un buffer con capacidad creciente para que las inserciones por lotes no
+    copien toda la matriz cada vez. Se persiste con save() (atómico).
+    """
+
+    def __init__(self, index_path: str, mode: str):
+        """
+        Inicializa el almacén y lo carga si existe.
+
+        Args:
+            index_path (str): Archivo .npz del índice
+            mode (str): "float32", "float16" o "int8"
+        """
+        self.index_path = index_path
+        self.mode = mode
+        self.quantizer = ScalarQuantizer(mode)
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._codes: Optional[np.ndarray] = None
+        self._loaded_mtime: Optional[float] = None
+        self.dirty = False
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def codes(self) -> np.ndarray:
+        """Vectores cuantizados almacenados (vista sin la capacidad libre)"""
+        if self._codes is None:
+            return np.zeros((0, 0), dtype=self.quantizer.dtype)
+        return self._codes[:len(self.ids)]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes de los vectores cuantizados (sin ids)"""
+        return int(self.codes.nbytes)
+
+    def load(self):
+        """Carga el índice desde disco si existe"""
+        if not os.path.exists(self.index_path):
+            return
+
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                stored_mode = str(data["mode"])
+                if stored_mode != self.mode:
+                    logger.warning(
+                        f"El índice {self.index_path} está en {stored_mode}, no en {self.mode}; "
+                        f"se ignorará hasta reconstruirlo"
+                    )
+                    return
+                self.ids = [str(chunk_id) for chunk_id in data["ids"]]
+                self._codes = np.array(data["codes"])
+                if self.mode == STORAGE_INT8:
+                    self.quantizer = ScalarQuantizer(self.mode, data["scale"], data["offset"])
+
+            self.positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+            self._loaded_mtime = os.path.getmtime(self.index_path)
+            self.dirty = False
+            logger.info(f"Índice {self.mode} cargado: {len(self.ids)} vectores, {self.nbytes / 1e6:.1f} MB")
+
+        except Exception as e:
+            logger.error(f"Error cargando índice cuantizado {self.index_path}: {str(e)}")
+            raise
+
+    def reload_if_changed(self) -> bool:
+        """Vuelve a cargar el índice si otro proceso lo reescribió"""
+        if self.dirty or not os.path.exists(self.index_path):
+            return False
+        if os.path.getmtime(self.index_path) == self._loaded_mtime:
+            return False
+        self.load()
+        return True
+
+    def save(self):
+        """Guarda el índice de forma atómica"""
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        arrays = {
+            "mode": np.array(self.mode),
+            "ids": np.array(self.ids, dtype=str),
+            "codes": self.codes
+        }
+        if self.mode == STORAGE_INT8 and self.quantizer.fitted:
+            arrays["scale"] = self.quantizer.scale
+            arrays["offset"] = self.quantizer.offset
+
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.index_path)
+        self._loaded_mtime = os.path.getmtime(self.index_path)
+        self.dirty = False
+
+    def _reserve(self, rows: int, dim: int):
+        """Asegura capacidad para rows filas"""
+        if self._codes is None:
+            self._codes = np.empty((max(rows, 1024), dim), dtype=self.quantizer.dtype)
+        elif rows > len(self._codes):
+            grown = np.empty((max(rows, 2 * len(self._codes)), dim), dtype=self.quantizer.dtype)
+            grown[:len(self.ids)] = self._codes[:len(self.ids)]
+            self._codes = grown
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray):
+        """
+        Inserta o reemplaza vectores.
+
+        Args:
+            ids (Sequence[str]): Ids de los chunks
+            vectors (np.ndarray): Matriz (n, dim) float32
+        """
+        if len(ids) == 0:
+            return
+
+        codes = self.quantizer.encode(vectors)
+        self._reserve(len(self.ids) + len(ids), codes.shape[1])
+
+        for chunk_id, row in zip(ids, codes):
+            position = self.positions.get(chunk_id)
+            if position is None:
+                position = len(self.ids)
+                self.ids.append(chunk_id)
+                self.positions[chunk_id] = position
+            self._codes[position] = row
+        self.dirty = True
+
+    def remove(self, ids: Sequence[str]):
+        """Elimina vectores (la última fila ocupa el hueco)"""
+        for chunk_id in ids:
+            position = self.positions.pop(chunk_id, None)
+            if position is None:
+                continue
+
+            last = len(self.ids) - 1
+            if position != last:
+                moved = self.ids[last]
+                self._codes[position] = self._codes[last]
+                self.ids[position] = moved
+                self.positions[moved] = position
+            self.ids.pop()
+            self.dirty = True
+
+    def clear(self):
+        """Vacía el índice y olvida la calibración"""
+        self.ids = []
+        self.positions = {}
+        self._codes = None
+        self.quantizer = ScalarQuantizer(self.mode)
+        self.dirty = True
+
+    def search(self, query: np.ndarray, top_k: int = 5,
+               allowed_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Busca los vectores con mayor similitud coseno (los embeddings están normalizados).
+
+        Args:
+            query (np.ndarray): Embedding de la consulta normalizado
+            top_k (int): Número de resultados
+            allowed_ids (Optional[Set[str]]): Restringe la búsqueda a estos ids
+
+        Returns:
+            List[Tuple[str, float]]: (id, similitud) de mayor a menor
+        """
+        if not self.ids or top_k <= 0:
+            return []
+
+        scores = self.quantizer.scores(query, self.codes)
+        if allowed_ids is not None:
+            mask = np.full(len(scores), -np.inf, dtype=np.float32)
+            rows = [self.positions[chunk_id] for chunk_id in allowed_ids if chunk_id in self.positions]
+            mask[rows] = scores[rows]
+            scores = mask
+            top_k = min(top_k, len(rows))
+            if top_k == 0:
+                return []
+
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        order = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[i], float(scores[i])) for i in order]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tamaño del índice y bytes por vector"""
+        dim = self.codes.shape[1] if len(self.ids) else 0
+        return {
+            "storage": self.mode,
+            "vectors": len(self.ids),
+            "dimension": dim,
+            "bytes": self.nbytes,
+            "float32_bytes": len(self.ids) * dim * 4,
+            "clipped_values": self.quantizer.clipped,
+            "clip_ratio": round(self.quantizer.clip_ratio, 6)
+        }
@@ -7,22 +7,25 @@ Fecha: Octubre 2025
 """
 
 import os
-from langchain.document_loaders import DirectoryLoader, PyPDFLoader, Docx2txtLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import sys
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.llms import Ollama
 from langchain.chains import RetrievalQA
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest.ingest_data import incremental_ingest, load_documents as load_corpus
+from ingest.text_splitter import FastTextSplitter
+from retriever.vector_store import BACKEND_CHROMA, default_index_backend, default_shard_options
+
 def load_documents(path="data/docs"):
-    """Carga documentos del directorio especificado"""
-    loader = DirectoryLoader(path, glob="**/*.pdf", loader_cls=PyPDFLoader)
-    documents = loader.load()
-    return documents
+    """Carga documentos del directorio especificado (todos los formatos soportados)"""
+    return load_corpus(path)
 
 def split_documents(documents):
     """Divide documentos en fragmentos (chunks)"""
-    splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=80)
+    splitter = FastTextSplitter(chunk_size=600, chunk_overlap=80)
     return splitter.split_documents(documents)
 
 def create_embeddings():
@@ -41,6 +44,30 @@ def create_vectorstore(chunks, embeddings, persist_directory="data/vector_db"):
     )
     return vectorstore
 
+def check_vectorstore_backend():
+    """
+    La cadena de LangChain solo lee la colección de ChromaDB sin shards; con otro
+    backend (VECTOR_INDEX_BACKEND, VECTOR_SHARDS) la ingesta escribe en otro
+    índice y la colección estaría vacía o desactualizada.
+    """
+    backend = default_index_backend()
+    shards = default_shard_options()["count"]
+    if backend != BACKEND_CHROMA or shards > 1:
+        raise ValueError(
+            f"El pipeline RAG de LangChain requiere VECTOR_INDEX_BACKEND={BACKEND_CHROMA} sin shards "
+            f"(configurado: {backend}, {shards} shards); use el agente de la API (SemanticRetriever)"
+        )
+
+def load_vectorstore(embeddings, persist_directory="data/vector_db"):
+    """Abre la colección school_documents ya persistida sin volver a generar embeddings"""
+    check_vectorstore_backend()
+    vectorstore = Chroma(
+        collection_name="school_documents",
+        embedding_function=embeddings,
+        persist_directory=persist_directory
+    )
+    return vectorstore
+
 def create_qa_chain(vectorstore):
     """Crea cadena de pregunta-respuesta con RAG"""
     llm = Ollama(model="mistral:7b")
@@ -54,29 +81,27 @@ def create_qa_chain(vectorstore):
 def setup_rag_pipeline():
     """Configura el pipeline RAG completo"""
     print("Iniciando pipeline RAG para SchoolBot...")
+    check_vectorstore_backend()
     
-    # 1. Cargar documentos
-    print("1. Cargando documentos...")
-    documents = load_documents()
-    print(f"   Documentos cargados: {len(documents)}")
-    
-    # 2. Dividir en chunks
-    print("2. Dividiendo documentos en fragmentos...")
-    chunks = split_documents(documents)
-    print(f"   Fragmentos generados: {len(chunks)}")
+    # 1. Cargar, dividir y vectorizar solo documentos nuevos o modificados
+    print("1. Ingesta incremental de documentos...")
+    summary = incremental_ingest()
+    print(f"   Nuevos: {summary['new_files']}, modificados: {summary['changed_files']}, "
+          f"eliminados: {summary['removed_files']}, sin cambios: {summary['unchanged_files']}")
+    print(f"   Fragmentos agregados: {summary['chunks_added']}, eliminados: {summary['chunks_deleted']}")
     
-    # 3. Crear embeddings
-    print("3. Generando embeddings...")
+    # 2. Crear embeddings (para las consultas)
+    print("2. Cargando modelo de embeddings...")
     embeddings = create_embeddings()
     print("   Embeddings creados")
     
-    # 4. Crear base de datos vectorial
-    print("4. Creando base de datos vectorial...")
-    vectorstore = create_vectorstore(chunks, embeddings)
-    print("   Base de datos vectorial creada")
+    # 3. Abrir base de datos vectorial
+    print("3. Abriendo base de datos vectorial...")
+    vectorstore = load_vectorstore(embeddings)
+    print("   Base de datos vectorial lista")
     
-    # 5. Crear cadena QA
-    print("5. Configurando cadena de pregunta-respuesta...")
+    # 4. Crear cadena QA
+    print("4. Configurando cadena de pregunta-respuesta...")
     qa_chain = create_qa_chain(vectorstore)
     print("   Cadena QA configurada")
     
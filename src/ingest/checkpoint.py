@@ -0,0 +1,172 @@
+"""
+Módulo: checkpoint.py
+Descripción: Checkpoint de una ejecución de ingesta. Registra los archivos planificados
+(con su hash), los archivos ya confirmados en el manifiesto y el avance en lotes, de modo
+que una ingesta interrumpida pueda reanudarse sin volver a generar los embeddings de los
+chunks que ya quedaron almacenados en la colección.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import json
+import uuid
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = "data/vector_db/ingest_checkpoint.json"
+CHECKPOINT_EVERY_BATCHES = 10
+
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+
+@dataclass
+class CheckpointState:
+    """Estado persistido de una ejecución de ingesta"""
+    run_id: str
+    embedding_model: str
+    chunking: str
+    status: str = RUN_RUNNING
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    # Archivos a procesar en esta ejecución -> hash de contenido
+    planned: Dict[str, str] = field(default_factory=dict)
+    # Archivos ya registrados en el manifiesto
+    committed: List[str] = field(default_factory=list)
+    batches_stored: int = 0
+    chunks_stored: int = 0
+    chunks_resumed: int = 0
+
+    @property
+    def pending(self) -> Dict[str, str]:
+        """Archivos planificados que aún no se confirman"""
+        committed = set(self.committed)
+        return {key: content_hash for key, content_hash in self.planned.items() if key not in committed}
+
+class IngestCheckpoint:
+    """
+    Checkpoint de ingesta persistido como JSON junto al manifiesto.
+
+    Se guarda cada ``every`` lotes almacenados y cada vez que un archivo se
+    confirma en el manifiesto. Los chunks de un archivo interrumpido no se
+    listan aquí: al reanudar se consulta la colección por sus ids, que son
+    deterministas, siempre que el contenido del archivo no haya cambiado.
+    """
+
+    def __init__(self, checkpoint_path: str = DEFAULT_CHECKPOINT_PATH,
+                 every: int = CHECKPOINT_EVERY_BATCHES):
+        """
+        Inicializa el checkpoint.
+
+        Args:
+            checkpoint_path (str): Ruta del archivo JSON del checkpoint
+            every (int): Lotes almacenados entre guardados periódicos
+        """
+        self.checkpoint_path = checkpoint_path
+        self.every = max(1, every)
+        self.state: Optional[CheckpointState] = None
+        self._unsaved_batches = 0
+        self.load()
+
+    def load(self):
+        """Carga el checkpoint desde disco si existe"""
+        if not os.path.exists(self.checkpoint_path):
+            self.state = None
+            return
+
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                self.state = CheckpointState(**json.load(f))
+
+        except Exception as e:
+            logger.error(f"Error cargando checkpoint {self.checkpoint_path}: {str(e)}")
+            self.state = None
+
+    def save(self):
+        """Guarda el checkpoint de forma atómica"""
+        if self.state is None:
+            return
+
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.state.updated_at = datetime.now().isoformat()
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self.state), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+        self._unsaved_batches = 0
+
+    @property
+    def interrupted(self) -> Optional[CheckpointState]:
+        """Estado de una ejecución anterior que no terminó, si existe"""
+        if self.state is not None and self.state.status == RUN_RUNNING:
+            return self.state
+        return None
+
+    def can_resume(self, embedding_model: str, chunking: str) -> bool:
+        """Indica si la ejecución interrumpida es compatible con la configuración actual"""
+        state = self.interrupted
+        return (
+            state is not None
+            and state.embedding_model == embedding_model
+            and state.chunking == chunking
+        )
+
+    def start(self, planned: Dict[str, str], embedding_model: str, chunking: str,
+              resumed_from: Optional[CheckpointState] = None):
+        """
+        Inicia una ejecución nueva (o la continuación de una interrumpida).
+
+        Args:
+            planned (Dict[str, str]): Archivos a procesar -> hash de contenido
+            embedding_model (str): Modelo de embeddings
+            chunking (str): Modo de división
+            resumed_from (Optional[CheckpointState]): Ejecución que se reanuda
+        """
+        self.state = CheckpointState(
+            run_id=resumed_from.run_id if resumed_from else uuid.uuid4().hex,
+            embedding_model=embedding_model,
+            chunking=chunking,
+            planned=dict(planned),
+            batches_stored=resumed_from.batches_stored if resumed_from else 0,
+            chunks_stored=resumed_from.chunks_stored if resumed_from else 0
+        )
+        self.save()
+
+    def record_batch(self, chunks: int):
+        """Registra un lote almacenado; guarda cada ``every`` lotes"""
+        if self.state is None:
+            return
+
+        self.state.batches_stored += 1
+        self.state.chunks_stored += chunks
+        self._unsaved_batches += 1
+        if self._unsaved_batches >= self.every:
+            self.save()
+
+    def record_resumed(self, chunks: int):
+        """Registra chunks omitidos por estar ya almacenados"""
+        if self.state is not None:
+            self.state.chunks_resumed += chunks
+
+    def record_committed(self, keys: List[str]):
+        """Registra archivos confirmados en el manifiesto y guarda el checkpoint"""
+        if self.state is None or not keys:
+            return
+
+        self.state.committed.extend(keys)
+        self.save()
+
+    def finish(self):
+        """Marca la ejecución como completada"""
+        if self.state is None:
+            return
+
+        self.state.status = RUN_COMPLETED
+        self.save()
@@ -0,0 +1,171 @@
+"""
+Módulo: deduplication.py
+Descripción: Eliminación de chunks casi duplicados antes de generar embeddings.
+Cada chunk se resume con un SimHash de 64 bits sobre shingles de palabras; los chunks
+a distancia de Hamming <= max_distance de uno ya visto se omiten y quedan registrados
+como alias del chunk canónico (p. ej. encabezados, pies de contacto o datos de pago
+que se repiten en circulares y menús). Solo se comparan chunks del mismo document_type:
+un alias nunca apunta a un chunk que los filtros por rol no dejan ver.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import re
+import hashlib
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+TOKEN_PATTERN = re.compile(r"\w+")
+# Metadato que separa los grupos de deduplicación (los filtros por rol usan document_type)
+DEDUP_SCOPE_FIELD = "document_type"
+
+@dataclass
+class DeduplicationStats:
+    """Estadísticas de deduplicación"""
+    total_chunks: int = 0
+    unique_chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    @property
+    def duplicate_ratio(self) -> float:
+        if self.total_chunks == 0:
+            return 0.0
+        return self.duplicates / self.total_chunks
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    Calcula el SimHash de 64 bits de un texto.
+
+    Args:
+        text (str): Texto del chunk
+        shingle_size (int): Palabras por shingle
+
+    Returns:
+        int: Huella de 64 bits
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) <= shingle_size:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles),
+        dtype=np.uint8
+    ).reshape(-1, 8)
+
+    # Voto por bit: 1 si el bit está activo en más de la mitad de los shingles
+    bit_counts = np.unpackbits(hashes, axis=1).sum(axis=0, dtype=np.int64)
+    fingerprint_bits = (bit_counts * 2 > len(shingles)).astype(np.uint8)
+    return int.from_bytes(np.packbits(fingerprint_bits).tobytes(), "big")
+
+def hamming_distance(a: int, b: int) -> int:
+    """Número de bits distintos entre dos huellas"""
+    return bin(a ^ b).count("1")
+
+class ChunkDeduplicator:
+    """
+    Deduplicador de chunks basado en SimHash con índice LSH por bandas.
+
+    La huella se divide en max_distance + 1 bandas: por el principio del
+    palomar, dos huellas a distancia <= max_distance coinciden exactamente en
+    al menos una banda, de modo que solo se comparan los candidatos que
+    comparten alguna banda. La clave de cada banda incluye el document_type
+    del chunk, así que solo hay duplicados dentro de un mismo tipo.
+    """
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 3,
+                 scope_field: str = DEDUP_SCOPE_FIELD):
+        """
+        Inicializa el deduplicador.
+
+        Args:
+            max_distance (int): Distancia de Hamming máxima para considerar duplicado
+            shingle_size (int): Palabras por shingle
+            scope_field (str): Metadato que debe coincidir entre duplicados
+        """
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.scope_field = scope_field
+        self.num_bands = max_distance + 1
+        self.band_bits = -(-FINGERPRINT_BITS // self.num_bands)
+
+        self.band_index: Dict[Tuple[Optional[str], int, int], List[Tuple[int, str]]] = {}
+        self.fingerprints: Dict[str, int] = {}
+        self.stats = DeduplicationStats()
+
+    def _bands(self, fingerprint: int, scope: Optional[str] = None) -> List[Tuple[Optional[str], int, int]]:
+        mask = (1 << self.band_bits) - 1
+        return [(scope, band, (fingerprint >> (band * self.band_bits)) & mask) for band in range(self.num_bands)]
+
+    def add_canonical(self, chunk_id: str, fingerprint: int, scope: Optional[str] = None):
+        """Registra un chunk canónico (de un document_type) en el índice"""
+        self.fingerprints[chunk_id] = fingerprint
+        for key in self._bands(fingerprint, scope):
+            self.band_index.setdefault(key, []).append((fingerprint, chunk_id))
+
+    def seed(self, chunk_ids: Iterable[str], fingerprints: Iterable[int], scope: Optional[str] = None):
+        """Carga chunks (de un mismo document_type) ya almacenados en ejecuciones anteriores"""
+        for chunk_id, fingerprint in zip(chunk_ids, fingerprints):
+            self.add_canonical(chunk_id, fingerprint, scope)
+
+    def find_canonical(self, fingerprint: int, scope: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """
+        Busca un chunk canónico cercano a la huella dada dentro de un document_type.
+
+        Returns:
+            Optional[Tuple[str, int]]: Id del chunk canónico y distancia, o None
+        """
+        best = None
+        for key in self._bands(fingerprint, scope):
+            for candidate, chunk_id in self.band_index.get(key, ()):
+                distance = hamming_distance(fingerprint, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (chunk_id, distance)
+                    if distance == 0:
+                        return best
+        return best
+
+    def deduplicate(self, chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """
+        Filtra los chunks duplicados de una lista.
+
+        Args:
+            chunks (List[Dict[str, Any]]): Chunks con 'id', 'text' y 'metadata'
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, str]]: Chunks únicos y alias
+            {id_duplicado: id_canónico}
+        """
+        unique_chunks = []
+        aliases = {}
+
+        for chunk in chunks:
+            self.stats.total_chunks += 1
+            fingerprint = simhash(chunk["text"], self.shingle_size)
+            scope = (chunk.get("metadata") or {}).get(self.scope_field)
+            match = self.find_canonical(fingerprint, scope)
+
+            if match is None:
+                self.add_canonical(chunk["id"], fingerprint, scope)
+                unique_chunks.append(chunk)
+                self.stats.unique_chunks += 1
+                continue
+
+            aliases[chunk["id"]] = match[0]
+            if match[1] == 0:
+                self.stats.exact_duplicates += 1
+            else:
+                self.stats.near_duplicates += 1
+
+        return unique_chunks, aliases
@@ -6,19 +6,385 @@ Fecha: Octubre 2025
 """
 
 import os
-from langchain.document_loaders import DirectoryLoader, PyPDFLoader, Docx2txtLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import sys
+import glob
+import hashlib
+import logging
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Any, Optional, Iterator, Callable, Set
 
-def load_documents(path="data/docs"):
-    loader = DirectoryLoader(path, glob="**/*.pdf", loader_cls=PyPDFLoader)
-    documents = loader.load()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest.manifest import IngestManifest, DEFAULT_MANIFEST_PATH
+from ingest.loaders import supported_extensions
+from ingest.parallel_loader import ParallelDocumentLoader
+from ingest.text_splitter import FastTextSplitter
+from ingest.deduplication import ChunkDeduplicator
+from ingest.section_chunker import SectionChunker, SectionIndex
+from ingest.checkpoint import IngestCheckpoint
+from embeddings.generate_embeddings import EmbeddingPipeline
+from retriever.snapshot import export_snapshot, default_snapshot_root
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_PATTERNS = [f"**/*{extension}" for extension in supported_extensions()]
+STREAM_BATCH_SIZE = 256
+# Chunks almacenados entre escrituras a disco de la base vectorial durante una ingesta
+PERSIST_INTERVAL = int(os.getenv("INGEST_PERSIST_INTERVAL", "10000"))
+CHUNKING_MODES = ("recursive", "sections")
+DEFAULT_CHUNKING = os.getenv("INGEST_CHUNKING", "recursive")
+
+def load_documents(path="data/docs", max_workers=None):
+    loader = ParallelDocumentLoader(max_workers=max_workers)
+    documents = loader.load(list_document_files(path))
     return documents
 
-def split_documents(documents):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=80)
+def split_documents(documents, chunking="recursive"):
+    if chunking not in CHUNKING_MODES:
+        raise ValueError(f"Modo de división no soportado: {chunking}")
+
+    if chunking == "sections":
+        splitter = SectionChunker(chunk_overlap=80)
+    else:
+        splitter = FastTextSplitter(chunk_size=600, chunk_overlap=80)
     return splitter.split_documents(documents)
 
+def list_document_files(path="data/docs", patterns=None):
+    """Lista (ordenados) los archivos del corpus que soporta la ingesta"""
+    files = set()
+    for pattern in patterns or DOCUMENT_PATTERNS:
+        files.update(glob.glob(os.path.join(path, pattern), recursive=True))
+    return sorted(f for f in files if os.path.isfile(f))
+
+def load_file(file_path):
+    """Carga un único archivo del corpus"""
+    return ParallelDocumentLoader(max_workers=1).load([file_path])
+
+def generate_chunk_id(file_path: str, chunk_index: int) -> str:
+    """Id determinista de un chunk: mismo archivo y posición producen el mismo id"""
+    doc_key = hashlib.md5(IngestManifest.normalize_path(file_path).encode("utf-8")).hexdigest()[:16]
+    return f"{doc_key}_chunk_{chunk_index}"
+
+def chunks_to_records(file_path: str, chunks) -> List[Dict[str, Any]]:
+    """Convierte los chunks de LangChain de un archivo al formato de EmbeddingPipeline"""
+    records = []
+    for i, chunk in enumerate(chunks):
+        metadata = dict(chunk.metadata)
+        metadata["source"] = IngestManifest.normalize_path(file_path)
+        metadata["file_name"] = os.path.basename(file_path)
+        metadata["chunk_index"] = i
+        records.append({
+            "id": generate_chunk_id(file_path, i),
+            "text": chunk.page_content,
+            "metadata": metadata
+        })
+    return records
+
+def iter_chunk_records(file_paths, max_workers=None, on_file_done=None,
+                       deduplicator: Optional[ChunkDeduplicator] = None,
+                       chunking: str = "recursive",
+                       document_types: Optional[Dict[str, str]] = None,
+                       already_stored: Optional[Callable[[str, List[str]], Set[str]]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Flujo de chunks: carga, divide y entrega los chunks archivo por archivo.
+
+    Args:
+        file_paths: Archivos a procesar
+        max_workers (Optional[int]): Procesos para el parseo paralelo
+        on_file_done (Optional[Callable]): Se invoca con (file_path, records, aliases, sections,
+            skipped) cuando todos los chunks de un archivo ya fueron entregados
+        deduplicator (Optional[ChunkDeduplicator]): Omite chunks casi duplicados
+        chunking (str): Modo de división ("recursive" o "sections")
+        document_types (Optional[Dict[str, str]]): document_type explícito por archivo,
+            en lugar del inferido por el nombre
+        already_stored (Optional[Callable]): Retorna, para (file_path, ids), los ids que ya
+            están en la colección; esos chunks no se entregan (skipped)
+    """
+    loader = ParallelDocumentLoader(max_workers=max_workers)
+    for file_path, documents in loader.iter_files(file_paths):
+        records = chunks_to_records(file_path, split_documents(documents, chunking))
+        if document_types and file_path in document_types:
+            for record in records:
+                record["metadata"]["document_type"] = document_types[file_path]
+        # Las secciones se registran antes de deduplicar: sus offsets no dependen de los alias
+        sections = SectionIndex.summarize(records) if chunking == "sections" else []
+        aliases = {}
+        if deduplicator is not None:
+            records, aliases = deduplicator.deduplicate(records)
+        pending = records
+        if already_stored is not None:
+            stored = already_stored(file_path, [record["id"] for record in records])
+            if stored:
+                pending = [record for record in records if record["id"] not in stored]
+        if on_file_done is not None:
+            on_file_done(file_path, records, aliases, sections, len(records) - len(pending))
+        yield from pending
+
+def incremental_ingest(path="data/docs", manifest_path=DEFAULT_MANIFEST_PATH,
+                       pipeline: Optional[EmbeddingPipeline] = None,
+                       max_workers: Optional[int] = None,
+                       batch_size: int = STREAM_BATCH_SIZE,
+                       deduplicate: bool = True,
+                       chunking: str = DEFAULT_CHUNKING,
+                       file_paths: Optional[List[str]] = None,
+                       document_types: Optional[Dict[str, str]] = None,
+                       lock=None,
+                       resume: bool = False,
+                       persist_interval: int = PERSIST_INTERVAL) -> Dict[str, Any]:
+    """
+    Ingesta incremental y en streaming del corpus en la colección school_documents.
+
+    Solo carga, divide y genera embeddings de los archivos nuevos o modificados
+    según el manifiesto, y elimina de la colección los chunks de los archivos
+    modificados o eliminados. Los chunks fluyen en lotes de tamaño fijo desde el
+    loader hasta la base vectorial, por lo que la memoria no depende del tamaño
+    del corpus. Los chunks casi duplicados (también respecto de archivos ya
+    ingeridos) se omiten y quedan registrados como alias en el manifiesto. Con
+    chunking="sections" se mantiene además el índice de secciones junto al manifiesto.
+
+    Con file_paths solo se consideran esos archivos (el resto del corpus no se
+    marca como eliminado). Si se entrega un lock, el manifiesto y el índice de
+    secciones se recargan y guardan bajo el lock en cada actualización, de modo
+    que varias ingestas pueden correr en paralelo en el mismo proceso.
+
+    Las ejecuciones sobre todo el directorio mantienen un checkpoint junto al
+    manifiesto. Si una ejecución anterior quedó interrumpida, con resume=True
+    los chunks que ya están en la colección (y cuyo archivo no cambió) no
+    vuelven a generar embeddings; sin resume se eliminan y se reprocesan.
+
+    La base vectorial se recarga al empezar, por si otro proceso la modificó, y
+    se persiste cada persist_interval chunks y al terminar; los archivos se
+    registran en el manifiesto solo tras persistir todos sus chunks.
+
+    Args:
+        path (str): Directorio de documentos
+        manifest_path (str): Ruta del manifiesto de ingesta
+        pipeline (Optional[EmbeddingPipeline]): Pipeline de embeddings a reutilizar
+        max_workers (Optional[int]): Procesos para el parseo paralelo
+        batch_size (int): Chunks por lote de embeddings/escritura
+        deduplicate (bool): Omitir chunks casi duplicados antes de generar embeddings
+        chunking (str): Modo de división ("recursive" o "sections")
+        file_paths (Optional[List[str]]): Archivos a ingerir (por defecto, todo el directorio)
+        document_types (Optional[Dict[str, str]]): document_type explícito por archivo
+        lock: Lock compartido entre ingestas concurrentes (p. ej. threading.Lock)
+        resume (bool): Reanudar la ejecución interrumpida registrada en el checkpoint
+        persist_interval (int): Chunks almacenados entre escrituras a disco de la base vectorial
+
+    Returns:
+        Dict[str, Any]: Resumen de la ejecución
+    """
+    pipeline = pipeline or EmbeddingPipeline()
+    model_name = pipeline.embedding_generator.model_name
+    manifest = IngestManifest(manifest_path)
+    section_index = SectionIndex(os.path.join(os.path.dirname(manifest_path), "section_index.json"))
+
+    @contextmanager
+    def manifest_update():
+        """Modificación del manifiesto y del índice de secciones, atómica respecto del lock"""
+        with lock or nullcontext():
+            if lock is not None:
+                manifest.load()
+                section_index.load()
+            yield
+            section_index.save()
+            manifest.save()
+
+    with manifest_update():
+        # Un pipeline reutilizado (API) puede tener en memoria una copia anterior a
+        # otra ingesta; persistirla la borraría
+        pipeline.vector_db.reload_if_changed()
+
+        targets = list_document_files(path) if file_paths is None else list(file_paths)
+        diff = manifest.diff(targets, model_name, chunking)
+        unchanged = {IngestManifest.normalize_path(file_path): file_path for file_path in diff.unchanged}
+        if file_paths is not None:
+            # Ingesta parcial: el resto del corpus no se elimina, pero sí puede depender
+            # de los chunks reemplazados
+            diff.removed = []
+            target_keys = {IngestManifest.normalize_path(file_path) for file_path in targets}
+            for key, entry in manifest.entries.items():
+                if key not in target_keys and os.path.exists(entry.file_path):
+                    unchanged[key] = entry.file_path
+
+        logger.info(
+            f"Ingesta incremental: {len(diff.new)} nuevos, {len(diff.changed)} modificados, "
+            f"{len(diff.removed)} eliminados, {len(diff.unchanged)} sin cambios"
+        )
+
+        # Eliminar chunks obsoletos antes de insertar los nuevos. Los archivos sin
+        # cambios cuyos duplicados apuntaban a esos chunks también se reprocesan.
+        stale_files = diff.removed + diff.changed
+        stale_ids = []
+        while stale_files:
+            removed_ids = []
+            for file_path in stale_files:
+                removed_ids.extend(manifest.remove(file_path))
+                section_index.remove(file_path)
+            stale_ids.extend(removed_ids)
+
+            stale_files = [unchanged.pop(key) for key in manifest.dependent_files(removed_ids) if key in unchanged]
+            for file_path in stale_files:
+                if file_path in diff.unchanged:
+                    diff.unchanged.remove(file_path)
+                diff.changed.append(file_path)
+
+        if stale_ids:
+            pipeline.vector_db.delete_embeddings(stale_ids)
+
+        deduplicator = None
+        if deduplicate:
+            deduplicator = ChunkDeduplicator()
+            for entry in manifest.entries.values():
+                deduplicator.seed(entry.chunk_ids, entry.fingerprints, entry.document_type)
+
+        # Checkpoint (solo en ejecuciones sobre todo el directorio)
+        checkpoint = None
+        resumable = set()
+        if file_paths is None:
+            checkpoint = IngestCheckpoint(os.path.join(os.path.dirname(manifest_path), "ingest_checkpoint.json"))
+            planned = {}
+            for file_path in diff.to_process:
+                key = IngestManifest.normalize_path(file_path)
+                planned[key] = diff.hashes.setdefault(key, IngestManifest.compute_hash(file_path))
+
+            interrupted = checkpoint.interrupted
+            resuming = resume and checkpoint.can_resume(model_name, chunking)
+            if interrupted is not None:
+                for key, content_hash in interrupted.pending.items():
+                    if key in manifest.entries:
+                        continue
+                    if resuming and planned.get(key) == content_hash:
+                        resumable.add(key)
+                    else:
+                        # Chunks huérfanos de la ejecución interrumpida
+                        pipeline.vector_db.delete_by_source(key)
+                logger.info(f"Ejecución {interrupted.run_id} interrumpida: {len(resumable)} archivos se reanudan")
+            elif resume:
+                logger.info("No hay una ejecución interrumpida que reanudar")
+
+            checkpoint.start(planned, model_name, chunking, resumed_from=interrupted if resuming else None)
+
+    def already_stored(file_path, ids):
+        if IngestManifest.normalize_path(file_path) not in resumable:
+            return set()
+        stored = pipeline.vector_db.get_existing_ids(ids)
+        checkpoint.record_resumed(len(stored))
+        return stored
+
+    # Un archivo se registra en el manifiesto solo cuando todos sus chunks están almacenados
+    pending_files = deque()  # (file_path, chunk_ids, aliases, sections, posición final en el flujo, document_type)
+    progress = {"emitted": 0, "stored": 0, "persisted": 0}
+
+    def on_file_done(file_path, records, aliases, sections, skipped):
+        progress["emitted"] += len(records) - skipped
+        document_type = records[0]["metadata"].get("document_type") if records else None
+        pending_files.append((file_path, [record["id"] for record in records], aliases, sections, progress["emitted"], document_type))
+
+    def commit_stored_files(batch=(), final=False):
+        progress["stored"] += len(batch)
+        if checkpoint is not None and batch:
+            checkpoint.record_batch(len(batch))
+        if not pending_files or pending_files[0][4] > progress["stored"]:
+            return
+        # Cada persist() reescribe los índices completos (numpy, hnsw, índice en memoria)
+        if not final and progress["stored"] - progress["persisted"] < persist_interval:
+            return
+
+        # Persistir antes de registrar archivos en el manifiesto
+        pipeline.vector_db.persist()
+        progress["persisted"] = progress["stored"]
+
+        committed = []
+        with manifest_update():
+            while pending_files and pending_files[0][4] <= progress["stored"]:
+                file_path, chunk_ids, aliases, sections, _, document_type = pending_files.popleft()
+                committed.append(IngestManifest.normalize_path(file_path))
+                manifest.update(
+                    file_path,
+                    chunk_ids,
+                    model_name,
+                    content_hash=diff.hashes.get(IngestManifest.normalize_path(file_path)),
+                    fingerprints=[deduplicator.fingerprints[chunk_id] for chunk_id in chunk_ids] if deduplicator else None,
+                    aliases=aliases,
+                    chunking=chunking,
+                    document_type=document_type
+                )
+                section_index.update(file_path, sections)
+        if checkpoint is not None:
+            checkpoint.record_committed(committed)
+
+    records = iter_chunk_records(
+        diff.to_process,
+        max_workers=max_workers,
+        on_file_done=on_file_done,
+        deduplicator=deduplicator,
+        chunking=chunking,
+        document_types=document_types,
+        already_stored=already_stored if resumable else None
+    )
+    stats = pipeline.process_stream(records, batch_size=batch_size, on_batch_stored=commit_stored_files)
+
+    # Archivos pendientes de la última persistencia y archivos sin chunks al final del flujo
+    commit_stored_files(final=True)
+    if checkpoint is not None:
+        checkpoint.finish()
+
+    return {
+        "new_files": len(diff.new),
+        "changed_files": len(diff.changed),
+        "removed_files": len(diff.removed),
+        "unchanged_files": len(diff.unchanged),
+        "chunks_added": stats["chunks"],
+        "chunks_deleted": len(stale_ids),
+        "chunks_deduplicated": deduplicator.stats.duplicates if deduplicator else 0,
+        "chunks_resumed": checkpoint.state.chunks_resumed if checkpoint else 0,
+        "batches": stats["batches"],
+        "embedding_throughput": stats.get("throughput", {}),
+        "vector_db_write": stats.get("write", {})
+    }
+
 if __name__ == "__main__":
-    docs = load_documents()
-    chunks = split_documents(docs)
-    print(f"Documentos procesados: {len(chunks)} fragmentos generados.")
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingesta incremental del corpus en school_documents")
+    parser.add_argument("--path", default="data/docs", help="Directorio de documentos")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Ruta del manifiesto de ingesta")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reanudar la última ejecución interrumpida sin regenerar los chunks ya almacenados")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para el parseo paralelo")
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE, help="Chunks por lote")
+    parser.add_argument("--persist-interval", type=int, default=PERSIST_INTERVAL,
+                        help="Chunks almacenados entre escrituras a disco de la base vectorial")
+    parser.add_argument("--chunking", choices=CHUNKING_MODES, default=DEFAULT_CHUNKING)
+    parser.add_argument("--no-dedup", action="store_true", help="No omitir chunks casi duplicados")
+    parser.add_argument("--embedding-workers", type=int, default=None,
+                        help="Procesos para generar embeddings (por defecto EMBEDDING_WORKERS); "
+                             "conviene subir --batch-size para que cada worker reciba lotes grandes")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Exportar un snapshot del índice vectorial al terminar (backend snapshot de la API)")
+    args = parser.parse_args()
+
+    pipeline = EmbeddingPipeline(num_workers=args.embedding_workers)
+    try:
+        summary = incremental_ingest(
+            path=args.path,
+            manifest_path=args.manifest,
+            pipeline=pipeline,
+            max_workers=args.workers,
+            batch_size=args.batch_size,
+            deduplicate=not args.no_dedup,
+            chunking=args.chunking,
+            resume=args.resume,
+            persist_interval=args.persist_interval
+        )
+        if args.snapshot:
+            vector_db = pipeline.vector_db
+            if vector_db.store is None:
+                vector_db.initialize()
+            summary["snapshot"] = export_snapshot(
+                vector_db.store, default_snapshot_root(vector_db.persist_directory), args.manifest
+            )["id"]
+    finally:
+        pipeline.close()
+    print(f"Ingesta incremental completada: {summary}")
@@ -0,0 +1,172 @@
+"""
+Módulo: loaders.py
+Descripción: Registro de loaders por extensión (TXT, PDF, DOCX, XLSX) usado por la ingesta.
+Cada loader recibe la ruta de un archivo y retorna sus páginas como diccionarios simples
+(page_content, metadata) para que puedan viajar entre procesos sin dependencias de LangChain.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import mmap
+import logging
+from typing import List, Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+LOADER_REGISTRY: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {}
+
+# Prefijo del nombre de archivo -> document_type usado por los filtros del retriever
+DOCUMENT_TYPE_PREFIXES = {
+    "reglamento": "reglamento_escolar",
+    "calendario": "calendario_academico",
+    "circular": "circular_apoderados",
+    "menu": "menu_almuerzos",
+    "manual": "manual_procedimientos",
+}
+DEFAULT_DOCUMENT_TYPE = "documento_general"
+
+def register_loader(*extensions: str):
+    """
+    Decorador que registra un loader para una o más extensiones.
+
+    Args:
+        extensions (str): Extensiones en minúscula con punto (p. ej. ".txt")
+    """
+    def decorator(loader):
+        for extension in extensions:
+            LOADER_REGISTRY[extension.lower()] = loader
+        return loader
+    return decorator
+
+def supported_extensions() -> List[str]:
+    """Extensiones con loader registrado"""
+    return sorted(LOADER_REGISTRY)
+
+def infer_document_type(file_name: str) -> str:
+    """
+    Infiere el document_type a partir del nombre del archivo.
+
+    Args:
+        file_name (str): Nombre o ruta del archivo
+
+    Returns:
+        str: Tipo de documento (documento_general si no hay coincidencia)
+    """
+    name = os.path.basename(file_name).lower()
+    for prefix, document_type in DOCUMENT_TYPE_PREFIXES.items():
+        if name.startswith(prefix):
+            return document_type
+    return DEFAULT_DOCUMENT_TYPE
+
+def _page(text: str, file_path: str, page: int) -> Dict[str, Any]:
+    return {
+        "page_content": text,
+        "metadata": {"source": file_path, "page": page}
+    }
+
+@register_loader(".txt")
+def parse_text(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Lee un archivo de texto plano mediante mmap.
+
+    El decodificado se hace directamente sobre las páginas mapeadas, sin leer
+    el archivo a un buffer de bytes intermedio. La codificación usada queda en
+    el metadato encoding (los offsets en bytes de las secciones dependen de ella).
+    """
+    if os.path.getsize(file_path) == 0:
+        return [_page("", file_path, 0)]
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        try:
+            encoding = "utf-8"
+            text = str(mapped, encoding)
+        except UnicodeDecodeError:
+            # Archivos antiguos exportados desde Windows
+            encoding = "cp1252"
+            text = str(mapped, encoding, errors="replace")
+
+    page = _page(text, file_path, 0)
+    page["metadata"]["encoding"] = encoding
+    return [page]
+
+@register_loader(".pdf")
+def parse_pdf(file_path: str) -> List[Dict[str, Any]]:
+    """Extrae el texto de un PDF página a página (PyMuPDF, con PyPDF2 como respaldo)"""
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(file_path) as pdf:
+            return [_page(page.get_text(), file_path, i) for i, page in enumerate(pdf)]
+
+    except ImportError:
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(file_path)
+        return [_page(page.extract_text() or "", file_path, i) for i, page in enumerate(reader.pages)]
+
+@register_loader(".docx")
+def parse_docx(file_path: str) -> List[Dict[str, Any]]:
+    """Extrae párrafos y tablas de un documento Word como una sola página"""
+    import docx
+
+    document = docx.Document(file_path)
+    parts = [paragraph.text for paragraph in document.paragraphs if paragraph.text.strip()]
+
+    for table in document.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells]
+            if any(cells):
+                parts.append(" | ".join(cells))
+
+    return [_page("\n".join(parts), file_path, 0)]
+
+@register_loader(".xlsx")
+def parse_xlsx(file_path: str) -> List[Dict[str, Any]]:
+    """Extrae cada hoja de un Excel como una página (una fila por línea)"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    pages = []
+
+    try:
+        for i, sheet in enumerate(workbook.worksheets):
+            lines = []
+            for row in sheet.iter_rows(values_only=True):
+                values = [str(value) for value in row if value is not None]
+                if values:
+                    lines.append(" | ".join(values))
+
+            page = _page("\n".join(lines), file_path, i)
+            page["metadata"]["sheet"] = sheet.title
+            pages.append(page)
+    finally:
+        workbook.close()
+
+    return pages
+
+def parse_file(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Parsea un archivo con el loader registrado para su extensión.
+
+    Args:
+        file_path (str): Ruta del archivo
+
+    Returns:
+        List[Dict[str, Any]]: Páginas del documento con file_name y document_type
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    loader = LOADER_REGISTRY.get(extension)
+
+    if loader is None:
+        raise ValueError(f"Formato no soportado: {extension}")
+
+    pages = loader(file_path)
+
+    file_name = os.path.basename(file_path)
+    document_type = infer_document_type(file_name)
+    for page in pages:
+        page["metadata"].setdefault("file_name", file_name)
+        page["metadata"].setdefault("document_type", document_type)
+
+    return pages
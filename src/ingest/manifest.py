@@ -0,0 +1,246 @@
+"""
+Módulo: manifest.py
+Descripción: Manifiesto persistente de ingesta. Registra por archivo su tamaño, fecha de
+modificación, hash de contenido, ids de chunks, huellas de deduplicación y modelo de
+embeddings utilizado, para que una nueva ejecución procese solo los archivos nuevos o
+modificados.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = "data/vector_db/ingest_manifest.json"
+
+@dataclass
+class ManifestEntry:
+    """Estado registrado de un archivo ingerido"""
+    file_path: str
+    size: int
+    mtime: float
+    content_hash: str
+    chunk_ids: List[str]
+    embedding_model: str
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    # SimHash de cada chunk almacenado (paralelo a chunk_ids)
+    fingerprints: List[int] = field(default_factory=list)
+    # Chunks omitidos por duplicados: {id_duplicado: id_canónico}
+    aliases: Dict[str, str] = field(default_factory=dict)
+    # Modo de división usado ("recursive" o "sections")
+    chunking: str = "recursive"
+    # document_type de los chunks (la deduplicación solo compara chunks del mismo tipo)
+    document_type: Optional[str] = None
+
+@dataclass
+class ManifestDiff:
+    """Resultado de comparar el directorio de documentos con el manifiesto"""
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def to_process(self) -> List[str]:
+        """Archivos que deben (re)procesarse"""
+        return self.new + self.changed
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.new or self.changed or self.removed)
+
+class IngestManifest:
+    """
+    Manifiesto de ingesta incremental.
+
+    Se persiste como JSON junto a la base vectorial. La detección de cambios
+    compara primero tamaño y mtime (barato) y solo calcula el hash SHA-256
+    cuando alguno de ellos difiere.
+    """
+
+    def __init__(self, manifest_path: str = DEFAULT_MANIFEST_PATH):
+        """
+        Inicializa el manifiesto.
+
+        Args:
+            manifest_path (str): Ruta del archivo JSON del manifiesto
+        """
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, ManifestEntry] = {}
+        self.load()
+
+    @staticmethod
+    def normalize_path(file_path: str) -> str:
+        """Clave estable para un archivo"""
+        return os.path.normpath(file_path).replace(os.sep, "/")
+
+    @staticmethod
+    def compute_hash(file_path: str, block_size: int = 1 << 20) -> str:
+        """
+        Calcula el hash SHA-256 del contenido de un archivo.
+
+        Args:
+            file_path (str): Ruta del archivo
+            block_size (int): Tamaño del bloque de lectura
+
+        Returns:
+            str: Hash hexadecimal
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load(self):
+        """Carga el manifiesto desde disco si existe"""
+        if not os.path.exists(self.manifest_path):
+            self.entries = {}
+            return
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            self.entries = {
+                key: ManifestEntry(**entry)
+                for key, entry in data.get("files", {}).items()
+            }
+            logger.info(f"Manifiesto cargado: {len(self.entries)} archivos registrados")
+
+        except Exception as e:
+            logger.error(f"Error cargando manifiesto {self.manifest_path}: {str(e)}")
+            self.entries = {}
+
+    def save(self):
+        """Guarda el manifiesto de forma atómica"""
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "version": MANIFEST_VERSION,
+            "updated_at": datetime.now().isoformat(),
+            "files": {key: asdict(entry) for key, entry in self.entries.items()}
+        }
+
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def diff(self, file_paths: Iterable[str], embedding_model: str,
+             chunking: str = "recursive") -> ManifestDiff:
+        """
+        Compara los archivos actuales con el manifiesto.
+
+        Args:
+            file_paths (Iterable[str]): Archivos presentes en el corpus
+            embedding_model (str): Modelo de embeddings de la ejecución actual
+            chunking (str): Modo de división de la ejecución actual
+
+        Returns:
+            ManifestDiff: Archivos nuevos, modificados, sin cambios y eliminados
+        """
+        result = ManifestDiff()
+        seen = set()
+
+        for file_path in file_paths:
+            key = self.normalize_path(file_path)
+            seen.add(key)
+            entry = self.entries.get(key)
+
+            if entry is None:
+                result.new.append(file_path)
+                continue
+
+            # Un cambio de modelo o de modo de división invalida todos los chunks del archivo
+            if entry.embedding_model != embedding_model or entry.chunking != chunking:
+                result.changed.append(file_path)
+                continue
+
+            stat = os.stat(file_path)
+            if stat.st_size == entry.size and stat.st_mtime == entry.mtime:
+                result.unchanged.append(file_path)
+                continue
+
+            content_hash = self.compute_hash(file_path)
+            result.hashes[key] = content_hash
+
+            if content_hash == entry.content_hash:
+                # Solo cambió el mtime (p. ej. copia o touch): no reprocesar
+                entry.size = stat.st_size
+                entry.mtime = stat.st_mtime
+                result.unchanged.append(file_path)
+            else:
+                result.changed.append(file_path)
+
+        result.removed = [key for key in self.entries if key not in seen]
+        return result
+
+    def get_chunk_ids(self, file_path: str) -> List[str]:
+        """Ids de chunks registrados para un archivo"""
+        entry = self.entries.get(self.normalize_path(file_path))
+        return list(entry.chunk_ids) if entry else []
+
+    def dependent_files(self, chunk_ids: Iterable[str]) -> List[str]:
+        """
+        Archivos con chunks omitidos como alias de alguno de los chunks dados.
+
+        Si un chunk canónico se elimina, sus duplicados deben volver a procesarse.
+        """
+        targets = set(chunk_ids)
+        return [
+            key for key, entry in self.entries.items()
+            if any(canonical in targets for canonical in entry.aliases.values())
+        ]
+
+    def update(self, file_path: str, chunk_ids: List[str], embedding_model: str,
+               content_hash: Optional[str] = None, fingerprints: Optional[List[int]] = None,
+               aliases: Optional[Dict[str, str]] = None, chunking: str = "recursive",
+               document_type: Optional[str] = None):
+        """
+        Registra (o reemplaza) el estado de un archivo procesado.
+
+        Args:
+            file_path (str): Ruta del archivo
+            chunk_ids (List[str]): Ids de los chunks almacenados
+            embedding_model (str): Modelo usado para generar los embeddings
+            content_hash (Optional[str]): Hash ya calculado, si existe
+            fingerprints (Optional[List[int]]): SimHash de los chunks almacenados
+            aliases (Optional[Dict[str, str]]): Chunks duplicados omitidos
+            chunking (str): Modo de división usado
+            document_type (Optional[str]): document_type de los chunks del archivo
+        """
+        stat = os.stat(file_path)
+        self.entries[self.normalize_path(file_path)] = ManifestEntry(
+            file_path=self.normalize_path(file_path),
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            content_hash=content_hash or self.compute_hash(file_path),
+            chunk_ids=list(chunk_ids),
+            embedding_model=embedding_model,
+            fingerprints=list(fingerprints or []),
+            aliases=dict(aliases or {}),
+            chunking=chunking,
+            document_type=document_type
+        )
+
+    def remove(self, file_path: str) -> List[str]:
+        """
+        Elimina un archivo del manifiesto.
+
+        Returns:
+            List[str]: Ids de chunks que tenía registrados
+        """
+        entry = self.entries.pop(self.normalize_path(file_path), None)
+        return list(entry.chunk_ids) if entry else []
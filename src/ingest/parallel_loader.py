@@ -0,0 +1,101 @@
+"""
+Módulo: parallel_loader.py
+Descripción: Carga paralela de documentos. Reparte el parseo de archivos en un pool de
+procesos y entrega las páginas en el mismo orden de entrada a medida que se completan.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import List, Iterable, Iterator, Tuple, Optional, Dict, Any
+from langchain.docstore.document import Document
+
+from ingest.loaders import parse_file
+
+logger = logging.getLogger(__name__)
+
+def default_workers() -> int:
+    """Número de procesos por defecto (INGEST_WORKERS o todos los núcleos)"""
+    return int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+def _load_worker(file_path: str) -> Tuple[str, List[Dict[str, Any]], Optional[str]]:
+    """Parsea un archivo dentro de un proceso del pool; nunca propaga excepciones"""
+    try:
+        return file_path, parse_file(file_path), None
+    except Exception as e:
+        return file_path, [], str(e)
+
+class ParallelDocumentLoader:
+    """
+    Cargador de documentos con pool de procesos.
+
+    Mantiene como máximo ``max_workers * prefetch`` archivos en vuelo, de modo que
+    la memoria no crece con el tamaño del corpus aunque el consumidor sea lento.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, prefetch: int = 2):
+        """
+        Inicializa el cargador.
+
+        Args:
+            max_workers (Optional[int]): Procesos del pool (1 = sin pool)
+            prefetch (int): Archivos en vuelo por proceso
+        """
+        self.max_workers = max_workers or default_workers()
+        self.prefetch = max(1, prefetch)
+
+    @staticmethod
+    def _to_documents(pages: List[Dict[str, Any]]) -> List[Document]:
+        return [Document(page_content=page["page_content"], metadata=page["metadata"]) for page in pages]
+
+    def iter_files(self, file_paths: Iterable[str]) -> Iterator[Tuple[str, List[Document]]]:
+        """
+        Parsea archivos en paralelo y los entrega en orden.
+
+        Args:
+            file_paths (Iterable[str]): Archivos a cargar
+
+        Yields:
+            Tuple[str, List[Document]]: Ruta del archivo y sus páginas.
+            Los archivos que fallan se registran en el log y se omiten.
+        """
+        if self.max_workers <= 1:
+            results = map(_load_worker, file_paths)
+        else:
+            results = self._iter_pool_results(file_paths)
+
+        for file_path, pages, error in results:
+            if error:
+                logger.error(f"Error cargando {file_path}: {error}")
+                continue
+            yield file_path, self._to_documents(pages)
+
+    def _iter_pool_results(self, file_paths: Iterable[str]) -> Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]:
+        """Resultados del pool en orden de entrada, con ventana acotada de tareas en vuelo"""
+        paths = iter(file_paths)
+        window = self.max_workers * self.prefetch
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque(executor.submit(_load_worker, path) for path in islice(paths, window))
+
+            while pending:
+                result = pending.popleft().result()
+
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(executor.submit(_load_worker, next_path))
+
+                yield result
+
+    def iter_documents(self, file_paths: Iterable[str]) -> Iterator[Document]:
+        """Entrega las páginas de todos los archivos, en orden"""
+        for _, documents in self.iter_files(file_paths):
+            yield from documents
+
+    def load(self, file_paths: Iterable[str]) -> List[Document]:
+        """Carga todas las páginas en una lista"""
+        return list(self.iter_documents(file_paths))
@@ -0,0 +1,405 @@
+"""
+Módulo: section_chunker.py
+Descripción: División de documentos por secciones. Los documentos del colegio se organizan
+con banners "=====" y títulos en mayúsculas (p. ej. "LUNES 18 DE MARZO", "INFORMACIONES
+GENERALES"); cada sección se emite como un único chunk si cabe en max_section_size (la
+ventana del modelo de embeddings) y solo las secciones largas se subdividen (primero por
+subtítulos y luego de forma recursiva).
+Cada chunk registra la ruta de su sección y sus offsets, y el índice de secciones permite
+recuperar una sección completa leyendo el archivo original, sin otra consulta vectorial.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import List, Dict, Any, Tuple, Optional, Iterable
+from langchain.docstore.document import Document
+
+from ingest.manifest import IngestManifest
+from ingest.loaders import parse_file
+from ingest.text_splitter import FastTextSplitter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECTION_INDEX_PATH = "data/vector_db/section_index.json"
+SECTION_INDEX_VERSION = 1
+
+BANNER_PATTERN = re.compile(r"^[ \t]*={5,}[ \t]*$", re.MULTILINE)
+LINE_PATTERN = re.compile(r"[^\n]*\S[^\n]*")
+NUMBERED_HEADING_PATTERN = re.compile(r"^\d+[.)]\s")
+MAX_HEADING_LENGTH = 100
+UNTITLED_LABEL_LENGTH = 60
+# preprocess_text corta los textos en 512 caracteres y MiniLM lee 128 tokens (~500 caracteres
+# en español): una sección más larga se divide en chunks con el mismo section_id
+DEFAULT_MAX_SECTION_SIZE = 500
+
+def is_heading(line: str) -> bool:
+    """Línea de título: en mayúsculas, corta y que no es un ítem de lista"""
+    line = line.strip()
+    return (
+        3 <= len(line) <= MAX_HEADING_LENGTH
+        and line[0] not in "-•*"
+        and line == line.upper()
+        and any(char.isalpha() for char in line)
+    )
+
+def heading_label(line: str) -> str:
+    """Texto de un título para la ruta de sección"""
+    return line.strip().rstrip(":").strip()
+
+@dataclass
+class Section:
+    """Sección de un documento: ruta de títulos y offsets sobre el texto"""
+    section_id: int
+    path: List[str]
+    start: int
+    end: int
+    start_byte: int = 0
+    end_byte: int = 0
+
+    @property
+    def title(self) -> str:
+        return " > ".join(self.path)
+
+class SectionChunker:
+    """
+    Divisor de documentos por secciones.
+
+    Los banners "=====" delimitan bloques. Un bloque formado solo por un título
+    (título subrayado con un banner) abre una sección cuyo contenido es el
+    bloque siguiente; los títulos numerados ("1. MATRÍCULA ...") se anidan bajo
+    el último título sin numerar. Los bloques sin título se etiquetan con el
+    inicio de su primera línea.
+    """
+
+    def __init__(self, max_section_size: int = DEFAULT_MAX_SECTION_SIZE, chunk_overlap: int = 80,
+                 separators: Optional[List[str]] = None):
+        """
+        Inicializa el divisor.
+
+        Args:
+            max_section_size (int): Tamaño máximo de un chunk en caracteres
+            chunk_overlap (int): Solapamiento al subdividir secciones largas
+            separators (Optional[List[str]]): Separadores para la subdivisión recursiva
+        """
+        self.max_section_size = max_section_size
+        self.splitter = FastTextSplitter(
+            chunk_size=max_section_size,
+            chunk_overlap=chunk_overlap,
+            separators=separators
+        )
+
+    def _blocks(self, text: str) -> List[Tuple[int, int]]:
+        """Tramos no vacíos entre banners, sin espacios en los extremos"""
+        bounds = [0]
+        for match in BANNER_PATTERN.finditer(text):
+            bounds.extend((match.start(), match.end()))
+        bounds.append(len(text))
+
+        blocks = []
+        for start, end in zip(bounds[::2], bounds[1::2]):
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start:
+                blocks.append((start, end))
+        return blocks
+
+    def find_sections(self, text: str, encoding: str = "utf-8") -> List[Section]:
+        """
+        Detecta las secciones de un texto.
+
+        Args:
+            text (str): Texto del documento (o de una página)
+            encoding (str): Codificación del archivo, para los offsets en bytes
+
+        Returns:
+            List[Section]: Secciones en orden, con offsets de caracteres y de bytes
+        """
+        sections: List[Section] = []
+        stack: List[str] = []
+        pending_start = None
+
+        for start, end in self._blocks(text):
+            first_line = LINE_PATTERN.search(text, start, end)
+            first = first_line.group(0)
+            heading_only = first_line.end() >= end
+
+            # El contenido de un título subrayado puede comenzar con un subtítulo
+            # propio (p. ej. "ENTRADA:"), que no abre una sección nueva
+            if is_heading(first) and (pending_start is None or heading_only):
+                level = 2 if NUMBERED_HEADING_PATTERN.match(first.strip()) else 1
+                stack = stack[:level - 1] + [heading_label(first)]
+
+                if heading_only:
+                    # Título subrayado: la sección comienza aquí y continúa en el bloque siguiente
+                    pending_start = start
+                    continue
+                path = list(stack)
+            elif pending_start is not None:
+                path = list(stack)
+            else:
+                path = [heading_label(first)[:UNTITLED_LABEL_LENGTH]]
+
+            section_start = start if pending_start is None else pending_start
+            sections.append(Section(len(sections), path, section_start, end))
+            pending_start = None
+
+        if pending_start is not None:
+            # Título final sin contenido
+            sections.append(Section(len(sections), list(stack), pending_start, len(text.rstrip())))
+
+        self._set_byte_offsets(text, sections, encoding)
+        return sections
+
+    @staticmethod
+    def _set_byte_offsets(text: str, sections: List[Section], encoding: str = "utf-8"):
+        """Convierte los offsets de caracteres a offsets de bytes en la codificación del archivo"""
+        position = 0
+        byte_position = 0
+        offsets = sorted({offset for section in sections for offset in (section.start, section.end)})
+        byte_offsets = {}
+        for offset in offsets:
+            # Con errors="replace" cada carácter de reemplazo ocupa lo mismo que el byte
+            # que lo originó en las codificaciones de un byte (cp1252)
+            byte_position += len(text[position:offset].encode(encoding, errors="replace"))
+            position = offset
+            byte_offsets[offset] = byte_position
+
+        for section in sections:
+            section.start_byte = byte_offsets[section.start]
+            section.end_byte = byte_offsets[section.end]
+
+    def chunk_spans(self, text: str, section: Section) -> List[Tuple[int, int, str]]:
+        """
+        Chunks de una sección como (inicio, fin, subtítulo).
+
+        Una sección que cabe en max_section_size es un único chunk; si no, se
+        divide por los subtítulos en mayúsculas de su contenido y cada parte
+        que siga siendo demasiado larga se divide de forma recursiva.
+        """
+        if section.end - section.start <= self.max_section_size:
+            return [(section.start, section.end, "")]
+
+        # Subtítulos del contenido (se omite la línea de título de la sección)
+        first_line = LINE_PATTERN.search(text, section.start, section.end)
+        bounds = [(section.start, "")]
+        for match in LINE_PATTERN.finditer(text, first_line.end(), section.end):
+            line = match.group(0)
+            if is_heading(line):
+                bounds.append((match.start(), heading_label(line)))
+
+        # Agrupar subsecciones consecutivas mientras quepan en un chunk
+        parts = []
+        ends = [start for start, _ in bounds[1:]] + [section.end]
+        for (start, subsection), end in zip(bounds, ends):
+            if parts and end - parts[-1][0] <= self.max_section_size:
+                parts[-1] = (parts[-1][0], end, parts[-1][2] or subsection)
+            else:
+                parts.append((start, end, subsection))
+
+        spans = []
+        for start, end, subsection in parts:
+            for chunk_start, chunk_end in self.splitter.split_spans(text, start, end):
+                spans.append((chunk_start, chunk_end, subsection))
+        return spans
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Divide documentos de LangChain por secciones.
+
+        Los section_id son correlativos por archivo (a través de sus páginas).
+        Los offsets de sección en bytes se calculan con la codificación con que se
+        leyó la página (metadato encoding, UTF-8 por defecto), de modo que en los
+        archivos .txt coinciden con el archivo original.
+
+        Args:
+            documents (Iterable[Document]): Documentos (páginas) a dividir
+
+        Returns:
+            List[Document]: Chunks con section_id, section_path, subsection,
+            offsets de la sección y start_index / end_index del chunk
+        """
+        chunks = []
+        next_section_id: Dict[str, int] = {}
+
+        for document in documents:
+            text = document.page_content
+            source = document.metadata.get("source", "")
+            first_id = next_section_id.get(source, 0)
+            sections = self.find_sections(text, document.metadata.get("encoding", "utf-8"))
+
+            for section in sections:
+                for start, end, subsection in self.chunk_spans(text, section):
+                    metadata = dict(document.metadata)
+                    metadata.update({
+                        "section_id": first_id + section.section_id,
+                        "section_path": section.title,
+                        "subsection": subsection,
+                        "section_start": section.start,
+                        "section_end": section.end,
+                        "section_start_byte": section.start_byte,
+                        "section_end_byte": section.end_byte,
+                        "start_index": start,
+                        "end_index": end
+                    })
+                    chunks.append(Document(page_content=text[start:end], metadata=metadata))
+
+            next_section_id[source] = first_id + len(sections)
+
+        return chunks
+
+@dataclass
+class SectionEntry:
+    """Sección registrada en el índice"""
+    section_id: int
+    section_path: str
+    page: int
+    start: int
+    end: int
+    start_byte: int
+    end_byte: int
+    chunk_ids: List[str] = field(default_factory=list)
+    # Codificación del archivo a la que se refieren start_byte / end_byte
+    encoding: str = "utf-8"
+
+class SectionIndex:
+    """
+    Índice de secciones por documento.
+
+    Se persiste como JSON junto a la base vectorial y se actualiza con la
+    ingesta incremental. Permite leer una sección completa a partir de sus
+    offsets: en los .txt se lee directamente el tramo de bytes del archivo.
+    """
+
+    def __init__(self, index_path: str = DEFAULT_SECTION_INDEX_PATH):
+        """
+        Inicializa el índice.
+
+        Args:
+            index_path (str): Ruta del archivo JSON del índice
+        """
+        self.index_path = index_path
+        self.files: Dict[str, List[SectionEntry]] = {}
+        self.load()
+
+    def load(self):
+        """Carga el índice desde disco si existe"""
+        if not os.path.exists(self.index_path):
+            self.files = {}
+            return
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            self.files = {
+                key: [SectionEntry(**section) for section in sections]
+                for key, sections in data.get("files", {}).items()
+            }
+
+        except Exception as e:
+            logger.error(f"Error cargando índice de secciones {self.index_path}: {str(e)}")
+            self.files = {}
+
+    def save(self):
+        """Guarda el índice de forma atómica"""
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "version": SECTION_INDEX_VERSION,
+            "updated_at": datetime.now().isoformat(),
+            "files": {
+                key: [asdict(section) for section in sections]
+                for key, sections in self.files.items()
+            }
+        }
+
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def summarize(records: List[Dict[str, Any]]) -> List[SectionEntry]:
+        """
+        Secciones de un archivo a partir de sus chunks (antes de deduplicar).
+
+        Args:
+            records (List[Dict[str, Any]]): Chunks de un archivo con metadatos de sección
+
+        Returns:
+            List[SectionEntry]: Secciones ordenadas por section_id
+        """
+        sections: Dict[int, SectionEntry] = {}
+        for record in records:
+            metadata = record["metadata"]
+            if "section_id" not in metadata:
+                continue
+
+            section = sections.get(metadata["section_id"])
+            if section is None:
+                section = sections[metadata["section_id"]] = SectionEntry(
+                    section_id=metadata["section_id"],
+                    section_path=metadata["section_path"],
+                    page=metadata.get("page", 0),
+                    start=metadata["section_start"],
+                    end=metadata["section_end"],
+                    start_byte=metadata["section_start_byte"],
+                    end_byte=metadata["section_end_byte"],
+                    encoding=metadata.get("encoding", "utf-8")
+                )
+            section.chunk_ids.append(record["id"])
+
+        return [sections[section_id] for section_id in sorted(sections)]
+
+    def update(self, file_path: str, sections: List[SectionEntry]):
+        """Registra (o reemplaza) las secciones de un archivo"""
+        key = IngestManifest.normalize_path(file_path)
+        if sections:
+            self.files[key] = list(sections)
+        else:
+            self.files.pop(key, None)
+
+    def remove(self, file_path: str):
+        """Elimina un archivo del índice"""
+        self.files.pop(IngestManifest.normalize_path(file_path), None)
+
+    def get(self, source: str, section_id: int) -> Optional[SectionEntry]:
+        """Sección registrada de un archivo"""
+        for section in self.files.get(IngestManifest.normalize_path(source), ()):
+            if section.section_id == section_id:
+                return section
+        return None
+
+    def read_section(self, source: str, section_id: int) -> Optional[str]:
+        """
+        Lee el texto completo de una sección desde el archivo original.
+
+        Args:
+            source (str): Ruta del archivo (metadato source del chunk)
+            section_id (int): Id de la sección
+
+        Returns:
+            Optional[str]: Texto de la sección, o None si no está registrada
+        """
+        section = self.get(source, section_id)
+        if section is None:
+            return None
+
+        if os.path.splitext(source)[1].lower() == ".txt":
+            with open(source, "rb") as f:
+                f.seek(section.start_byte)
+                return f.read(section.end_byte - section.start_byte).decode(section.encoding, errors="replace")
+
+        # Otros formatos: los offsets se refieren al texto extraído de la página
+        pages = parse_file(source)
+        return pages[section.page]["page_content"][section.start:section.end]
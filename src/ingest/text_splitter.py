@@ -0,0 +1,181 @@
+"""
+Módulo: text_splitter.py
+Descripción: Divisor de texto recursivo propio con la misma semántica que
+RecursiveCharacterTextSplitter de LangChain (separadores, tamaño y solapamiento),
+pero trabajando con offsets sobre el texto original: solo se crean substrings al
+emitir cada chunk, y cada chunk conserva su posición (start_index / end_index).
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import re
+import logging
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple, Optional, Iterable
+from langchain.docstore.document import Document
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+Span = Tuple[int, int]
+
+class FastTextSplitter:
+    """
+    Divisor recursivo por caracteres basado en offsets.
+
+    Equivale a RecursiveCharacterTextSplitter con keep_separator=True y
+    strip_whitespace=True (los valores por defecto de LangChain): el separador
+    queda al inicio del fragmento siguiente y cada chunk se recorta.
+    """
+
+    def __init__(self, chunk_size: int = 600, chunk_overlap: int = 80,
+                 separators: Optional[List[str]] = None):
+        """
+        Inicializa el divisor.
+
+        Args:
+            chunk_size (int): Tamaño máximo de cada chunk en caracteres
+            chunk_overlap (int): Solapamiento máximo entre chunks consecutivos
+            separators (Optional[List[str]]): Separadores en orden de preferencia
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"El solapamiento ({chunk_overlap}) no puede ser mayor que el tamaño del chunk ({chunk_size})"
+            )
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self._patterns = {}
+
+    def split_spans(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Span]:
+        """
+        Divide un texto (o el tramo text[start:end]) y retorna los offsets
+        (inicio, fin) de cada chunk.
+
+        Args:
+            text (str): Texto a dividir
+            start (int): Inicio del tramo a dividir
+            end (Optional[int]): Fin del tramo (por defecto, el final del texto)
+
+        Returns:
+            List[Span]: Offsets de los chunks sobre el texto original
+        """
+        spans: List[Span] = []
+        self._split(text, start, len(text) if end is None else end, self.separators, spans)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        """Divide un texto en chunks"""
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Divide documentos de LangChain registrando los offsets de cada chunk.
+
+        Args:
+            documents (Iterable[Document]): Documentos a dividir
+
+        Returns:
+            List[Document]: Chunks con start_index y end_index en sus metadatos
+        """
+        chunks = []
+        for document in documents:
+            text = document.page_content
+            for start, end in self.split_spans(text):
+                metadata = dict(document.metadata)
+                metadata["start_index"] = start
+                metadata["end_index"] = end
+                chunks.append(Document(page_content=text[start:end], metadata=metadata))
+        return chunks
+
+    def _cuts(self, text: str, start: int, end: int, separator: str) -> List[int]:
+        """
+        Límites de los fragmentos de text[start:end]: el fragmento i es
+        [cuts[i], cuts[i + 1]) y comienza con el separador (keep_separator).
+        """
+        if separator == "":
+            return list(range(start, end + 1))
+
+        pattern = self._patterns.get(separator)
+        if pattern is None:
+            pattern = self._patterns[separator] = re.compile(re.escape(separator))
+
+        cuts = [start]
+        cuts.extend(map(re.Match.start, pattern.finditer(text, start, end)))
+        if len(cuts) > 1 and cuts[1] == start:
+            # El tramo comienza con el separador: no hay fragmento vacío
+            del cuts[1]
+        cuts.append(end)
+        return cuts
+
+    def _split(self, text: str, start: int, end: int, separators: List[str], out: List[Span]):
+        # Elegir el primer separador presente en el tramo
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        cuts = self._cuts(text, start, end, separator)
+        chunk_size = self.chunk_size
+
+        # Los fragmentos demasiado largos cortan la secuencia en tramos contiguos
+        oversized = [i for i, (a, b) in enumerate(zip(cuts, cuts[1:])) if b - a >= chunk_size]
+
+        first = 0
+        for i in oversized:
+            if i > first:
+                self._merge(text, cuts, first, i, out)
+            if remaining:
+                self._split(text, cuts[i], cuts[i + 1], remaining, out)
+            else:
+                out.append((cuts[i], cuts[i + 1]))
+            first = i + 1
+
+        if len(cuts) - 1 > first:
+            self._merge(text, cuts, first, len(cuts) - 1, out)
+
+    def _merge(self, text: str, cuts: List[int], first: int, last: int, out: List[Span]):
+        """
+        Agrupa los fragmentos contiguos first..last-1 en chunks de hasta chunk_size.
+
+        Como los fragmentos son contiguos, el largo acumulado de una ventana es
+        cuts[hi] - cuts[lo], y tanto la extensión del chunk como el retroceso para
+        el solapamiento se resuelven con búsqueda binaria sobre cuts.
+        """
+        chunk_size = self.chunk_size
+        lo = hi = first
+
+        while True:
+            # Extender el chunk actual mientras el siguiente fragmento quepa
+            hi = max(hi, bisect_right(cuts, cuts[lo] + chunk_size, hi, last + 1) - 1)
+            if hi >= last:
+                break
+
+            self._emit(text, cuts[lo], cuts[hi], out)
+
+            # Descartar fragmentos del inicio hasta dejar a lo más chunk_overlap
+            # y espacio para el fragmento que no cupo
+            threshold = min(self.chunk_overlap, chunk_size - (cuts[hi + 1] - cuts[hi]))
+            lo = bisect_left(cuts, cuts[hi] - threshold, lo, hi)
+            hi += 1
+
+        if hi > lo:
+            self._emit(text, cuts[lo], cuts[hi], out)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, out: List[Span]):
+        """Registra un chunk recortando espacios sin crear substrings"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            out.append((start, end))
@@ -0,0 +1,367 @@
+"""
+Módulo: numpy_index.py
+Descripción: Índice vectorial exacto en el propio proceso. Los vectores float32 de la colección
+se guardan en una matriz .npy que se abre con memory-map (el arranque no lee la matriz; el
+sistema operativo carga las páginas al consultar y las comparte entre procesos), y los ids,
+textos y metadatos a una tabla JSON. Una consulta es un producto matriz-vector más
+argpartition, sin pasar por un servidor ni un cliente de base de datos. Lo usa NumpyVectorStore.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import json
+import time
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional, Iterable, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+NUMPY_INDEX_DIR = "numpy_index"
+METADATA_FILE = "metadata.json"
+
+def _compare(value: Any, condition: Any) -> bool:
+    """Evalúa la condición de un campo ({"$in": [...]}, {"$gte": 3}... o un valor literal)"""
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            matched = value == operand
+        elif operator == "$ne":
+            matched = value != operand
+        elif operator == "$in":
+            matched = value in operand
+        elif operator == "$nin":
+            matched = value not in operand
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            matched = {
+                "$gt": value > operand,
+                "$gte": value >= operand,
+                "$lt": value < operand,
+                "$lte": value <= operand
+            }[operator]
+        else:
+            raise ValueError(f"Operador de filtro no soportado: {operator}")
+        if not matched:
+            return False
+    return True
+
+def matches_filter(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evalúa un filtro con la sintaxis `where` de ChromaDB sobre unos metadatos.
+
+    Soporta igualdad, $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $and y $or.
+    """
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif not _compare(metadata.get(key), condition):
+            return False
+    return True
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Posiciones de los top_k puntajes mayores, ordenadas (argpartition + orden de k elementos)"""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+class NumpyVectorIndex:
+    """
+    Búsqueda exacta por producto punto sobre una matriz .npy en memory-map.
+
+    El directorio contiene metadata.json (ids, textos, metadatos y el nombre
+    del archivo de vectores) y vectors-<marca>.npy. save escribe un archivo
+    de vectores nuevo y reemplaza metadata.json al final, de forma atómica:
+    los procesos que consultan ven el índice anterior o el nuevo completo.
+    La primera modificación copia la matriz a un buffer en memoria con
+    capacidad creciente (como QuantizedVectorStore) hasta el siguiente save.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Inicializa el índice y lo abre si existe.
+
+        Args:
+            directory (str): Directorio del índice (normalmente <vector_db>/numpy_index)
+        """
+        self.directory = directory
+        self.metadata_path = os.path.join(directory, METADATA_FILE)
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._filter_rows: Dict[str, np.ndarray] = {}
+        self._loaded_mtime: Optional[float] = None
+        self.dirty = False
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Matriz (n, dim) float32: memory-map del archivo o buffer en memoria si hay cambios"""
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[:len(self.ids)]
+
+    @property
+    def dimension(self) -> int:
+        return int(self._matrix.shape[1]) if self._matrix is not None else 0
+
+    def load(self):
+        """Abre el índice desde disco si existe (la matriz queda en memory-map)"""
+        if not os.path.exists(self.metadata_path):
+            return
+
+        try:
+            mtime = os.path.getmtime(self.metadata_path)
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+
+            matrix = np.load(os.path.join(self.directory, table["vectors_file"]), mmap_mode="r")
+            if len(matrix) != len(table["ids"]):
+                raise ValueError(
+                    f"El índice tiene {len(matrix)} vectores y {len(table['ids'])} filas de metadatos"
+                )
+
+            self.ids = table["ids"]
+            self.documents = table["documents"]
+            self.metadatas = table["metadatas"]
+            self.positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+            self._matrix = matrix if matrix.size else None
+            self._filter_rows = {}
+            self._loaded_mtime = mtime
+            self.dirty = False
+            logger.info(f"Índice NumPy abierto: {len(self.ids)} vectores de {self.dimension} dimensiones")
+
+        except Exception as e:
+            logger.error(f"Error cargando índice NumPy {self.directory}: {str(e)}")
+            raise
+
+    def reload_if_changed(self) -> bool:
+        """Vuelve a abrir el índice si otro proceso lo reescribió"""
+        if self.dirty or not os.path.exists(self.metadata_path):
+            return False
+        if os.path.getmtime(self.metadata_path) == self._loaded_mtime:
+            return False
+        self.load()
+        return True
+
+    def build(self, batches: Iterable[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]],
+              count: int):
+        """
+        Escribe el índice a partir de lotes (ids, vectores, textos, metadatos) y lo vuelve a abrir.
+
+        Los vectores se copian lote a lote a un .npy nuevo, sin reunir la
+        matriz completa en memoria.
+
+        Args:
+            batches (Iterable): Lotes con ids, matriz (n, dim) float32, textos y metadatos
+            count (int): Número total de filas (tamaño de la matriz)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        vectors_file = f"vectors-{time.time_ns()}.npy"
+        vectors_path = os.path.join(self.directory, vectors_file)
+
+        try:
+            ids, documents, metadatas = [], [], []
+            matrix = None
+            for batch_ids, batch_vectors, batch_documents, batch_metadatas in batches:
+                batch_vectors = np.asarray(batch_vectors, dtype=np.float32)
+                if matrix is None:
+                    matrix = np.lib.format.open_memmap(
+                        vectors_path, mode="w+", dtype=np.float32, shape=(count, batch_vectors.shape[1])
+                    )
+                if len(ids) + len(batch_ids) > count:
+                    raise ValueError(f"Se recibieron más de {count} vectores")
+                matrix[len(ids):len(ids) + len(batch_ids)] = batch_vectors
+                ids.extend(batch_ids)
+                documents.extend(batch_documents)
+                metadatas.extend(batch_metadatas)
+
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=np.float32, shape=(0, 0))
+            if len(ids) != count:
+                raise ValueError(f"Se esperaban {count} vectores y se recibieron {len(ids)}")
+            matrix.flush()
+            del matrix
+
+            table = {"vectors_file": vectors_file, "ids": ids, "documents": documents, "metadatas": metadatas}
+            tmp_path = f"{self.metadata_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(table, f, ensure_ascii=False)
+            os.replace(tmp_path, self.metadata_path)
+
+        except Exception as e:
+            logger.error(f"Error construyendo índice NumPy {self.directory}: {str(e)}")
+            if os.path.exists(vectors_path):
+                os.remove(vectors_path)
+            raise
+
+        # Los procesos que tengan abierto el archivo anterior lo siguen leyendo hasta recargar
+        for name in os.listdir(self.directory):
+            if name.startswith("vectors-") and name.endswith(".npy") and name != vectors_file:
+                os.remove(os.path.join(self.directory, name))
+
+        self.load()
+
+    def save(self):
+        """Guarda el estado actual de forma atómica"""
+        self.build([(self.ids, self.vectors, self.documents, self.metadatas)] if self.ids else [], len(self.ids))
+
+    def _reserve(self, rows: int, dim: int):
+        """Asegura capacidad para rows filas en un buffer escribible"""
+        if self._matrix is None:
+            self._matrix = np.empty((max(rows, 1024), dim), dtype=np.float32)
+        elif dim != self._matrix.shape[1]:
+            raise ValueError(f"Vectores de {dim} dimensiones en un índice de {self._matrix.shape[1]}")
+        elif rows > len(self._matrix) or not self._matrix.flags.writeable:
+            # La primera escritura sobre el memory-map de solo lectura copia la matriz
+            grown = np.empty((max(rows, 2 * len(self.ids), 1024), dim), dtype=np.float32)
+            grown[:len(self.ids)] = self._matrix[:len(self.ids)]
+            self._matrix = grown
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray, documents: Sequence[str],
+               metadatas: Sequence[Dict[str, Any]]):
+        """
+        Inserta o reemplaza filas.
+
+        Args:
+            ids (Sequence[str]): Ids de los chunks
+            vectors (np.ndarray): Matriz (n, dim) float32
+            documents (Sequence[str]): Textos
+            metadatas (Sequence[Dict[str, Any]]): Metadatos
+        """
+        if len(ids) == 0:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._reserve(len(self.ids) + len(ids), vectors.shape[1])
+
+        for chunk_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+            position = self.positions.get(chunk_id)
+            if position is None:
+                position = len(self.ids)
+                self.ids.append(chunk_id)
+                self.documents.append(document)
+                self.metadatas.append(metadata)
+                self.positions[chunk_id] = position
+            else:
+                self.documents[position] = document
+                self.metadatas[position] = metadata
+            self._matrix[position] = vector
+
+        self._filter_rows = {}
+        self.dirty = True
+
+    def remove(self, ids: Sequence[str]):
+        """Elimina filas (la última fila ocupa el hueco)"""
+        positions = [self.positions[chunk_id] for chunk_id in ids if chunk_id in self.positions]
+        if not positions:
+            return
+        self._reserve(len(self.ids), self.dimension)
+
+        for chunk_id in ids:
+            position = self.positions.pop(chunk_id, None)
+            if position is None:
+                continue
+
+            last = len(self.ids) - 1
+            if position != last:
+                moved = self.ids[last]
+                self._matrix[position] = self._matrix[last]
+                self.ids[position] = moved
+                self.documents[position] = self.documents[last]
+                self.metadatas[position] = self.metadatas[last]
+                self.positions[moved] = position
+            self.ids.pop()
+            self.documents.pop()
+            self.metadatas.pop()
+
+        self._filter_rows = {}
+        self.dirty = True
+
+    def rows_for_filter(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Filas que cumplen un filtro (en caché: los filtros por tipo de usuario se repiten)"""
+        key = json.dumps(filters, sort_keys=True)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            rows = np.array(
+                [i for i, metadata in enumerate(self.metadatas) if matches_filter(metadata or {}, filters)],
+                dtype=np.int64
+            )
+            self._filter_rows[key] = rows
+        return rows
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Busca los vectores con mayor similitud coseno para varias consultas
+        (los embeddings están normalizados) con un solo producto de matrices.
+
+        Args:
+            queries (np.ndarray): Matriz (q, dim) de consultas normalizadas
+            top_k (int): Número de resultados por consulta
+            filters (Optional[Dict[str, Any]]): Filtro de metadatos con la sintaxis de ChromaDB
+
+        Returns:
+            List[List[Dict[str, Any]]]: Por consulta, documentos con id, text, metadata,
+                similarity_score y rank
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not self.ids or top_k <= 0:
+            return [[] for _ in queries]
+
+        rows = self.rows_for_filter(filters) if filters else None
+        if rows is not None and not len(rows):
+            return [[] for _ in queries]
+
+        # Producto completo y selección de filas: más barato que copiar las filas de la matriz
+        scores = queries @ self.vectors.T
+        if rows is not None:
+            scores = scores[:, rows]
+
+        results = []
+        for query_scores in scores:
+            documents = []
+            for position in top_k_rows(query_scores, top_k):
+                row = int(rows[position]) if rows is not None else int(position)
+                documents.append({
+                    'id': self.ids[row],
+                    'text': self.documents[row],
+                    'metadata': self.metadatas[row],
+                    'similarity_score': float(query_scores[position]),
+                    'rank': len(documents) + 1
+                })
+            results.append(documents)
+        return results
+
+    def search(self, query: np.ndarray, top_k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Búsqueda de una consulta (ver search_batch)"""
+        return self.search_batch(query, top_k, filters)[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "vectors": len(self.ids),
+            "dimension": self.dimension,
+            "bytes": int(self.vectors.nbytes),
+            "memory_mapped": isinstance(self._matrix, np.memmap),
+            "cached_filters": len(self._filter_rows)
+        }
@@ -0,0 +1,321 @@
+"""
+Módulo: prefilter.py
+Descripción: Índice de pre-filtrado por document_type. La ingesta mantiene la lista de ids de
+cada tipo de documento (document_type_index.json junto a la base vectorial); las búsquedas
+restringidas por rol (estudiante, apoderado) resuelven su filtro `document_type $in [...]` con
+ese índice y, si el subconjunto permitido es pequeño, hacen búsqueda exacta solo sobre él en
+lugar de filtrar los candidatos del ANN (que puede devolver menos de top_k resultados).
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import sys
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Sequence, Set
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retriever.numpy_index import top_k_rows
+
+logger = logging.getLogger(__name__)
+
+PREFILTER_FIELD = "document_type"
+PREFILTER_FILE = "document_type_index.json"
+DEFAULT_PREFILTER_EXACT_ROWS = 10000
+# Subconjuntos (uno por combinación de tipos permitidos) con sus vectores en memoria
+MAX_CACHED_SUBSETS = 4
+# Ids por lectura al store (ChromaDB arma una consulta SQL con un parámetro por id)
+SUBSET_READ_BATCH = 1000
+
+def default_prefilter_exact_rows() -> int:
+    """Tamaño máximo del subconjunto con búsqueda exacta (PREFILTER_EXACT_MAX_ROWS; 0 = desactivado)"""
+    return max(0, int(os.getenv("PREFILTER_EXACT_MAX_ROWS", str(DEFAULT_PREFILTER_EXACT_ROWS))))
+
+def filter_values(filters: Optional[Dict[str, Any]], field: str = PREFILTER_FIELD) -> Optional[List[str]]:
+    """
+    Valores permitidos de field si el filtro restringe solo ese campo.
+
+    Acepta {field: valor}, {field: {"$eq": valor}} y {field: {"$in": [...]}};
+    cualquier otro filtro devuelve None (se resuelve con el store).
+    """
+    if not filters or set(filters) != {field}:
+        return None
+
+    condition = filters[field]
+    if not isinstance(condition, dict):
+        return [condition]
+    if set(condition) == {"$eq"}:
+        return [condition["$eq"]]
+    if set(condition) == {"$in"}:
+        return list(condition["$in"])
+    return None
+
+class DocumentTypeIndex:
+    """
+    Ids de los chunks agrupados por el valor de un metadato (document_type).
+
+    VectorDatabase lo actualiza en cada escritura y eliminación y lo guarda
+    con persist(); el retriever lo abre en modo lectura y lo recarga cuando
+    la ingesta lo reescribe. Un escritor también lo recarga antes de
+    modificarlo si otro proceso (la CLI o la API) lo guardó entretanto.
+    """
+
+    def __init__(self, path: str, field: str = PREFILTER_FIELD):
+        """
+        Inicializa el índice y lo carga si existe.
+
+        Args:
+            path (str): Archivo JSON del índice
+            field (str): Metadato por el que se agrupa
+        """
+        self.path = path
+        self.field = field
+        self.ids_by_value: Dict[str, Set[str]] = {}
+        self.value_of: Dict[str, str] = {}
+        self._loaded_mtime: Optional[float] = None
+        self.dirty = False
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.value_of)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Carga el índice desde disco si existe"""
+        if not self.exists:
+            return
+
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            self.ids_by_value = {value: set(ids) for value, ids in data["ids"].items()}
+            self.value_of = {chunk_id: value for value, ids in self.ids_by_value.items() for chunk_id in ids}
+            self._loaded_mtime = mtime
+            self.dirty = False
+
+        except Exception as e:
+            logger.error(f"Error cargando índice de pre-filtrado {self.path}: {str(e)}")
+            raise
+
+    def reload_if_changed(self) -> bool:
+        """Vuelve a cargar el índice si la ingesta lo reescribió"""
+        if self.dirty or not self.exists:
+            return False
+        if os.path.getmtime(self.path) == self._loaded_mtime:
+            return False
+        self.load()
+        return True
+
+    def save(self):
+        """Guarda el índice de forma atómica"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {"field": self.field, "ids": {value: sorted(ids) for value, ids in self.ids_by_value.items()}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+        self.dirty = False
+
+    def add(self, ids: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """
+        Registra (o mueve de grupo) los chunks escritos.
+
+        Cualquier escritura marca el índice como modificado, aunque no cambie
+        de grupo: al guardarlo, los lectores descartan los vectores en caché.
+        Si otro proceso lo reescribió desde la última carga, se parte de esa
+        versión para no borrar sus chunks al guardar.
+        """
+        self.reload_if_changed()
+        if len(ids):
+            self.dirty = True
+        for chunk_id, metadata in zip(ids, metadatas):
+            value = (metadata or {}).get(self.field)
+            previous = self.value_of.get(chunk_id)
+            if previous == value:
+                continue
+            if previous is not None:
+                self._discard(chunk_id, self.value_of.pop(chunk_id))
+            if value is None:
+                # Sin document_type: ningún filtro por tipo puede seleccionarlo
+                continue
+            self.value_of[chunk_id] = value
+            self.ids_by_value.setdefault(value, set()).add(chunk_id)
+
+    def remove(self, ids: Sequence[str]):
+        """Olvida chunks eliminados"""
+        self.reload_if_changed()
+        for chunk_id in ids:
+            if chunk_id in self.value_of:
+                self._discard(chunk_id, self.value_of.pop(chunk_id))
+                self.dirty = True
+
+    def _discard(self, chunk_id: str, value: str):
+        group = self.ids_by_value.get(value)
+        if group is not None:
+            group.discard(chunk_id)
+            if not group:
+                del self.ids_by_value[value]
+
+    def clear(self):
+        self.ids_by_value = {}
+        self.value_of = {}
+        self.dirty = True
+
+    def ids_for(self, values: Sequence[str]) -> List[str]:
+        """Ids de los chunks con alguno de los valores (orden estable)"""
+        return sorted(set().union(*(self.ids_by_value.get(value, set()) for value in values)))
+
+    def count_for(self, values: Sequence[str]) -> int:
+        return sum(len(self.ids_by_value.get(value, ())) for value in set(values))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "field": self.field,
+            "chunks": len(self.value_of),
+            "values": {str(value): len(ids) for value, ids in self.ids_by_value.items()}
+        }
+
+@dataclass
+class PrefilterStats:
+    """Búsquedas resueltas con el índice de pre-filtrado y las que quedaron en el store"""
+    exact_searches: int = 0
+    store_fallbacks: int = 0
+    subset_loads: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class PrefilteredSearch:
+    """
+    Búsqueda exacta sobre el subconjunto de chunks que permite un filtro por document_type.
+
+    Los vectores, textos y metadatos de cada subconjunto se leen del store una
+    vez y quedan en memoria hasta que la ingesta reescribe el índice; el costo
+    por consulta es un producto matriz-vector de tamaño del subconjunto, con
+    resultados exactos y siempre min(top_k, tamaño del subconjunto) documentos.
+    """
+
+    def __init__(self, index: DocumentTypeIndex, max_rows: Optional[int] = None,
+                 max_cached: int = MAX_CACHED_SUBSETS):
+        """
+        Args:
+            index (DocumentTypeIndex): Índice mantenido por la ingesta
+            max_rows (Optional[int]): Subconjuntos mayores se buscan en el store;
+                por defecto PREFILTER_EXACT_MAX_ROWS
+            max_cached (int): Subconjuntos con vectores en memoria (LRU)
+        """
+        self.index = index
+        self.max_rows = default_prefilter_exact_rows() if max_rows is None else max_rows
+        self.max_cached = max_cached
+        self.stats = PrefilterStats()
+        self._subsets: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Descarta los subconjuntos en memoria (el store cambió)"""
+        with self._lock:
+            self._subsets.clear()
+
+    def applicable_values(self, filters: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """Tipos permitidos si el filtro se puede resolver con búsqueda exacta sobre el subconjunto"""
+        values = filter_values(filters, self.index.field)
+        if values is None or not self.max_rows:
+            return None
+
+        if self.index.reload_if_changed():
+            self.invalidate()
+        # Sin índice (colección anterior a él): el store aplica el filtro
+        if not self.index.exists:
+            return None
+        if self.index.count_for(values) > self.max_rows:
+            return None
+        return values
+
+    def search(self, store, query_embedding: np.ndarray, top_k: int,
+               filters: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Top_k exacto dentro del subconjunto permitido.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Documentos (id, text, metadata,
+                similarity_score y rank), o None si el filtro no aplica y la
+                búsqueda debe hacerse en el store
+        """
+        values = self.applicable_values(filters)
+        if values is None:
+            if filter_values(filters, self.index.field) is not None:
+                self.stats.store_fallbacks += 1
+            return None
+
+        subset = self._subset(store, values)
+        self.stats.exact_searches += 1
+        if not subset['ids']:
+            return []
+
+        scores = subset['vectors'] @ np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        return [
+            {
+                'id': subset['ids'][row],
+                'text': subset['documents'][row],
+                'metadata': subset['metadatas'][row],
+                'similarity_score': float(scores[row]),
+                'rank': rank + 1
+            }
+            for rank, row in enumerate(top_k_rows(scores, top_k))
+        ]
+
+    def _subset(self, store, values: List[str]) -> Dict[str, Any]:
+        """Vectores, textos y metadatos del subconjunto (desde la caché o el store)"""
+        key = tuple(sorted(set(map(str, values))))
+        with self._lock:
+            if key in self._subsets:
+                self._subsets.move_to_end(key)
+                return self._subsets[key]
+
+        ids = self.index.ids_for(values)
+        subset = {'ids': [], 'documents': [], 'metadatas': [], 'vectors': []}
+        for start in range(0, len(ids), SUBSET_READ_BATCH):
+            results = store.get(ids=ids[start:start + SUBSET_READ_BATCH],
+                                include=("embeddings", "documents", "metadatas"))
+            if not results['ids']:
+                continue
+            subset['ids'].extend(results['ids'])
+            subset['documents'].extend(results['documents'])
+            subset['metadatas'].extend(results['metadatas'])
+            subset['vectors'].append(np.asarray(results['embeddings'], dtype=np.float32))
+        subset['vectors'] = (
+            np.ascontiguousarray(np.concatenate(subset['vectors'])) if subset['vectors']
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        self.stats.subset_loads += 1
+
+        with self._lock:
+            self._subsets[key] = subset
+            while len(self._subsets) > self.max_cached:
+                self._subsets.popitem(last=False)
+        return subset
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.to_dict()
+        stats.update(
+            max_rows=self.max_rows,
+            cached_subsets=len(self._subsets),
+            index=self.index.get_stats()
+        )
+        return stats
@@ -0,0 +1,202 @@
+"""
+Módulo: query_batcher.py
+Descripción: Micro-batching de embeddings de consultas para la API. Las consultas que llegan
+en paralelo (cada una en un hilo del threadpool de FastAPI) se encolan; un hilo agrupa las
+que llegan en una ventana de pocos milisegundos, o hasta un máximo de consultas, las codifica
+en una sola pasada del modelo y entrega a cada llamador su vector mediante un Future.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_BATCH_SIZE = 32
+DEFAULT_QUERY_BATCH_WAIT_MS = 5.0
+
+def default_query_batch_size() -> int:
+    """Consultas máximas por pasada del modelo (QUERY_BATCH_SIZE; 0 o 1 = sin micro-batching)"""
+    return max(0, int(os.getenv("QUERY_BATCH_SIZE", str(DEFAULT_QUERY_BATCH_SIZE))))
+
+def default_query_batch_wait_ms() -> float:
+    """Espera máxima para completar un lote (QUERY_BATCH_WAIT_MS, por defecto 5 ms)"""
+    return max(0.0, float(os.getenv("QUERY_BATCH_WAIT_MS", str(DEFAULT_QUERY_BATCH_WAIT_MS))))
+
+@dataclass
+class QueryBatcherStats:
+    """Métricas del micro-batching de consultas"""
+    requests: int = 0
+    batches: int = 0
+    largest_batch: int = 0
+    errors: int = 0
+    queue_seconds: float = 0.0
+    encode_seconds: float = 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    @property
+    def mean_queue_ms(self) -> float:
+        """Espera media de una consulta antes de entrar al modelo"""
+        return self.queue_seconds * 1000 / self.requests if self.requests else 0.0
+
+    @property
+    def mean_encode_ms(self) -> float:
+        return self.encode_seconds * 1000 / self.batches if self.batches else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["mean_batch_size"] = round(self.mean_batch_size, 2)
+        data["mean_queue_ms"] = round(self.mean_queue_ms, 3)
+        data["mean_encode_ms"] = round(self.mean_encode_ms, 3)
+        return data
+
+class QueryEmbeddingBatcher:
+    """
+    Agrupa consultas concurrentes en una sola llamada al modelo.
+
+    encode_batch recibe una lista de textos y devuelve una matriz (n, dim).
+    El lote se cierra al reunir max_batch_size consultas o al pasar
+    max_wait_ms desde la primera; una consulta sola espera como mucho
+    max_wait_ms. El hilo de trabajo se inicia en el primer uso.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray],
+                 max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None,
+                 on_batch: Optional[Callable[[int, float], None]] = None):
+        """
+        Inicializa el batcher.
+
+        Args:
+            encode_batch (Callable): Codifica una lista de textos en una matriz (n, dim)
+            max_batch_size (Optional[int]): Consultas máximas por lote; por defecto QUERY_BATCH_SIZE
+            max_wait_ms (Optional[float]): Espera máxima del lote; por defecto QUERY_BATCH_WAIT_MS
+            on_batch (Optional[Callable]): Se invoca con (tamaño del lote, segundos de inferencia)
+        """
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size or default_query_batch_size())
+        self.max_wait = (default_query_batch_wait_ms() if max_wait_ms is None else max_wait_ms) / 1000
+        self.on_batch = on_batch
+        self.stats = QueryBatcherStats()
+
+        self._queue: "queue.Queue[Optional[Tuple[str, Future, float]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Inicia el hilo que forma y procesa los lotes"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+            self._thread.start()
+            logger.info(
+                f"Micro-batching de consultas iniciado: hasta {self.max_batch_size} consultas "
+                f"o {self.max_wait * 1000:.1f} ms por lote"
+            )
+
+    def close(self):
+        """Procesa las consultas pendientes y detiene el hilo"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+            logger.info(f"Micro-batching de consultas detenido: {self.stats.to_dict()}")
+
+    def submit(self, text: str) -> Future:
+        """
+        Encola una consulta.
+
+        Args:
+            text (str): Consulta ya preprocesada
+
+        Returns:
+            Future: Se resuelve con el embedding (dim,) de la consulta
+        """
+        self.start()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Encola una consulta y espera su embedding"""
+        return self.submit(text).result(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas acumuladas y configuración"""
+        data = self.stats.to_dict()
+        data["max_batch_size"] = self.max_batch_size
+        data["max_wait_ms"] = self.max_wait * 1000
+        return data
+
+    def _collect(self) -> Tuple[List[Tuple[str, Future, float]], bool]:
+        """Espera la primera consulta y completa el lote; indica si se pidió cerrar"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        items = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch_size:
+            try:
+                remaining = deadline - time.perf_counter()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _run(self):
+        closing = False
+        while not closing:
+            items, closing = self._collect()
+            if items:
+                self._process(items)
+
+    def _process(self, items: List[Tuple[str, Future, float]]):
+        """Codifica un lote y resuelve los futures"""
+        items = [item for item in items if item[1].set_running_or_notify_cancel()]
+        if not items:
+            return
+
+        start = time.perf_counter()
+        # Consultas idénticas dentro del lote se codifican una sola vez
+        unique_texts = list(dict.fromkeys(text for text, _, _ in items))
+
+        try:
+            embeddings = self.encode_batch(unique_texts)
+        except Exception as e:
+            logger.error(f"Error codificando lote de {len(items)} consultas: {str(e)}")
+            self.stats.errors += 1
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - start
+        self.stats.requests += len(items)
+        self.stats.batches += 1
+        self.stats.largest_batch = max(self.stats.largest_batch, len(items))
+        self.stats.queue_seconds += sum(start - enqueued for _, _, enqueued in items)
+        self.stats.encode_seconds += elapsed
+
+        rows = {text: i for i, text in enumerate(unique_texts)}
+        for text, future, _ in items:
+            future.set_result(embeddings[rows[text]])
+
+        if self.on_batch is not None:
+            self.on_batch(len(items), elapsed)
@@ -14,6 +14,7 @@ en consultas en lenguaje natural.
 """
 
 import os
+import sys
 import logging
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
@@ -27,15 +28,22 @@ from sentence_transformers import SentenceTransformer, CrossEncoder
 import torch
 from sklearn.metrics.pairwise import cosine_similarity
 
-# Dependencias para base de datos vectorial
-import chromadb
-from chromadb.config import Settings
-
 # Dependencias para procesamiento de texto
 import nltk
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest.section_chunker import SectionIndex
+from embeddings.onnx_backend import BACKEND_ONNX, default_backend
+from embeddings.model_registry import get_registry
+from retriever.query_batcher import QueryEmbeddingBatcher, default_query_batch_size
+from embeddings.quantization import QuantizedVectorStore, STORAGE_FLOAT32, QUANTIZED_INDEX_FILE, default_storage_mode
+from embeddings.projection import load_projection, default_projection_mode, default_projection_dims
+from retriever.vector_store import create_vector_store
+from retriever.prefilter import DocumentTypeIndex, PrefilteredSearch, PREFILTER_FILE
+
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -50,7 +58,9 @@ class SemanticRetriever:
     
     def __init__(self, vector_db_path: str = "data/vector_db", 
                  embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                 rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+                 rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 backend: Optional[str] = None,
+                 store_config: Optional[Dict[str, Any]] = None):
         """
         Inicializa el retriever semántico.
         
@@ -58,15 +68,32 @@ class SemanticRetriever:
             vector_db_path (str): Ruta a la base de datos vectorial
             embedding_model (str): Modelo para generar embeddings
             rerank_model (str): Modelo para re-ranking de resultados
+            backend (Optional[str]): "torch" u "onnx" (int8 en CPU); por defecto MODEL_BACKEND
+            store_config (Optional[Dict[str, Any]]): Sección AGENT_CONFIG["retriever"] con el backend
+                de almacenamiento ("chroma", "numpy" o "hnsw"); por defecto VECTOR_INDEX_BACKEND
         """
         self.vector_db_path = vector_db_path
         self.embedding_model_name = embedding_model
         self.rerank_model_name = rerank_model
+        self.backend = backend or default_backend()
         
         # Inicializar modelos
         self.embedding_model = None
         self.rerank_model = None
-        self.vector_db = None
+        self.store_config = store_config
+        self.vector_store = None
+        self.section_index = None
+        
+        # Búsqueda exacta sobre el subconjunto permitido por rol (PREFILTER_EXACT_MAX_ROWS)
+        self.prefilter = None
+        
+        # Índice en memoria (VECTOR_STORAGE=float16/int8 y/o VECTOR_PROJECTION=pca/truncate)
+        self.storage = default_storage_mode()
+        self.quantized_store = None
+        self.projection = None
+        
+        # Micro-batching de embeddings de consultas concurrentes (QUERY_BATCH_SIZE)
+        self.query_batcher = None
         
         # Configuración
         self.similarity_threshold = 0.7
@@ -99,16 +126,21 @@ class SemanticRetriever:
         Inicializa los modelos de embedding y re-ranking.
         """
         try:
+            # Instancias compartidas del proceso (las mismas que usa EmbeddingGenerator);
+            # con backend onnx se cargan los modelos int8 exportados (ver embeddings/onnx_backend.py)
+            registry = get_registry()
+            device = "cuda" if torch.cuda.is_available() and self.backend != BACKEND_ONNX else "cpu"
+            
             # Cargar modelo de embeddings
-            self.embedding_model = SentenceTransformer(
-                self.embedding_model_name,
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
+            self.embedding_model = registry.get_embedding_model(self.embedding_model_name, self.backend, device)
             
             # Cargar modelo de re-ranking
-            self.rerank_model = CrossEncoder(self.rerank_model_name)
+            self.rerank_model = registry.get_cross_encoder(self.rerank_model_name, self.backend)
             
-            logger.info("Modelos inicializados correctamente")
+            if default_query_batch_size() > 1:
+                self.query_batcher = QueryEmbeddingBatcher(self.encode_queries)
+            
+            logger.info(f"Modelos inicializados correctamente (backend {self.backend})")
             
         except Exception as e:
             logger.error(f"Error inicializando modelos: {str(e)}")
@@ -119,14 +151,16 @@ class SemanticRetriever:
         Inicializa la conexión con la base de datos vectorial.
         """
         try:
-            self.vector_db = chromadb.PersistentClient(
-                path=self.vector_db_path,
-                settings=Settings(anonymized_telemetry=False)
-            )
+            self.vector_store = create_vector_store(self.vector_db_path, self.store_config)
+            self.prefilter = PrefilteredSearch(DocumentTypeIndex(os.path.join(self.vector_db_path, PREFILTER_FILE)))
             
-            self.collection = self.vector_db.get_collection("school_documents")
+            self.projection = self._load_projection()
+            if self.storage != STORAGE_FLOAT32 or self.projection is not None:
+                self.quantized_store = QuantizedVectorStore(
+                    os.path.join(self.vector_db_path, QUANTIZED_INDEX_FILE), self.storage
+                )
             
-            logger.info("Conexión con base de datos vectorial establecida")
+            logger.info(f"Conexión con base de datos vectorial establecida (backend {self.vector_store.name})")
             
         except Exception as e:
             logger.error(f"Error inicializando base de datos vectorial: {str(e)}")
@@ -182,6 +216,14 @@ class SemanticRetriever:
             # Preprocesar consulta
             processed_query = self.preprocess_query(query)
             
+            if self.query_batcher is not None:
+                # Se codifica junto con las consultas concurrentes
+                return self.query_batcher.encode(processed_query)
+            
+            if self.backend == BACKEND_ONNX:
+                embedding = self.embedding_model.encode(processed_query)
+                return embedding / np.linalg.norm(embedding)
+            
             # Generar embedding
             embedding = self.embedding_model.encode(processed_query, convert_to_tensor=True)
             
@@ -194,6 +236,28 @@ class SemanticRetriever:
             logger.error(f"Error generando embedding de consulta: {str(e)}")
             raise
     
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Genera los embeddings normalizados de varias consultas en una sola pasada.
+        
+        Args:
+            queries (List[str]): Consultas ya preprocesadas
+            
+        Returns:
+            np.ndarray: Matriz (n, dim) float32
+        """
+        if self.backend == BACKEND_ONNX:
+            embeddings = self.embedding_model.encode(queries, batch_size=len(queries))
+            return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        
+        return self.embedding_model.encode(
+            queries,
+            batch_size=len(queries),
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32)
+    
     def search_similar_documents(self, query_embedding: np.ndarray, 
                                 top_k: int = 20, 
                                 filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
@@ -208,28 +272,26 @@ class SemanticRetriever:
         Returns:
             List[Dict[str, Any]]: Documentos similares encontrados
         """
-        if self.collection is None:
+        if self.vector_store is None:
             self.initialize_vector_db()
         
+        # Los backends en archivos se recargan si la ingesta los reescribió
+        if self.vector_store.reload_if_changed():
+            self.prefilter.invalidate()
+        
         try:
-            # Realizar búsqueda en ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=top_k,
-                where=filters
-            )
+            # Filtro por document_type (roles estudiante y apoderado): búsqueda exacta
+            # sobre el subconjunto permitido en lugar de filtrar los candidatos del índice
+            documents = self.prefilter.search(self.vector_store, query_embedding, top_k, filters)
+            if documents is not None:
+                logger.info(f"Encontrados {len(documents)} documentos similares (pre-filtrado por document_type)")
+                return documents
             
-            # Formatear resultados
-            documents = []
-            for i in range(len(results['ids'][0])):
-                doc = {
-                    'id': results['ids'][0][i],
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'similarity_score': 1 - results['distances'][0][i],  # Convertir distancia a similitud
-                    'rank': i + 1
-                }
-                documents.append(doc)
+            if self.quantized_store is not None and self._index_ready():
+                return self._search_quantized(query_embedding, top_k, filters)
+            
+            # Realizar búsqueda en el store (id, text, metadata, similarity_score y rank)
+            documents = self.vector_store.query(query_embedding, top_k, filters)
             
             logger.info(f"Encontrados {len(documents)} documentos similares")
             return documents
@@ -238,6 +300,67 @@ class SemanticRetriever:
             logger.error(f"Error en búsqueda de documentos: {str(e)}")
             raise
     
+    def _load_projection(self):
+        return load_projection(self.vector_db_path, default_projection_mode(), default_projection_dims())
+    
+    def _index_ready(self) -> bool:
+        """
+        Recarga el índice en memoria si la ingesta lo reescribió y comprueba que
+        corresponde a la proyección; si no, la búsqueda usa el store.
+        """
+        if self.quantized_store.reload_if_changed():
+            self.projection = self._load_projection()
+        
+        if not len(self.quantized_store):
+            return False
+        if self.projection is None:
+            return True
+        return self.projection.fitted and self.quantized_store.codes.shape[1] == self.projection.dims
+    
+    def _search_quantized(self, query_embedding: np.ndarray, top_k: int,
+                          filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Busca sobre el índice en memoria y recupera textos y metadatos del store.
+        
+        Si el índice está proyectado, la consulta se proyecta igual que los documentos.
+        """
+        try:
+            if self.projection is not None:
+                query_embedding = self.projection.transform(query_embedding)
+            
+            allowed_ids = None
+            if filters:
+                allowed_ids = set(self.vector_store.get(where=filters, include=())['ids'])
+            
+            hits = self.quantized_store.search(query_embedding, top_k, allowed_ids)
+            if not hits:
+                return []
+            
+            results = self.vector_store.get(ids=[chunk_id for chunk_id, _ in hits])
+            found = {
+                chunk_id: (text, metadata)
+                for chunk_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            }
+            
+            documents = []
+            for chunk_id, score in hits:
+                if chunk_id not in found:
+                    continue
+                documents.append({
+                    'id': chunk_id,
+                    'text': found[chunk_id][0],
+                    'metadata': found[chunk_id][1],
+                    'similarity_score': score,
+                    'rank': len(documents) + 1
+                })
+            
+            logger.info(f"Encontrados {len(documents)} documentos similares (índice {self.storage})")
+            return documents
+            
+        except Exception as e:
+            logger.error(f"Error en búsqueda sobre índice cuantizado: {str(e)}")
+            raise
+    
     def rerank_documents(self, query: str, documents: List[Dict[str, Any]], 
                         top_k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -358,6 +481,44 @@ class SemanticRetriever:
             logger.error(f"Error en búsqueda semántica: {str(e)}")
             raise
     
+    def get_section(self, source: str, section_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Recupera una sección completa a partir de sus offsets.
+        
+        Usa el índice de secciones generado por la ingesta (chunking="sections"),
+        por lo que no requiere otra consulta a la base vectorial. Los chunks de
+        los resultados de search() traen source y section_id en sus metadatos.
+        
+        Args:
+            source (str): Archivo de origen del chunk
+            section_id (int): Id de la sección dentro del archivo
+            
+        Returns:
+            Optional[Dict[str, Any]]: Sección con su texto, o None si no está indexada
+        """
+        if self.section_index is None:
+            self.section_index = SectionIndex(os.path.join(self.vector_db_path, "section_index.json"))
+        
+        try:
+            section = self.section_index.get(source, section_id)
+            if section is None:
+                return None
+            
+            return {
+                'source': source,
+                'section_id': section.section_id,
+                'section_path': section.section_path,
+                'page': section.page,
+                'start_byte': section.start_byte,
+                'end_byte': section.end_byte,
+                'chunk_ids': section.chunk_ids,
+                'text': self.section_index.read_section(source, section_id)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error recuperando sección {section_id} de {source}: {str(e)}")
+            raise
+    
     def _get_user_filters(self, user_type: str) -> Dict[str, Any]:
         """
         Obtiene filtros específicos para cada tipo de usuario.
@@ -424,14 +585,14 @@ class SemanticRetriever:
             Dict[str, Any]: Estadísticas de búsqueda
         """
         try:
-            if self.collection is None:
+            if self.vector_store is None:
                 self.initialize_vector_db()
             
             # Obtener estadísticas de la colección
-            total_docs = self.collection.count()
+            total_docs = self.vector_store.count()
             
             # Obtener muestra de documentos para análisis
-            sample_results = self.collection.get(limit=1000)
+            sample_results = self.vector_store.get(limit=1000)
             
             # Analizar tipos de documentos
             doc_types = {}
@@ -451,6 +612,10 @@ class SemanticRetriever:
                     'suggestions': True
                 }
             }
+            if self.query_batcher is not None:
+                analytics['query_batching'] = self.query_batcher.get_stats()
+            analytics['vector_store'] = self.vector_store.get_stats()
+            analytics['prefilter'] = self.prefilter.get_stats()
             
             return analytics
             
@@ -0,0 +1,309 @@
+"""
+Módulo: sharded_store.py
+Descripción: Índice vectorial particionado en N shards (por hash del id o por un metadato como
+document_type o campus). Cada shard es un store del backend configurado en
+<vector_db>/shards/shard-XX; las consultas se envían en paralelo a los shards (scatter) con un
+pool de hilos y se mezclan en un top-k global (gather). Registra la latencia de cada shard para
+detectar particiones lentas o desbalanceadas.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+"""
+
+import os
+import sys
+import time
+import zlib
+import heapq
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Sequence, Callable
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retriever.vector_store import VectorStore, DEFAULT_INCLUDE, SHARD_KEY_HASH, create_vector_store
+from retriever.prefilter import filter_values
+
+logger = logging.getLogger(__name__)
+
+SHARDS_DIR = "shards"
+# Latencias recientes por shard para p50/p99
+LATENCY_WINDOW = 1000
+# Ids por lectura al armar el mapa id -> shard (particiones por metadato)
+LOCATION_READ_BATCH = 5000
+
+@dataclass
+class ShardStats:
+    """Consultas y latencia de un shard"""
+    queries: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    recent: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def add(self, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        self.recent.append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies_ms = np.array(self.recent) * 1000
+        return {
+            "queries": self.queries,
+            "errors": self.errors,
+            "mean_ms": round(self.seconds * 1000 / self.queries, 3) if self.queries else 0.0,
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3) if len(latencies_ms) else 0.0,
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3) if len(latencies_ms) else 0.0
+        }
+
+def shard_for(value: Any, count: int) -> int:
+    """Shard de un valor (CRC32: estable entre procesos, a diferencia de hash())"""
+    return zlib.crc32(str(value).encode("utf-8")) % count
+
+class ShardedVectorStore(VectorStore):
+    """
+    Store compuesto por N shards del mismo backend.
+
+    Con key="hash" cada chunk va al shard de su id; con un metadato (por
+    ejemplo "document_type" o "campus") todos los chunks de un mismo valor
+    quedan juntos y las búsquedas filtradas por ese campo consultan solo
+    los shards que pueden tener resultados. Las consultas van a los shards
+    en paralelo en un pool de hilos (numpy, hnswlib y ChromaDB liberan el
+    GIL durante la búsqueda) y cada shard devuelve su top_k: la mezcla de
+    esas listas es el top_k global.
+
+    Con un metadato como clave, un chunk cuyo valor cambia se mueve de shard.
+    Para saber dónde estaba se mantiene un mapa id -> shard, que se arma en
+    la primera escritura leyendo los ids de cada shard una sola vez.
+    """
+
+    name = "sharded"
+
+    def __init__(self, persist_directory: str, config: Optional[Dict[str, Any]] = None,
+                 count: int = 2, key: str = SHARD_KEY_HASH, workers: Optional[int] = None,
+                 on_shard_query: Optional[Callable[[int, float], None]] = None):
+        """
+        Args:
+            persist_directory (str): Directorio de la base de datos vectorial
+            config (Optional[Dict[str, Any]]): Configuración del backend de cada shard
+            count (int): Número de shards
+            key (str): "hash" (id del chunk) o el metadato que decide el shard
+            workers (Optional[int]): Hilos de consulta; por defecto uno por shard
+            on_shard_query (Optional[Callable[[int, float], None]]): Se llama con
+                (shard, segundos) en cada consulta a un shard (métricas de la API)
+        """
+        if count < 1:
+            raise ValueError(f"Número de shards inválido: {count}")
+
+        self.key = key
+        self.on_shard_query = on_shard_query
+        shard_config = {**(config or {}), "shards": {"count": 1}}
+        self.shards: List[VectorStore] = [
+            create_vector_store(os.path.join(persist_directory, SHARDS_DIR, f"shard-{i:02d}"), shard_config)
+            for i in range(count)
+        ]
+        self.stats = [ShardStats() for _ in self.shards]
+        self.max_batch_size = min((shard.max_batch_size for shard in self.shards if shard.max_batch_size), default=None)
+        self._executor = ThreadPoolExecutor(max_workers=workers or count, thread_name_prefix="vector-shard")
+        self._stats_lock = threading.Lock()
+        # Shard actual de cada id (solo con un metadato como clave; None = sin armar)
+        self._locations: Optional[Dict[str, int]] = None
+        logger.info(f"Store particionado: {count} shards {self.shards[0].name} por {key}")
+
+    def _route(self, chunk_id: str, metadata: Optional[Dict[str, Any]]) -> int:
+        if self.key != SHARD_KEY_HASH:
+            value = (metadata or {}).get(self.key)
+            if value is not None:
+                return shard_for(value, len(self.shards))
+        return shard_for(chunk_id, len(self.shards))
+
+    def _shards_for_filter(self, filters: Optional[Dict[str, Any]]) -> List[int]:
+        """Shards que pueden tener chunks que cumplan el filtro"""
+        if self.key == SHARD_KEY_HASH:
+            return list(range(len(self.shards)))
+        values = filter_values(filters, self.key)
+        if values is None:
+            return list(range(len(self.shards)))
+        return sorted({shard_for(value, len(self.shards)) for value in values})
+
+    def _scatter(self, call: Callable[[int], Any], shards: Sequence[int], record: bool = False) -> List[Any]:
+        """
+        Ejecuta call(i) para cada shard en paralelo y devuelve los resultados en orden.
+
+        Con record=True la latencia de cada shard se registra en las métricas.
+        """
+        def run(i):
+            start = time.perf_counter()
+            try:
+                return call(i)
+            except Exception:
+                if record:
+                    with self._stats_lock:
+                        self.stats[i].errors += 1
+                raise
+            finally:
+                if record:
+                    seconds = time.perf_counter() - start
+                    with self._stats_lock:
+                        self.stats[i].add(seconds)
+                    if self.on_shard_query is not None:
+                        self.on_shard_query(i, seconds)
+
+        if len(shards) == 1:
+            return [run(shards[0])]
+        return list(self._executor.map(run, shards))
+
+    def _shard_locations(self) -> Dict[str, int]:
+        """Mapa id -> shard, armado con una lectura paginada de los ids de cada shard"""
+        if self._locations is None:
+            locations = {}
+            for i, shard in enumerate(self.shards):
+                offset = 0
+                while True:
+                    shard_ids = shard.get(limit=LOCATION_READ_BATCH, offset=offset, include=())['ids']
+                    if not shard_ids:
+                        break
+                    locations.update(dict.fromkeys(shard_ids, i))
+                    offset += len(shard_ids)
+            self._locations = locations
+        return self._locations
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        routes = [self._route(chunk_id, metadata) for chunk_id, metadata in zip(ids, metadatas)]
+
+        if self.key != SHARD_KEY_HASH:
+            # Un cambio del metadato mueve el chunk: se borra solo del shard donde estaba
+            locations = self._shard_locations()
+            moved: Dict[int, List[str]] = {}
+            for chunk_id, route in zip(ids, routes):
+                previous = locations.get(chunk_id)
+                if previous is not None and previous != route:
+                    moved.setdefault(previous, []).append(chunk_id)
+            for i, moved_ids in moved.items():
+                self.shards[i].delete(ids=moved_ids)
+
+        for i, shard in enumerate(self.shards):
+            rows = [row for row, route in enumerate(routes) if route == i]
+            if rows:
+                shard.upsert(
+                    [ids[row] for row in rows],
+                    embeddings[rows],
+                    [documents[row] for row in rows],
+                    [metadatas[row] for row in rows]
+                )
+
+        if self._locations is not None:
+            self._locations.update(zip(ids, routes))
+
+    def _ids_by_shard(self, ids: Sequence[str]) -> Dict[int, List[str]]:
+        """Ids agrupados por shard (solo con key="hash"; si no, cualquier shard puede tenerlos)"""
+        if self.key != SHARD_KEY_HASH:
+            return {i: list(ids) for i in range(len(self.shards))}
+        groups: Dict[int, List[str]] = {}
+        for chunk_id in ids:
+            groups.setdefault(shard_for(chunk_id, len(self.shards)), []).append(chunk_id)
+        return groups
+
+    def delete(self, ids=None, where=None):
+        if ids is not None:
+            for i, shard_ids in self._ids_by_shard(ids).items():
+                self.shards[i].delete(ids=shard_ids, where=where)
+            if self._locations is not None:
+                if where:
+                    # No se sabe cuáles de los ids cumplían el filtro
+                    self._locations = None
+                else:
+                    for chunk_id in ids:
+                        self._locations.pop(chunk_id, None)
+            return
+        for shard in self.shards:
+            shard.delete(where=where)
+        self._locations = None
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=DEFAULT_INCLUDE):
+        if ids is not None or where:
+            groups = self._ids_by_shard(ids) if ids is not None else {i: None for i in range(len(self.shards))}
+            results = self._scatter(
+                lambda i: self.shards[i].get(ids=groups[i], where=where, include=include),
+                sorted(groups)
+            )
+            data = self._concat(results, include)
+            end = offset + limit if limit is not None else None
+            return {key: value[offset:end] for key, value in data.items()}
+
+        # Sin filtro: el desplazamiento recorre los shards en orden (lectura paginada)
+        results = []
+        remaining = limit
+        for shard in self.shards:
+            if remaining is not None and remaining <= 0:
+                break
+            shard_count = shard.count()
+            if offset >= shard_count:
+                offset -= shard_count
+                continue
+            batch = shard.get(limit=remaining, offset=offset, include=include)
+            offset = 0
+            results.append(batch)
+            if remaining is not None:
+                remaining -= len(batch['ids'])
+        return self._concat(results, include)
+
+    @staticmethod
+    def _concat(results: List[Dict[str, Any]], include: Sequence[str]) -> Dict[str, Any]:
+        data = {'ids': [chunk_id for result in results for chunk_id in result['ids']]}
+        for key in include:
+            if key == "embeddings":
+                matrices = [result['embeddings'] for result in results if len(result['ids'])]
+                data['embeddings'] = np.concatenate(matrices) if matrices else np.zeros((0, 0), dtype=np.float32)
+            else:
+                data[key] = [item for result in results for item in result[key]]
+        return data
+
+    def query_batch(self, embeddings, top_k=5, filters=None):
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        results = self._scatter(
+            lambda i: self.shards[i].query_batch(embeddings, top_k, filters),
+            self._shards_for_filter(filters),
+            record=True
+        )
+
+        merged = []
+        for query in range(len(embeddings)):
+            best = heapq.nlargest(
+                top_k,
+                (result for shard_results in results for result in shard_results[query]),
+                key=lambda result: result['similarity_score']
+            )
+            merged.append([{**result, 'rank': rank + 1} for rank, result in enumerate(best)])
+        return merged
+
+    def count(self):
+        return sum(shard.count() for shard in self.shards)
+
+    def persist(self):
+        for shard in self.shards:
+            shard.persist()
+
+    def reload_if_changed(self):
+        changed = any([shard.reload_if_changed() for shard in self.shards])
+        # ChromaDB no detecta lo que escribió otro proceso: el mapa id -> shard se
+        # descarta siempre (la ingesta recarga al empezar) y se rearma al escribir
+        self._locations = None
+        return changed
+
+    def get_stats(self):
+        with self._stats_lock:
+            shard_stats = [
+                {"shard": i, "vectors": shard.count(), **stats.to_dict()}
+                for i, (shard, stats) in enumerate(zip(self.shards, self.stats))
+            ]
+        return {
+            "backend": f"{self.name}/{self.shards[0].name}",
+            "key": self.key,
+            "vectors": sum(stats["vectors"] for stats in shard_stats),
+            "shards": shard_stats
+        }
@@ -0,0 +1,319 @@
+"""
+Módulo: snapshot.py
+Descripción: Snapshots versionados del índice vectorial para el arranque en frío de la API.
+Un snapshot es un directorio inmutable con la matriz de vectores float32 (.npy), la tabla de
+ids, textos y metadatos y snapshot.json (formato, conteo, dimensión, backend de origen y versión
+del manifiesto de ingesta). Se exporta una vez después de la ingesta y los procesos de la API
+lo abren en memory-map de solo lectura (backend "snapshot"): no hay que calentar ChromaDB desde
+disco y todos los procesos comparten las mismas páginas en la caché del sistema operativo.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+
+Uso:
+    python src/retriever/snapshot.py export --vector-db data/vector_db --source chroma
+    python src/retriever/snapshot.py info --vector-db data/vector_db
+    python src/retriever/snapshot.py import --vector-db data/vector_db --target chroma
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retriever.numpy_index import NumpyVectorIndex
+from retriever.vector_store import (
+    VectorStore, NumpyVectorStore, BACKEND_CHROMA, BACKEND_SNAPSHOT, BACKENDS, create_vector_store, copy_vector_store
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_FILE = "snapshot.json"
+SNAPSHOT_FORMAT = "schoolbot-vector-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+DEFAULT_KEEP_SNAPSHOTS = 2
+
+def default_snapshot_root(persist_directory: str) -> str:
+    """Directorio de snapshots (VECTOR_SNAPSHOT_DIR; por defecto <vector_db>/snapshots)"""
+    return os.getenv("VECTOR_SNAPSHOT_DIR") or os.path.join(persist_directory, SNAPSHOT_DIR)
+
+def snapshot_source_backend(snapshot_root: str) -> str:
+    """
+    Backend escribible del que se exportan los snapshots (VECTOR_SNAPSHOT_SOURCE; por
+    defecto el de origen del snapshot vigente, o chroma si aún no hay ninguno).
+    """
+    backend = os.getenv("VECTOR_SNAPSHOT_SOURCE")
+    if not backend:
+        snapshot_dir = current_snapshot(snapshot_root)
+        backend = read_snapshot_info(snapshot_dir)["source_backend"] if snapshot_dir else BACKEND_CHROMA
+    backend = backend.lower()
+    if backend not in BACKENDS or backend == BACKEND_SNAPSHOT:
+        raise ValueError(f"Backend de origen de snapshots no válido: {backend}")
+    return backend
+
+def manifest_version(manifest_path: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Versión del manifiesto de ingesta con la que se exportó el snapshot.
+
+    Returns:
+        Optional[Dict[str, Any]]: Versión de formato, fecha de actualización,
+            archivos registrados y SHA-256 del manifiesto; None si no existe
+    """
+    if not manifest_path or not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, "rb") as f:
+        content = f.read()
+    data = json.loads(content)
+    return {
+        "version": data.get("version"),
+        "updated_at": data.get("updated_at"),
+        "files": len(data.get("files", {})),
+        "sha256": hashlib.sha256(content).hexdigest()
+    }
+
+def current_snapshot(snapshot_root: str) -> Optional[str]:
+    """Directorio del snapshot vigente (el que indica CURRENT), o None si no hay"""
+    current_path = os.path.join(snapshot_root, CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path, "r", encoding="utf-8") as f:
+        name = f.read().strip()
+    return os.path.join(snapshot_root, name) if name else None
+
+def read_snapshot_info(snapshot_dir: str) -> Dict[str, Any]:
+    """
+    Lee y valida snapshot.json.
+
+    Raises:
+        ValueError: Si el directorio no es un snapshot o su versión de formato no es compatible
+    """
+    info_path = os.path.join(snapshot_dir, SNAPSHOT_FILE)
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except Exception as e:
+        logger.error(f"Error leyendo snapshot {snapshot_dir}: {str(e)}")
+        raise
+
+    if info.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{snapshot_dir} no es un snapshot del índice vectorial")
+    if info.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Snapshot {info.get('id')} con formato v{info.get('format_version')}; "
+            f"esta versión lee v{SNAPSHOT_FORMAT_VERSION} (exportarlo de nuevo)"
+        )
+    return info
+
+def list_snapshots(snapshot_root: str) -> List[str]:
+    """Nombres de los snapshots completos, del más antiguo al más reciente"""
+    if not os.path.isdir(snapshot_root):
+        return []
+    return sorted(
+        name for name in os.listdir(snapshot_root)
+        if not name.startswith(".") and os.path.exists(os.path.join(snapshot_root, name, SNAPSHOT_FILE))
+    )
+
+def export_snapshot(store: VectorStore, snapshot_root: str, manifest_path: Optional[str] = None,
+                    batch_size: int = 5000, keep: int = DEFAULT_KEEP_SNAPSHOTS) -> Dict[str, Any]:
+    """
+    Exporta el contenido de un store como snapshot nuevo y lo marca como vigente.
+
+    El snapshot se escribe en un directorio temporal, se renombra al
+    terminar y recién entonces se reemplaza CURRENT: los procesos que lo
+    leen ven el snapshot anterior o el nuevo completo.
+
+    Args:
+        store (VectorStore): Store de origen (cualquier backend)
+        snapshot_root (str): Directorio de snapshots
+        manifest_path (Optional[str]): Manifiesto de ingesta cuya versión se registra
+        batch_size (int): Chunks por lectura al store
+        keep (int): Snapshots que se conservan (los procesos con uno anterior
+            abierto lo siguen leyendo hasta recargar)
+
+    Returns:
+        Dict[str, Any]: Contenido de snapshot.json del snapshot exportado
+    """
+    snapshot_id = datetime.now().strftime("%Y%m%dT%H%M%S") + f"-{time.time_ns() % 10 ** 9:09d}"
+    tmp_dir = os.path.join(snapshot_root, f".tmp-{snapshot_id}")
+    snapshot_dir = os.path.join(snapshot_root, snapshot_id)
+    start = time.perf_counter()
+
+    try:
+        count = store.count()
+
+        def read_batches():
+            offset = 0
+            while offset < count:
+                batch = store.get(limit=batch_size, offset=offset, include=("embeddings", "documents", "metadatas"))
+                if not batch['ids']:
+                    return
+                yield batch['ids'], batch['embeddings'], batch['documents'], batch['metadatas']
+                offset += len(batch['ids'])
+
+        index = NumpyVectorIndex(tmp_dir)
+        index.build(read_batches(), count)
+
+        info = {
+            "format": SNAPSHOT_FORMAT,
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "id": snapshot_id,
+            "created_at": datetime.now().isoformat(),
+            "source_backend": store.name,
+            "count": len(index),
+            "dimension": index.dimension,
+            "manifest": manifest_version(manifest_path)
+        }
+        with open(os.path.join(tmp_dir, SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2, ensure_ascii=False)
+
+        os.rename(tmp_dir, snapshot_dir)
+
+        current_path = os.path.join(snapshot_root, CURRENT_FILE)
+        with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(snapshot_id)
+        os.replace(f"{current_path}.tmp", current_path)
+
+    except Exception as e:
+        logger.error(f"Error exportando snapshot del índice vectorial: {str(e)}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    for name in list_snapshots(snapshot_root)[:-max(1, keep)]:
+        shutil.rmtree(os.path.join(snapshot_root, name), ignore_errors=True)
+
+    logger.info(
+        f"Snapshot {snapshot_id} exportado: {info['count']} vectores de {info['dimension']} dimensiones "
+        f"desde {store.name} en {time.perf_counter() - start:.1f} s"
+    )
+    return info
+
+class SnapshotVectorStore(NumpyVectorStore):
+    """
+    Store de solo lectura sobre el snapshot vigente.
+
+    La matriz se abre en memory-map de solo lectura, por lo que abrir el
+    store cuesta leer la tabla de textos y metadatos; las búsquedas son
+    exactas (como el backend numpy). reload_if_changed cambia al snapshot
+    nuevo cuando una exportación actualiza CURRENT, salvo que se haya
+    abierto un snapshot concreto.
+    """
+
+    name = BACKEND_SNAPSHOT
+
+    def __init__(self, persist_directory: str, snapshot_root: Optional[str] = None,
+                 snapshot_dir: Optional[str] = None):
+        """
+        Args:
+            persist_directory (str): Directorio de la base de datos vectorial
+            snapshot_root (Optional[str]): Directorio de snapshots; por defecto VECTOR_SNAPSHOT_DIR
+                o <vector_db>/snapshots
+            snapshot_dir (Optional[str]): Snapshot concreto; por defecto el vigente
+        """
+        self.snapshot_root = snapshot_root or default_snapshot_root(persist_directory)
+        self.pinned = snapshot_dir is not None
+        self.snapshot_dir = None
+        self.info: Dict[str, Any] = {}
+        # Índice vacío hasta abrir un snapshot (el directorio raíz no tiene tabla)
+        self.index = NumpyVectorIndex(self.snapshot_root)
+        self._lock = threading.RLock()
+        self._open(snapshot_dir or current_snapshot(self.snapshot_root))
+
+    def _open(self, snapshot_dir: Optional[str]):
+        if snapshot_dir is None:
+            logger.warning(f"No hay snapshot en {self.snapshot_root}; el store queda vacío hasta exportar uno")
+            return
+
+        start = time.perf_counter()
+        info = read_snapshot_info(snapshot_dir)
+        index = NumpyVectorIndex(snapshot_dir)
+        if len(index) != info["count"]:
+            raise ValueError(f"El snapshot {info['id']} tiene {len(index)} vectores y declara {info['count']}")
+
+        with self._lock:
+            self.index, self.info, self.snapshot_dir = index, info, snapshot_dir
+        logger.info(f"Snapshot {info['id']} abierto en {time.perf_counter() - start:.2f} s ({len(index)} vectores)")
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        raise ValueError("El backend snapshot es de solo lectura: la ingesta escribe en el backend de origen y exporta un snapshot")
+
+    def delete(self, ids=None, where=None):
+        raise ValueError("El backend snapshot es de solo lectura: la ingesta escribe en el backend de origen y exporta un snapshot")
+
+    def persist(self):
+        pass
+
+    def reload_if_changed(self):
+        if self.pinned:
+            return False
+        snapshot_dir = current_snapshot(self.snapshot_root)
+        if snapshot_dir is None or snapshot_dir == self.snapshot_dir:
+            return False
+        self._open(snapshot_dir)
+        return True
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["snapshot"] = self.info
+        return stats
+
+def import_snapshot(snapshot_dir: str, target: VectorStore, batch_size: int = 5000) -> int:
+    """
+    Carga un snapshot en un store escribible (restaurar o sembrar otra base vectorial).
+
+    Returns:
+        int: Chunks copiados
+    """
+    source = SnapshotVectorStore(os.path.dirname(snapshot_dir), os.path.dirname(snapshot_dir), snapshot_dir)
+    return copy_vector_store(source, target, batch_size)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snapshots del índice vectorial para el arranque de la API")
+    parser.add_argument("command", choices=["export", "import", "info"])
+    parser.add_argument("--vector-db", default="data/vector_db", help="Directorio de la base de datos vectorial")
+    parser.add_argument("--snapshots", default=None, help="Directorio de snapshots (por defecto VECTOR_SNAPSHOT_DIR)")
+    parser.add_argument("--source", default=BACKEND_CHROMA, choices=[b for b in BACKENDS if b != BACKEND_SNAPSHOT],
+                        help="Backend que se exporta")
+    parser.add_argument("--target", default=BACKEND_CHROMA, choices=[b for b in BACKENDS if b != BACKEND_SNAPSHOT],
+                        help="Backend en el que se importa")
+    parser.add_argument("--snapshot", default=None, help="Snapshot a importar (por defecto el vigente)")
+    parser.add_argument("--manifest", default=None, help="Manifiesto de ingesta (por defecto <vector-db>/ingest_manifest.json)")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP_SNAPSHOTS, help="Snapshots que se conservan")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot_root = args.snapshots or default_snapshot_root(args.vector_db)
+
+    if args.command == "export":
+        store = create_vector_store(args.vector_db, {"backend": args.source})
+        manifest_path = args.manifest or os.path.join(args.vector_db, "ingest_manifest.json")
+        info = export_snapshot(store, snapshot_root, manifest_path, args.batch_size, args.keep)
+        print(json.dumps(info, indent=2, ensure_ascii=False))
+    elif args.command == "import":
+        snapshot_dir = args.snapshot or current_snapshot(snapshot_root)
+        if snapshot_dir is None:
+            raise SystemExit(f"No hay snapshot en {snapshot_root}")
+        target = create_vector_store(args.vector_db, {"backend": args.target})
+        copied = import_snapshot(snapshot_dir, target, args.batch_size)
+        print(f"{copied} chunks importados en {args.target}: {target.get_stats()}")
+    else:
+        snapshot_dir = current_snapshot(snapshot_root)
+        if snapshot_dir is None:
+            raise SystemExit(f"No hay snapshot en {snapshot_root}")
+        print(json.dumps(read_snapshot_info(snapshot_dir), indent=2, ensure_ascii=False))
+        print(f"Snapshots disponibles: {', '.join(list_snapshots(snapshot_root))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,657 @@
+"""
+Módulo: vector_store.py
+Descripción: Interfaz común de almacenamiento vectorial (upsert, delete, get, query, query_batch,
+count, stats) con backends intercambiables: ChromaDB (el actual), un índice NumPy exacto en
+memory-map, un índice HNSW local con hnswlib y snapshots de solo lectura (retriever/snapshot.py).
+VectorDatabase (ingesta) y SemanticRetriever (búsqueda) crean el store con create_vector_store
+a partir de AGENT_CONFIG["retriever"]; el backend por defecto es VECTOR_INDEX_BACKEND.
+Autor: Tania Herrera
+Fecha: Octubre 2025
+
+Migrar una colección existente a otro backend (o repartirla en shards):
+    python src/retriever/vector_store.py --vector-db data/vector_db --source chroma --target numpy
+    python src/retriever/vector_store.py --source chroma --target chroma --target-shards 4 --shard-key document_type
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retriever.numpy_index import NumpyVectorIndex, NUMPY_INDEX_DIR, matches_filter, top_k_rows
+
+logger = logging.getLogger(__name__)
+
+BACKEND_CHROMA = "chroma"
+BACKEND_NUMPY = "numpy"
+BACKEND_HNSW = "hnsw"
+BACKEND_SNAPSHOT = "snapshot"
+BACKENDS = (BACKEND_CHROMA, BACKEND_NUMPY, BACKEND_HNSW, BACKEND_SNAPSHOT)
+
+COLLECTION_NAME = "school_documents"
+HNSW_INDEX_DIR = "hnsw_index"
+HNSW_TABLE_FILE = "table.json"
+DEFAULT_HNSW_OPTIONS = {"m": 16, "ef_construction": 200, "ef_search": 128}
+SHARD_KEY_HASH = "hash"
+
+DEFAULT_INCLUDE = ("documents", "metadatas")
+
+def default_index_backend() -> str:
+    """Backend de almacenamiento vectorial (VECTOR_INDEX_BACKEND: chroma, numpy, hnsw o snapshot)"""
+    backend = os.getenv("VECTOR_INDEX_BACKEND", BACKEND_CHROMA).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"VECTOR_INDEX_BACKEND desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    return backend
+
+def default_shard_options() -> Dict[str, Any]:
+    """Particionado del índice (VECTOR_SHARDS, 1 = sin shards; VECTOR_SHARD_KEY: hash, document_type, campus...)"""
+    return {"count": int(os.getenv("VECTOR_SHARDS", "1")), "key": os.getenv("VECTOR_SHARD_KEY", SHARD_KEY_HASH)}
+
+def create_vector_store(persist_directory: str, config: Optional[Dict[str, Any]] = None) -> "VectorStore":
+    """
+    Crea el store configurado.
+
+    Args:
+        persist_directory (str): Directorio de la base de datos vectorial
+        config (Optional[Dict[str, Any]]): Sección AGENT_CONFIG["retriever"]; usa "backend"
+            (por defecto VECTOR_INDEX_BACKEND), "hnsw" (m, ef_construction, ef_search),
+            "snapshot_dir" (por defecto VECTOR_SNAPSHOT_DIR) y "shards" (count, key y workers;
+            por defecto VECTOR_SHARDS y VECTOR_SHARD_KEY)
+
+    Returns:
+        VectorStore: Store abierto (o vacío si aún no hay datos)
+    """
+    config = config or {}
+    backend = (config.get("backend") or default_index_backend()).lower()
+
+    # Un snapshot es una sola matriz; el resto de los backends se pueden particionar
+    shards = {**default_shard_options(), **(config.get("shards") or {})}
+    if shards["count"] > 1 and backend != BACKEND_SNAPSHOT:
+        # sharded_store.py depende de este módulo
+        from retriever.sharded_store import ShardedVectorStore
+        return ShardedVectorStore(persist_directory, {**config, "backend": backend}, **shards)
+
+    if backend == BACKEND_CHROMA:
+        return ChromaVectorStore(persist_directory)
+    if backend == BACKEND_NUMPY:
+        return NumpyVectorStore(persist_directory)
+    if backend == BACKEND_HNSW:
+        return HnswVectorStore(persist_directory, **{**DEFAULT_HNSW_OPTIONS, **config.get("hnsw", {})})
+    if backend == BACKEND_SNAPSHOT:
+        # snapshot.py depende de este módulo
+        from retriever.snapshot import SnapshotVectorStore
+        return SnapshotVectorStore(persist_directory, config.get("snapshot_dir"))
+    raise ValueError(f"Backend de almacenamiento vectorial desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+def _result(chunk_id: str, text: str, metadata: Dict[str, Any], score: float, rank: int) -> Dict[str, Any]:
+    """Documento encontrado, con el formato que usan el retriever y la API"""
+    return {
+        'id': chunk_id,
+        'text': text,
+        'metadata': metadata,
+        'similarity_score': score,
+        'rank': rank
+    }
+
+class VectorStore(ABC):
+    """
+    Almacenamiento de chunks con su embedding, texto y metadatos.
+
+    Los filtros usan la sintaxis `where` de ChromaDB. Las búsquedas devuelven
+    listas de documentos con id, text, metadata, similarity_score (coseno) y
+    rank. Los backends en archivos acumulan los cambios en memoria hasta
+    persist(); ChromaDB escribe en cada llamada.
+    """
+
+    name = ""
+
+    # Filas máximas por llamada de escritura (None = sin límite)
+    max_batch_size: Optional[int] = None
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], embeddings: np.ndarray, documents: Sequence[str],
+               metadatas: Sequence[Dict[str, Any]]):
+        """Inserta chunks o reemplaza los que ya existen"""
+
+    @abstractmethod
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Elimina chunks por id o por filtro de metadatos"""
+
+    @abstractmethod
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: int = 0,
+            include: Sequence[str] = DEFAULT_INCLUDE) -> Dict[str, Any]:
+        """
+        Lee chunks sin búsqueda.
+
+        Returns:
+            Dict[str, Any]: 'ids' y, según include, 'documents', 'metadatas' y
+                'embeddings' (matriz float32)
+        """
+
+    @abstractmethod
+    def query_batch(self, embeddings: np.ndarray, top_k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Los top_k chunks más similares a cada embedding de la matriz (q, dim)"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Número de chunks almacenados"""
+
+    def add(self, ids: Sequence[str], embeddings: np.ndarray, documents: Sequence[str],
+            metadatas: Sequence[Dict[str, Any]]):
+        """Inserta chunks nuevos; falla si alguno de los ids ya existe"""
+        existing = self.get(ids=ids, include=())['ids']
+        if existing:
+            raise ValueError(f"{len(existing)} ids ya existen en el store (por ejemplo {existing[0]}); usar upsert")
+        self.upsert(ids, embeddings, documents, metadatas)
+
+    def query(self, embedding: np.ndarray, top_k: int = 5,
+              filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Los top_k chunks más similares a un embedding"""
+        return self.query_batch(np.atleast_2d(embedding), top_k, filters)[0]
+
+    def persist(self):
+        """Escribe en disco los cambios pendientes"""
+
+    def reload_if_changed(self) -> bool:
+        """Vuelve a abrir el store si otro proceso lo reescribió (solo backends en archivos)"""
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "vectors": self.count()}
+
+class ChromaVectorStore(VectorStore):
+    """Colección persistente de ChromaDB (índice HNSW del propio Chroma)"""
+
+    name = BACKEND_CHROMA
+
+    def __init__(self, persist_directory: str, collection_name: str = COLLECTION_NAME):
+        import chromadb
+        from chromadb.config import Settings
+
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+        # Máximo de filas por llamada que admite el cliente
+        if hasattr(self.client, "get_max_batch_size"):
+            self.max_batch_size = self.client.get_max_batch_size()
+        else:
+            self.max_batch_size = getattr(self.client, "max_batch_size", None)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=list(documents),
+            metadatas=list(metadatas)
+        )
+
+    def delete(self, ids=None, where=None):
+        if ids is not None:
+            if ids:
+                self.collection.delete(ids=list(ids))
+        elif where:
+            self.collection.delete(where=where)
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=DEFAULT_INCLUDE):
+        results = self.collection.get(
+            ids=list(ids) if ids is not None else None,
+            where=where or None,
+            limit=limit,
+            offset=offset or None,
+            include=list(include)
+        )
+        data = {'ids': results['ids']}
+        for key in include:
+            data[key] = results[key]
+        if "embeddings" in include:
+            data['embeddings'] = np.asarray(results['embeddings'], dtype=np.float32)
+        return data
+
+    def query_batch(self, embeddings, top_k=5, filters=None):
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        results = self.collection.query(
+            query_embeddings=embeddings.tolist(),
+            n_results=top_k,
+            where=filters or None
+        )
+        return [
+            [
+                # ChromaDB devuelve distancia coseno
+                _result(chunk_id, text, metadata, 1 - distance, rank + 1)
+                for rank, (chunk_id, text, metadata, distance) in enumerate(zip(ids, texts, metadatas, distances))
+            ]
+            for ids, texts, metadatas, distances in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']
+            )
+        ]
+
+    def count(self):
+        return self.collection.count()
+
+class NumpyVectorStore(VectorStore):
+    """
+    Búsqueda exacta en el propio proceso sobre NumpyVectorIndex.
+
+    Las consultas son un producto de matrices más argpartition; los cambios se
+    escriben con persist() (matriz nueva y tabla reemplazada de forma atómica).
+    """
+
+    name = BACKEND_NUMPY
+
+    def __init__(self, persist_directory: str):
+        self.index = NumpyVectorIndex(os.path.join(persist_directory, NUMPY_INDEX_DIR))
+        self._lock = threading.RLock()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            self.index.upsert(list(ids), embeddings, list(documents), list(metadatas))
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if ids is None:
+                ids = self.get(where=where, include=())['ids'] if where else []
+            self.index.remove(list(ids))
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=DEFAULT_INCLUDE):
+        with self._lock:
+            if ids is not None:
+                rows = [self.index.positions[chunk_id] for chunk_id in ids if chunk_id in self.index.positions]
+            elif where:
+                rows = self.index.rows_for_filter(where).tolist()
+            else:
+                rows = list(range(len(self.index)))
+            if ids is not None and where:
+                rows = [row for row in rows if matches_filter(self.index.metadatas[row] or {}, where)]
+            rows = rows[offset:offset + limit if limit is not None else None]
+
+            data = {'ids': [self.index.ids[row] for row in rows]}
+            if "documents" in include:
+                data['documents'] = [self.index.documents[row] for row in rows]
+            if "metadatas" in include:
+                data['metadatas'] = [self.index.metadatas[row] for row in rows]
+            if "embeddings" in include:
+                data['embeddings'] = np.array(self.index.vectors[rows], dtype=np.float32)
+            return data
+
+    def query_batch(self, embeddings, top_k=5, filters=None):
+        with self._lock:
+            return self.index.search_batch(embeddings, top_k, filters)
+
+    def count(self):
+        return len(self.index)
+
+    def persist(self):
+        with self._lock:
+            if self.index.dirty:
+                self.index.save()
+                logger.info(f"Índice NumPy guardado: {len(self.index)} vectores")
+
+    def reload_if_changed(self):
+        with self._lock:
+            return self.index.reload_if_changed()
+
+    def get_stats(self):
+        return {"backend": self.name, **self.index.get_stats()}
+
+class HnswVectorStore(VectorStore):
+    """
+    Índice HNSW local (hnswlib, espacio coseno) con tabla de textos y metadatos.
+
+    Cada chunk tiene una etiqueta entera; al eliminar se marca la etiqueta y
+    se reutiliza en la siguiente inserción. Los filtros muy selectivos se
+    resuelven con búsqueda exacta sobre las filas permitidas, donde HNSW con
+    filtro no garantiza encontrar top_k vecinos.
+    """
+
+    name = BACKEND_HNSW
+
+    # Con hasta este número de filas permitidas por el filtro se puntúan todas
+    EXACT_FILTER_ROWS = 2000
+
+    def __init__(self, persist_directory: str, m: int = 16, ef_construction: int = 200, ef_search: int = 128):
+        """
+        Inicializa el store y lo abre si existe.
+
+        Args:
+            persist_directory (str): Directorio de la base de datos vectorial
+            m (int): Conexiones por nodo del grafo
+            ef_construction (int): Candidatos explorados al insertar
+            ef_search (int): Candidatos explorados al buscar (se eleva a top_k si es menor)
+        """
+        try:
+            import hnswlib
+        except ImportError:
+            logger.error("El backend hnsw requiere hnswlib (pip install hnswlib)")
+            raise
+
+        self._hnswlib = hnswlib
+        self.directory = os.path.join(persist_directory, HNSW_INDEX_DIR)
+        self.table_path = os.path.join(self.directory, HNSW_TABLE_FILE)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+        self.index = None
+        self.ids: List[Optional[str]] = []
+        self.documents: List[Optional[str]] = []
+        self.metadatas: List[Optional[Dict[str, Any]]] = []
+        self.labels: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._filter_labels: Dict[str, np.ndarray] = {}
+        self._loaded_mtime: Optional[float] = None
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.load()
+
+    @property
+    def dimension(self) -> int:
+        return self.index.dim if self.index is not None else 0
+
+    def load(self):
+        """Abre el índice desde disco si existe"""
+        if not os.path.exists(self.table_path):
+            return
+
+        try:
+            mtime = os.path.getmtime(self.table_path)
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+
+            index = None
+            if table["ids"]:
+                index = self._hnswlib.Index(space="cosine", dim=table["dimension"])
+                index.load_index(os.path.join(self.directory, table["index_file"]), max_elements=len(table["ids"]))
+                index.set_ef(self.ef_search)
+
+            self.index = index
+            self.ids = table["ids"]
+            self.documents = table["documents"]
+            self.metadatas = table["metadatas"]
+            self.labels = {chunk_id: label for label, chunk_id in enumerate(self.ids) if chunk_id is not None}
+            self._free = [label for label, chunk_id in enumerate(self.ids) if chunk_id is None]
+            self._filter_labels = {}
+            self._loaded_mtime = mtime
+            self.dirty = False
+            logger.info(f"Índice HNSW abierto: {len(self.labels)} vectores de {self.dimension} dimensiones")
+
+        except Exception as e:
+            logger.error(f"Error cargando índice HNSW {self.directory}: {str(e)}")
+            raise
+
+    def reload_if_changed(self):
+        with self._lock:
+            if self.dirty or not os.path.exists(self.table_path):
+                return False
+            if os.path.getmtime(self.table_path) == self._loaded_mtime:
+                return False
+            self.load()
+            return True
+
+    def _reserve(self, rows: int, dim: int):
+        """Crea el índice o amplía su capacidad"""
+        if self.index is None:
+            self.index = self._hnswlib.Index(space="cosine", dim=dim)
+            self.index.init_index(max_elements=max(rows, 1024), ef_construction=self.ef_construction, M=self.m)
+            self.index.set_ef(self.ef_search)
+        elif dim != self.index.dim:
+            raise ValueError(f"Vectores de {dim} dimensiones en un índice de {self.index.dim}")
+        elif rows > self.index.get_max_elements():
+            self.index.resize_index(max(rows, 2 * self.index.get_max_elements()))
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if len(ids) == 0:
+            return
+
+        with self._lock:
+            embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+            new_ids = {chunk_id for chunk_id in ids if chunk_id not in self.labels}
+            self._reserve(len(self.ids) + max(0, len(new_ids) - len(self._free)), embeddings.shape[1])
+
+            # Última aparición de cada id
+            rows = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            labels = []
+            for chunk_id, i in rows.items():
+                label = self.labels.get(chunk_id)
+                if label is None:
+                    if self._free:
+                        label = self._free.pop()
+                    else:
+                        label = len(self.ids)
+                        self.ids.append(None)
+                        self.documents.append(None)
+                        self.metadatas.append(None)
+                    self.ids[label] = chunk_id
+                    self.labels[chunk_id] = label
+                self.documents[label] = documents[i]
+                self.metadatas[label] = metadatas[i]
+                labels.append(label)
+
+            # Una etiqueta existente (o marcada como eliminada) se actualiza en el grafo
+            self.index.add_items(embeddings[list(rows.values())], np.array(labels, dtype=np.int64))
+            self._filter_labels = {}
+            self.dirty = True
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if ids is None:
+                ids = self.get(where=where, include=())['ids'] if where else []
+            for chunk_id in ids:
+                label = self.labels.pop(chunk_id, None)
+                if label is None:
+                    continue
+                self.index.mark_deleted(label)
+                self.ids[label] = self.documents[label] = self.metadatas[label] = None
+                self._free.append(label)
+                self.dirty = True
+            self._filter_labels = {}
+
+    def _labels_for_filter(self, filters: Dict[str, Any]) -> np.ndarray:
+        key = json.dumps(filters, sort_keys=True)
+        labels = self._filter_labels.get(key)
+        if labels is None:
+            labels = np.array(
+                [label for label in self.labels.values() if matches_filter(self.metadatas[label] or {}, filters)],
+                dtype=np.int64
+            )
+            self._filter_labels[key] = labels
+        return labels
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=DEFAULT_INCLUDE):
+        with self._lock:
+            if ids is not None:
+                labels = [self.labels[chunk_id] for chunk_id in ids if chunk_id in self.labels]
+                if where:
+                    labels = [label for label in labels if matches_filter(self.metadatas[label] or {}, where)]
+            elif where:
+                labels = sorted(self._labels_for_filter(where).tolist())
+            else:
+                labels = sorted(self.labels.values())
+            labels = labels[offset:offset + limit if limit is not None else None]
+
+            data = {'ids': [self.ids[label] for label in labels]}
+            if "documents" in include:
+                data['documents'] = [self.documents[label] for label in labels]
+            if "metadatas" in include:
+                data['metadatas'] = [self.metadatas[label] for label in labels]
+            if "embeddings" in include:
+                data['embeddings'] = (
+                    np.asarray(self.index.get_items(labels), dtype=np.float32)
+                    if labels else np.zeros((0, self.dimension), dtype=np.float32)
+                )
+            return data
+
+    def _exact(self, embeddings: np.ndarray, labels: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """Búsqueda exacta sobre un subconjunto de etiquetas"""
+        vectors = np.asarray(self.index.get_items(labels.tolist()), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = embeddings @ vectors.T
+        return [
+            [
+                _result(self.ids[labels[position]], self.documents[labels[position]],
+                        self.metadatas[labels[position]], float(query_scores[position]), rank + 1)
+                for rank, position in enumerate(top_k_rows(query_scores, top_k))
+            ]
+            for query_scores in scores
+        ]
+
+    def query_batch(self, embeddings, top_k=5, filters=None):
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if not self.labels or top_k <= 0:
+                return [[] for _ in embeddings]
+
+            allowed = self._labels_for_filter(filters) if filters else None
+            if allowed is not None:
+                if not len(allowed):
+                    return [[] for _ in embeddings]
+                if len(allowed) <= max(self.EXACT_FILTER_ROWS, top_k):
+                    return self._exact(embeddings, allowed, top_k)
+
+            top_k = min(top_k, len(self.labels) if allowed is None else len(allowed))
+            if top_k > self.ef_search:
+                self.ef_search = top_k
+                self.index.set_ef(top_k)
+
+            try:
+                if allowed is None:
+                    labels, distances = self.index.knn_query(embeddings, k=top_k)
+                else:
+                    allowed_set = set(allowed.tolist())
+                    labels, distances = self.index.knn_query(
+                        embeddings, k=top_k, filter=lambda label: label in allowed_set
+                    )
+            except RuntimeError:
+                # El grafo no alcanzó top_k vecinos (muchos eliminados o filtro restrictivo)
+                return self._exact(embeddings, allowed if allowed is not None else
+                                   np.array(sorted(self.labels.values()), dtype=np.int64), top_k)
+
+            return [
+                [
+                    _result(self.ids[label], self.documents[label], self.metadatas[label], 1 - float(distance), rank + 1)
+                    for rank, (label, distance) in enumerate(zip(query_labels, query_distances))
+                ]
+                for query_labels, query_distances in zip(labels, distances)
+            ]
+
+    def count(self):
+        return len(self.labels)
+
+    def persist(self):
+        """Guarda el índice y la tabla de forma atómica (la tabla se reemplaza al final)"""
+        with self._lock:
+            if not self.dirty:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            index_file = f"index-{time.time_ns()}.bin"
+            index_path = os.path.join(self.directory, index_file)
+
+            try:
+                if self.index is not None:
+                    self.index.save_index(index_path)
+
+                table = {
+                    "index_file": index_file,
+                    "dimension": self.dimension,
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas
+                }
+                tmp_path = f"{self.table_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(table, f, ensure_ascii=False)
+                os.replace(tmp_path, self.table_path)
+
+            except Exception as e:
+                logger.error(f"Error guardando índice HNSW {self.directory}: {str(e)}")
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+                raise
+
+            for name in os.listdir(self.directory):
+                if name.startswith("index-") and name.endswith(".bin") and name != index_file:
+                    os.remove(os.path.join(self.directory, name))
+
+            self._loaded_mtime = os.path.getmtime(self.table_path)
+            self.dirty = False
+            logger.info(f"Índice HNSW guardado: {len(self.labels)} vectores")
+
+    def get_stats(self):
+        return {
+            "backend": self.name,
+            "vectors": len(self.labels),
+            "dimension": self.dimension,
+            "deleted_slots": len(self._free),
+            "max_elements": self.index.get_max_elements() if self.index is not None else 0,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "cached_filters": len(self._filter_labels)
+        }
+
+def copy_vector_store(source: VectorStore, target: VectorStore, batch_size: int = 5000) -> int:
+    """
+    Copia todos los chunks de un store a otro (migración de backend).
+
+    Args:
+        source (VectorStore): Store de origen
+        target (VectorStore): Store de destino
+        batch_size (int): Filas por lectura
+
+    Returns:
+        int: Chunks copiados
+    """
+    copied = 0
+    while True:
+        batch = source.get(limit=batch_size, offset=copied, include=("embeddings", "documents", "metadatas"))
+        if not batch['ids']:
+            break
+        target.upsert(batch['ids'], batch['embeddings'], batch['documents'], batch['metadatas'])
+        copied += len(batch['ids'])
+    target.persist()
+    logger.info(f"Copiados {copied} chunks de {source.name} a {target.name}")
+    return copied
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra la colección school_documents entre backends")
+    parser.add_argument("--vector-db", default="data/vector_db", help="Directorio de la base de datos vectorial")
+    parser.add_argument("--source", default=BACKEND_CHROMA, choices=BACKENDS)
+    parser.add_argument("--target", required=True, choices=[b for b in BACKENDS if b != BACKEND_SNAPSHOT])
+    parser.add_argument("--source-shards", type=int, default=1, help="Shards del store de origen")
+    parser.add_argument("--target-shards", type=int, default=1, help="Shards del store de destino")
+    parser.add_argument("--shard-key", default=SHARD_KEY_HASH, help="Clave de particionado: hash o un metadato")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    source = create_vector_store(
+        args.vector_db, {"backend": args.source, "shards": {"count": args.source_shards, "key": args.shard_key}}
+    )
+    target = create_vector_store(
+        args.vector_db, {"backend": args.target, "shards": {"count": args.target_shards, "key": args.shard_key}}
+    )
+    copied = copy_vector_store(source, target, args.batch_size)
+    print(f"{copied} chunks copiados de {args.source} a {args.target}: {target.get_stats()}")
+
+if __name__ == "__main__":
+    main()